@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""
+IntenseRP Next - micro-benchmarks for hot paths
+
+Run from the repository root:
+
+    python scripts/benchmark.py                  # every benchmark
+    python scripts/benchmark.py stream-decoder   # a single benchmark
+    python scripts/benchmark.py prompt --sizes 1000,10000,100000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def _timeit(func, repeat: int = 5) -> float:
+    """Best wall time of several runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _fake_capture(chunks: int, seed: int = 42) -> list:
+    """Build a DeepSeek R1 style SSE capture: thinking first, then the answer"""
+    rnd = random.Random(seed)
+    words = ["the", " quick", " brown", " fox", " jumps", " over", " a", " lazy", " dog", ".", "\n\n", " **bold**"]
+    thinking = chunks // 3
+
+    lines = [json.dumps({"p": "response/thinking_content", "v": "Let"})]
+    lines += [json.dumps({"v": rnd.choice(words)}) for _ in range(thinking)]
+    lines.append(json.dumps({"p": "response/content", "o": "APPEND", "v": "Sure"}))
+    lines += [json.dumps({"v": rnd.choice(words)}) for _ in range(chunks - thinking)]
+    lines.append(json.dumps({"p": "response", "o": "BATCH", "v": [
+        {"p": "accumulated_token_usage", "v": chunks},
+        {"p": "quasi_status", "v": "FINISHED"}
+    ]}))
+    return lines
+
+
+def bench_stream_decoder(sizes) -> None:
+    from processors.stream_decoder import DeepSeekStreamDecoder
+    from processors.response_stages import ResponseChain, ThinkTagStage, assemble_response
+
+    print("stream-decoder: DeepSeek SSE capture decoding")
+    for size in sizes:
+        lines = _fake_capture(size)
+
+        def streaming():
+            decoder = DeepSeekStreamDecoder()
+            chain = ResponseChain(think=ThinkTagStage())
+            for line in lines:
+                for delta in decoder.feed(line):
+                    chain.feed_delta(delta)
+            for delta in decoder.finish():
+                chain.feed_delta(delta)
+            chain.finish()
+
+        def non_streaming():
+            assemble_response(DeepSeekStreamDecoder().decode_all(lines))
+
+        for label, func in (("streaming", streaming), ("non-streaming", non_streaming)):
+            elapsed = _timeit(func)
+            print(f"  {size:>7} chunks  {label:<14} {elapsed * 1000:9.2f} ms  {size / elapsed:12.0f} chunks/s")
+
+
+def bench_metrics(sizes) -> None:
+    from utils.metrics import MetricsRegistry, LATENCY_BUCKETS
+
+    print("metrics: histogram observations on the streaming hot path")
+    registry = MetricsRegistry("bench")
+    histogram = registry.histogram("latency_seconds", "Benchmark latency", LATENCY_BUCKETS, ("mode",))
+    for size in sizes:
+        def observe():
+            for i in range(size):
+                histogram.observe(i / size, mode="network")
+
+        elapsed = _timeit(observe)
+        render = _timeit(registry.render)
+        print(f"  {size:>7} obs     {elapsed * 1000:9.2f} ms  {size / elapsed:12.0f} obs/s  render {render * 1000:.2f} ms")
+
+
+def _fake_message_html(blocks: int, seed: int = 42) -> str:
+    """Build DeepSeek message HTML alternating paragraphs, lists and highlighted code blocks"""
+    rnd = random.Random(seed)
+    words = ["the", "quick", "brown", "fox", "<strong>jumps</strong>", "over", "<em>a</em>", "lazy", "dog", "&amp;"]
+    parts = []
+    for index in range(blocks):
+        kind = index % 3
+        if kind == 0:
+            parts.append('<p class="ds-markdown-paragraph">' + " ".join(rnd.choice(words) for _ in range(40)) + "</p>")
+        elif kind == 1:
+            items = "".join(f"<li><p>{rnd.choice(words)} {rnd.choice(words)}</p></li>" for _ in range(5))
+            parts.append(f"<ul>{items}</ul>")
+        else:
+            lines = "\n".join(
+                f'<span class="token keyword">let</span> v{i} <span class="token operator">=</span> <span class="token number">{i}</span>;'
+                for i in range(20)
+            )
+            parts.append(
+                '<div class="md-code-block"><div class="md-code-block-banner"><span class="d813de27">javascript</span>'
+                f'<div role="button" class="ds-button">Copy</div></div><pre>{lines}</pre></div>'
+            )
+    return "".join(parts)
+
+
+def bench_markdown(sizes) -> None:
+    from processors.content_processor import ContentProcessor, available_parsers
+
+    print("markdown: HTML to Markdown conversion of a whole response, per parser")
+    for size in sizes:
+        blocks = max(3, size // 50)
+        html = _fake_message_html(blocks)
+        baseline = None
+        for parser in ("html.parser",) + tuple(p for p in available_parsers() if p != "html.parser"):
+            processor = ContentProcessor(parser)
+            elapsed = _timeit(lambda: processor.process_html_to_markdown(html), repeat=3)
+            baseline = baseline or elapsed
+            print(f"  {blocks:>7} blocks  {parser:<12} {elapsed * 1000:9.2f} ms  {len(html) / elapsed / 1e6:8.2f} MB/s  x{baseline / elapsed:.2f}")
+
+
+def _fake_chat(messages: int, seed: int = 42) -> list:
+    """Build a SillyTavern group chat: a character card, then named users and the character taking turns"""
+    rnd = random.Random(seed)
+    words = ["the", "quick", "brown", "fox", "jumps", "over", "a", "lazy", "dog.", "*smiles*", "\n"]
+    chat = [{"role": "system", "content": 'DATA1: "Ayla" DATA2: "Sam"\n' + " ".join(rnd.choice(words) for _ in range(300))}]
+    for index in range(messages - 1):
+        text = " ".join(rnd.choice(words) for _ in range(rnd.randint(10, 60)))
+        if index % 2:
+            chat.append({"role": "assistant", "content": text})
+        else:
+            chat.append({"role": "user", "name": rnd.choice(["Sam", "Kit", "Lee"]), "content": text})
+    return chat
+
+
+def bench_prompt(sizes) -> None:
+    from config.config_schema import get_default_config
+    from config.config_snapshot import ConfigSnapshot
+    from pipeline.message_pipeline import MessagePipeline
+
+    print("prompt: request processing and prompt formatting of a whole chat history")
+    config = ConfigSnapshot(get_default_config(), {"custom_user_template": "{name}: {content}", "custom_char_template": "{name}: {content}"})
+    baseline = None
+    for size in sizes:
+        chat = _fake_chat(size)
+        chars = sum(len(message["content"]) for message in chat)
+
+        def build(pipeline, messages):
+            request = pipeline.process_request({"messages": [dict(message) for message in messages]})
+            return pipeline.format_for_api(request)
+
+        # A fresh pipeline formats every message, a resend with one new turn reuses the cached ones
+        cold = _timeit(lambda: build(MessagePipeline(config), chat), repeat=3)
+        pipeline = MessagePipeline(config)
+        build(pipeline, chat[:-1])
+        resend = _timeit(lambda: build(pipeline, chat), repeat=3)
+
+        tracemalloc.start()
+        build(MessagePipeline(config), chat)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        per_message = cold / size * 1e6
+        baseline = baseline or per_message
+        print(
+            f"  {size:>7} msgs  cold {cold * 1000:9.2f} ms  {per_message:6.2f} us/msg (x{per_message / baseline:.2f})"
+            f"  resend {resend * 1000:9.2f} ms  peak {peak / 1e6:7.1f} MB ({peak / chars:.1f} B/char)"
+        )
+
+
+BENCHMARKS = {
+    "stream-decoder": bench_stream_decoder,
+    "metrics": bench_metrics,
+    "markdown": bench_markdown,
+    "prompt": bench_prompt,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="IntenseRP Next micro-benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--sizes", default="1000,5000,20000", help="comma separated input sizes")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name](sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+IntenseRP Next - golden-output check for the HTML to Markdown conversion
+
+Every fixture in scripts/fixtures/markdown is converted with each installed
+parser, both in one go and block by block, and must match its golden .md
+file exactly. Run from the repository root:
+
+    python scripts/markdown_conformance.py            # check every installed parser
+    python scripts/markdown_conformance.py --update   # rewrite the golden files (html.parser)
+"""
+
+import argparse
+import difflib
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "markdown")
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def _conversions(parser: str, html: str):
+    """Every way a response gets converted, as (label, markdown)"""
+    from processors.content_processor import ContentProcessor, IncrementalMarkdownConverter
+
+    processor = ContentProcessor(parser)
+    yield "full", processor.process_html_to_markdown(html)
+    yield "incremental", IncrementalMarkdownConverter(processor).convert_html(html, final=True)
+
+
+def main() -> None:
+    from processors.content_processor import ContentProcessor, available_parsers
+
+    parser = argparse.ArgumentParser(description="Check HTML to Markdown output against golden files")
+    parser.add_argument("--update", action="store_true", help="rewrite the golden files using html.parser")
+    args = parser.parse_args()
+
+    fixtures = sorted(glob.glob(os.path.join(FIXTURES, "*.html")))
+    if not fixtures:
+        sys.exit(f"No fixtures found in {FIXTURES}")
+
+    if args.update:
+        reference = ContentProcessor("html.parser")
+        for path in fixtures:
+            with open(path[:-5] + ".md", "w", encoding="utf-8", newline="") as f:
+                f.write(reference.process_html_to_markdown(_read(path)))
+            print(f"updated {os.path.basename(path)[:-5]}.md")
+        return
+
+    parsers = available_parsers()
+    print(f"parsers: {', '.join(parsers)}")
+    failures = 0
+    for path in fixtures:
+        name = os.path.basename(path)[:-5]
+        html = _read(path)
+        expected = _read(path[:-5] + ".md")
+
+        for parser_name in parsers:
+            for label, markdown in _conversions(parser_name, html):
+                if markdown == expected:
+                    print(f"  ok    {name:<16} {parser_name:<12} {label}")
+                    continue
+
+                failures += 1
+                print(f"  FAIL  {name:<16} {parser_name:<12} {label}")
+                diff = difflib.unified_diff(
+                    expected.splitlines(), markdown.splitlines(),
+                    f"{name}.md", f"{name} ({parser_name}, {label})", lineterm=""
+                )
+                for line in diff:
+                    print(f"        {line}")
+
+    if failures:
+        sys.exit(f"{failures} conversion(s) differ from the golden output")
+    print("all conversions match")
+
+
+if __name__ == "__main__":
+    main()
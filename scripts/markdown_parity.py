@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+IntenseRP Next - parity check between the in-page Markdown serializer and ContentProcessor
+
+Every fixture in scripts/fixtures/markdown is loaded into a headless browser
+as a DeepSeek message. The Markdown the page serializes (the whole message,
+and block by block through the message observer) must match what each
+installed parser makes of the same message's innerHTML. Needs a browser that
+seleniumbase can start. Run from the repository root:
+
+    python scripts/markdown_parity.py                  # headless Chrome
+    python scripts/markdown_parity.py --browser edge
+"""
+
+import argparse
+import difflib
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "markdown")
+
+_LOAD_MESSAGE_SCRIPT = """
+document.body.innerHTML = '<div class="ds-markdown ds-markdown--block"></div>';
+const message = document.body.firstChild;
+message.innerHTML = arguments[0];
+return message.innerHTML;
+"""
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def _browser_conversions(driver, pipeline):
+    """The message currently in the page as the browser serializes it, as (label, markdown)"""
+    from utils import deepseek_driver as deepseek
+
+    yield "page", pipeline.process_serialized_markdown(deepseek.get_last_message_markdown(driver, pipeline) or "")
+
+    message = deepseek.ObservedMessage()
+    if deepseek.watch_last_message(driver, pipeline):
+        try:
+            changes = deepseek.read_message_changes(driver, 0.1)
+            if changes:
+                message.apply(changes)
+        finally:
+            deepseek.unwatch_last_message(driver)
+    yield "observed", pipeline.create_markdown_stream().join_markdown(message.blocks, message.code_block, final=True)
+
+
+def main() -> None:
+    from seleniumbase import Driver
+    from pipeline.message_pipeline import MessagePipeline
+    from processors.content_processor import available_parsers
+
+    parser = argparse.ArgumentParser(description="Check the in-page Markdown serializer against ContentProcessor")
+    parser.add_argument("--browser", default="chrome", help="browser for seleniumbase to start (default: chrome)")
+    args = parser.parse_args()
+
+    fixtures = sorted(glob.glob(os.path.join(FIXTURES, "*.html")))
+    if not fixtures:
+        sys.exit(f"No fixtures found in {FIXTURES}")
+
+    parsers = available_parsers()
+    pipelines = {
+        name: MessagePipeline({"formatting": {"html_parser": name, "browser_markdown": True}})
+        for name in parsers
+    }
+    print(f"parsers: {', '.join(parsers)}")
+
+    driver = Driver(browser=args.browser, headless=True)
+    failures = 0
+    try:
+        driver.get("about:blank")
+        for path in fixtures:
+            name = os.path.basename(path)[:-5]
+            # Python gets the message as the page serializes it, so compare against that
+            page_html = driver.execute_script(_LOAD_MESSAGE_SCRIPT, _read(path))
+
+            for parser_name, pipeline in pipelines.items():
+                expected = pipeline.process_response_content(page_html)
+                for label, markdown in _browser_conversions(driver, pipeline):
+                    if markdown == expected:
+                        print(f"  ok    {name:<16} {parser_name:<12} {label}")
+                        continue
+
+                    failures += 1
+                    print(f"  FAIL  {name:<16} {parser_name:<12} {label}")
+                    diff = difflib.unified_diff(
+                        expected.splitlines(), markdown.splitlines(),
+                        f"{name} (python)", f"{name} ({parser_name}, {label})", lineterm=""
+                    )
+                    for line in diff:
+                        print(f"        {line}")
+    finally:
+        driver.quit()
+
+    if failures:
+        sys.exit(f"{failures} conversion(s) differ from ContentProcessor")
+    print("all conversions match")
+
+
+if __name__ == "__main__":
+    main()
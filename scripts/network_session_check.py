@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+IntenseRP Next - check that network stream batches are applied in order as they arrive
+
+The extension posts numbered stream batches over HTTP, and they can reach the
+API in any order and before the request they belong to has been bound to
+its session. Each case feeds a session batches and checks what the
+streaming response can read before the response ends. Run from the
+repository root:
+
+    python scripts/network_session_check.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def _batch(*seqs: int) -> list:
+    return [{'type': 'data', 'data': f"line {seq}", 'seq': seq} for seq in seqs]
+
+
+def _lines(session) -> list:
+    return [item['content'] for item in session.stream_buffer]
+
+
+def _first_batch_before_bind(registry):
+    session = registry.create("completion")
+    registry.bind("completion", "request-1")
+    session.add_batch(_batch(0, 1), "request-1")
+    # A regenerate: the new request's first batch beats its bind call
+    session.add_batch(_batch(0), "request-2")
+    registry.bind("completion", "request-2")
+    session.add_batch(_batch(1, 2), "request-2")
+    return _lines(session), ["line 0", "line 1", "line 0", "line 1", "line 2"]
+
+
+def _out_of_order(registry):
+    session = registry.create("completion")
+    registry.bind("completion", "request-1")
+    session.add_batch(_batch(2, 3), "request-1")
+    held = _lines(session)
+    session.add_batch(_batch(0, 1), "request-1")
+    return (held, _lines(session)), ([], ["line 0", "line 1", "line 2", "line 3"])
+
+
+def _late_batch_of_previous_request(registry):
+    session = registry.create("completion")
+    registry.bind("completion", "request-1")
+    session.add_batch(_batch(0), "request-1")
+    registry.bind("completion", "request-2")
+    session.add_batch(_batch(0), "request-2")
+    session.add_batch(_batch(1), "request-1")
+    session.add_batch(_batch(1), "request-2")
+    return _lines(session), ["line 0", "line 0", "line 1", "line 1"]
+
+
+def _gap_flushed_on_completion(registry):
+    session = registry.create("completion")
+    registry.bind("completion", "request-1")
+    session.add_batch(_batch(0, 2), "request-1")
+    session.complete()
+    return _lines(session), ["line 0", "line 2"]
+
+
+CASES = {
+    "first batch before bind": _first_batch_before_bind,
+    "out of order": _out_of_order,
+    "late previous request": _late_batch_of_previous_request,
+    "gap at completion": _gap_flushed_on_completion,
+}
+
+
+def main() -> None:
+    from core.network_sessions import NetworkSessionRegistry
+
+    failures = 0
+    for name, case in CASES.items():
+        got, expected = case(NetworkSessionRegistry())
+        if got == expected:
+            print(f"  ok    {name}")
+            continue
+        failures += 1
+        print(f"  FAIL  {name}\n        expected {expected}\n        got      {got}")
+
+    if failures:
+        sys.exit(f"{failures} case(s) failed")
+    print("all batches applied in order")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+IntenseRP Next - check that resent chat histories reuse their formatted messages
+
+A history longer than the segment cache's starting size is formatted, then
+sent again with the character's reply and a new user turn, for every
+formatting preset. The resend must format only those two turns and give the
+same prompt as a fresh pipeline. Run from the repository root:
+
+    python scripts/segment_cache_check.py
+    python scripts/segment_cache_check.py --messages 5000
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def _chat(messages: int) -> list:
+    """A group chat: a character card, then named users and the character taking turns, ending on a user"""
+    chat = [{"role": "system", "content": 'DATA1: "Ayla" DATA2: "Sam"\nAyla is a travelling botanist.'}]
+    # An odd number of turns, so the last one is a user's
+    for index in range(messages - 1 if messages % 2 == 0 else messages - 2):
+        if index % 2:
+            chat.append({"role": "assistant", "content": f"*nods* Turn {index}, the path bends north."})
+        else:
+            chat.append({"role": "user", "name": ("Sam", "Kit", "Lee")[index % 3], "content": f"Turn {index}: what now?"})
+    return chat
+
+
+def main() -> None:
+    from config.config_schema import get_default_config
+    from config.config_snapshot import ConfigSnapshot
+    from pipeline.message_pipeline import MessagePipeline
+    from processors.character_processor import CharacterProcessor, MessageFormatter, SegmentCache
+
+    parser = argparse.ArgumentParser(description="Check that resent histories reuse cached message segments")
+    parser.add_argument("--messages", type=int, default=SegmentCache().max_entries + 100, help="length of the resent history")
+    args = parser.parse_args()
+
+    chat = _chat(args.messages)
+    hidden = {"custom_user_template": "<{name}>{content}", "custom_char_template": "[{role}] {content}"}
+    failures = 0
+    for preset in list(MessageFormatter.PRESETS) + ["Custom"]:
+        config = get_default_config()
+        config["formatting"]["preset"] = preset
+        config = ConfigSnapshot(config, hidden)
+
+        def build(pipeline, messages):
+            request = pipeline.process_request({"messages": [dict(message) for message in messages]})
+            return pipeline.format_for_api(request)
+
+        pipeline = MessagePipeline(config)
+        cache = next(p for p in pipeline.pipeline.processors if isinstance(p, CharacterProcessor)).formatter.cache
+        build(pipeline, chat[:-2])
+        before = cache.get_stats()
+        prompt = build(pipeline, chat)
+        after = cache.get_stats()
+
+        misses = after['misses'] - before['misses']
+        hits = after['hits'] - before['hits']
+        matches = prompt == build(MessagePipeline(config), chat)
+        ok = misses == 2 and hits == len(chat) - 2 and matches
+        failures += not ok
+        print(f"  {'ok  ' if ok else 'FAIL'}  {preset:<16} {hits} hits  {misses} misses  {'same' if matches else 'different'} prompt")
+
+    if failures:
+        sys.exit(f"{failures} preset(s) did not reuse the resent history")
+    print("every resend reused the cached messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,28 +2,59 @@ from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 import utils.webdriver_utils as selenium
 import utils.deepseek_driver as deepseek
-import socket, time, threading, json
-from typing import Generator
+import utils.extension_channel as extension_channel
+import utils.metrics as metrics
+import os, socket, time, threading, json
+from typing import Callable, Generator, Iterator, List, Optional, Union
 from waitress import serve
-from core import get_state_manager, StateEvent
+from core import get_state_manager, StateEvent, BrowserPool, BrowserWorker, RequestQueue, QueueTicket, QueueFullError
+from core import NetworkSession, NetworkSessionRegistry, ResponseCache, CacheEntry, SingleFlight, Flight
 from pipeline.message_pipeline import MessagePipeline, ProcessingError
+from pipeline.process_pool import PipelineProcessPool
+from pipeline.profiling import PipelineProfiler
+from processors.stream_decoder import DeepSeekStreamDecoder
+from processors.response_stages import ResponseChain
 
 app = Flask(__name__)
 # Enable CORS for all routes to allow extension communication
 CORS(app, origins=["chrome-extension://*", "http://127.0.0.1:*", "http://localhost:*"])
 
-# Global storage for network interception data
-network_data = {
-    'request_data': None,
-    'response_started': False,
-    'stream_buffer': [],
-    'events': [],
-    'completed': False,
-    'error': None,
-    'thinking_active': False,
-    'thinking_buffer': "",
-    'thinking_started': False
-}
+# Network interception captures, one session per completion
+network_sessions = NetworkSessionRegistry()
+# Generations in progress that identical requests follow
+inflight = SingleFlight()
+# (deepthink, search) of the latest request, the guess for the next pre-warmed chat
+last_chat_options = (False, False)
+# Longest a network wait blocks before re-checking for interruptions (data wakes it immediately)
+NETWORK_WAIT_SLICE = 1.0
+# Request header that skips the response cache ("bypass")
+CACHE_BYPASS_HEADER = "X-IntenseRP-Cache"
+# Message pipeline every request shares, rebuilt from a new config snapshot when the config changes
+current_pipeline: Optional[MessagePipeline] = None
+pipeline_lock = threading.Lock()
+
+def _queue_gauge() -> dict:
+    queue = get_state_manager().request_queue
+    return {(): queue.get_stats().get("depth", 0)} if queue else {}
+
+def _pool_gauge() -> dict:
+    pool = get_state_manager().browser_pool
+    if not pool:
+        return {}
+    stats = pool.get_stats()
+    return {(("state", "total"),): stats.get("size", 0), (("state", "busy"),): stats.get("busy", 0)}
+
+metrics.registry.gauge("queue_depth", "Requests waiting for a browser", _queue_gauge)
+metrics.registry.gauge("browser_pool_workers", "Browser pool workers", _pool_gauge)
+
+def _cache_gauge() -> dict:
+    cache = get_state_manager().response_cache
+    if not cache:
+        return {}
+    stats = cache.get_stats()
+    return {(("value", "entries"),): stats["entries"], (("value", "bytes"),): stats["bytes"]}
+
+metrics.registry.gauge("response_cache", "Response cache entries and size in bytes", _cache_gauge)
 
 @app.route("/models", methods=["GET"])
 def model() -> Response:
@@ -41,6 +72,26 @@ def model() -> Response:
         print(f"Error connecting to API: {e}")
         return jsonify({}), 500
 
+@app.route("/queue", methods=["GET"])
+def queue_status() -> Response:
+    state = get_state_manager()
+    
+    if not state.request_queue:
+        return jsonify({}), 503
+    return jsonify(state.request_queue.get_stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint() -> Response:
+    return Response(metrics.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/debug/pipeline", methods=["GET"])
+def pipeline_debug() -> Response:
+    profiler = get_state_manager().pipeline_profiler
+    
+    if not profiler:
+        return jsonify({"error": {"message": "Processor profiling is disabled in the Performance Settings.", "type": "profiling_disabled"}}), 404
+    return jsonify(profiler.get_stats())
+
 @app.route("/chat/completions", methods=["POST"])
 def bot_response() -> Response:
     state = get_state_manager()
@@ -51,10 +102,7 @@ def bot_response() -> Response:
             print("Error: Empty data was received.")
             return jsonify({}), 503
 
-        # Initialize message pipeline with current config and config manager
-        config_with_manager = state.config or {}
-        config_with_manager['config_manager'] = state._config_manager
-        pipeline = MessagePipeline(config_with_manager)
+        pipeline = get_pipeline()
         
         # Process the request
         try:
@@ -62,6 +110,7 @@ def bot_response() -> Response:
             formatted_message = pipeline.format_for_api(processed_request)
         except ProcessingError as e:
             print(f"Error processing request: {e}")
+            metrics.ERRORS.inc(stage="processing")
             return jsonify({}), 503
 
         streaming = processed_request.stream
@@ -69,201 +118,648 @@ def bot_response() -> Response:
         if not formatted_message:
             print("Error: Data could not be processed.")
             return jsonify({}), 503
-        if not state.driver:
+        queue = state.request_queue
+        if not state.driver or not queue:
             print("Error: Selenium is not active.")
             return jsonify({}), 503
 
         current_message = state.increment_response_id()
+        environ = request.environ
 
-        state.show_message(f"\n[color:purple]GENERATING RESPONSE {current_message}:")
-        state.show_message("[color:white]- [color:green]Character data has been received.")
-        
-        # Log prefix usage
-        if processed_request.has_prefix():
-            state.show_message(f"[color:white]- [color:cyan]Prefix detected: {len(processed_request.prefix_content)} characters")
-        
-        # Check if network interception is enabled
-        intercept_network = state.get_config_value("models.deepseek.intercept_network", False)
-        
-        if intercept_network:
-            # Get send_thoughts setting - only applies when deepthink is enabled
-            send_thoughts = state.get_config_value("models.deepseek.send_thoughts", True) if processed_request.use_deepthink else False
-            return deepseek_network_response(
-                current_message, 
-                formatted_message, 
-                streaming, 
-                processed_request.use_deepthink,
-                processed_request.use_search,
-                processed_request.use_text_file,
-                pipeline,
-                processed_request.prefix_content,
-                send_thoughts
-            )
+        intercept_network = record_request(processed_request, formatted_message)
+        send_thoughts = get_send_thoughts(processed_request)
+        key = request_key(pipeline, processed_request, formatted_message, send_thoughts, intercept_network)
+
+        # Identical prompts are answered from the cache without a browser
+        cache_key = response_cache_key(request.headers, key)
+        cached = lookup_cached_response(current_message, cache_key)
+        if cached:
+            return create_cached_response(cached, streaming, pipeline)
+
+        # Identical prompts that are already generating are followed instead of started again
+        flight, leader = inflight.join(coalesce_key(key), current_message)
+        if not leader:
+            return create_follower_response(flight, current_message, streaming, pipeline)
+
+        # Followers keep the generation going when the first client leaves
+        disconnected = lambda: client_disconnected(environ) and flight.subscribers <= 1
+
+        # Wait in line for a free browser
+        try:
+            ticket = queue.submit(current_message)
+        except QueueFullError as e:
+            report_queue_full(current_message, e)
+            flight.abort(str(e))
+            response = jsonify({"error": {"message": str(e), "type": "queue_full"}})
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response, 429
+
+        worker = queue.wait(ticket, disconnected, queue_position_reporter(current_message))
+        metrics.QUEUE_WAIT.observe(ticket.wait_time)
+        if not worker:
+            report_queue_timeout(current_message, ticket)
+            flight.abort("Timed out waiting for a browser.")
+            return jsonify({"error": {"message": "Timed out waiting for a browser.", "type": "queue_timeout"}}), 503
+
+        timer = metrics.GenerationTimer("network" if intercept_network else "dom")
+
+        def finish_request() -> None:
+            timer.finish()
+            release_worker(queue, ticket)
+
+        try:
+            report_generation_start(current_message, ticket, worker, processed_request)
+            
+            if intercept_network:
+                result = deepseek_network_response(
+                    current_message, 
+                    worker,
+                    timer,
+                    formatted_message, 
+                    streaming, 
+                    processed_request.use_deepthink,
+                    processed_request.use_search,
+                    processed_request.use_text_file,
+                    pipeline,
+                    processed_request.prefix_content,
+                    send_thoughts,
+                    disconnected
+                )
+            else:
+                result = deepseek_response(
+                    current_message, 
+                    worker,
+                    timer,
+                    formatted_message, 
+                    streaming, 
+                    processed_request.use_deepthink,
+                    processed_request.use_search,
+                    processed_request.use_text_file,
+                    pipeline,
+                    processed_request.prefix_content,
+                    disconnected
+                )
+
+            result = cache_result(result, cache_key, timer)
+        except Exception as e:
+            timer.error("response")
+            finish_request()
+            flight.abort(str(e))
+            raise
+
+        # Give the browser back once the generation has ended for every follower
+        flight.on_finish(finish_request)
+        if isinstance(result, str):
+            lead_flight(flight, result)
+            response = create_response(result, streaming, pipeline)
         else:
-            return deepseek_response(
-                current_message, 
-                formatted_message, 
-                streaming, 
-                processed_request.use_deepthink,
-                processed_request.use_search,
-                processed_request.use_text_file,
-                pipeline,
-                processed_request.prefix_content
-            )
+            flight.set_source(result)
+            response = Response(flight.reader(lambda chunk: create_response_streaming(chunk, pipeline)), content_type="text/event-stream")
+
+        response.headers["X-Queue-Wait"] = f"{ticket.wait_time:.3f}"
+        return response
     except Exception as e:
         print(f"Error receiving JSON from Sillytavern: {e}")
+        metrics.ERRORS.inc(stage="request")
         return jsonify({}), 500
 
-def deepseek_response(
-    current_id: int, 
-    formatted_message: str, 
-    streaming: bool, 
-    deepthink: bool, 
-    search: bool, 
-    text_file: bool,
-    pipeline: MessagePipeline,
-    prefix_content: str = None
-) -> Response:
-    state = get_state_manager()
+def client_disconnected(environ: dict) -> bool:
+    """Check if the client of a waitress request has gone away"""
+    disconnect_checker = environ.get('waitress.client_disconnected')
+    return bool(disconnect_checker and disconnect_checker())
+
+# =============================================================================================================================
+# Completion Helpers (shared by the waitress and asyncio servers)
+# =============================================================================================================================
 
-    def client_disconnected() -> bool:
-        if not streaming:
-            disconnect_checker = request.environ.get('waitress.client_disconnected')
-            return disconnect_checker and disconnect_checker()
+class GenerationInterrupted(Exception):
+    """The request lost its browser or its client while the prompt was being sent"""
+
+def get_pipeline() -> MessagePipeline:
+    """The shared message pipeline (a plain read, it is only built on startup and config changes)"""
+    pipeline = current_pipeline
+    if pipeline is None:
+        pipeline = rebuild_pipeline()
+    return pipeline
+
+def rebuild_pipeline() -> MessagePipeline:
+    """Build the shared pipeline from the current config snapshot unless it already is"""
+    global current_pipeline
+    with pipeline_lock:
+        state = get_state_manager()
+        snapshot = state.config_snapshot
+        process_pool = state.process_pool
+        profiler = state.pipeline_profiler
+        if (current_pipeline is None
+                or current_pipeline.config_version != getattr(snapshot, "version", None)
+                or current_pipeline.process_pool is not process_pool
+                or current_pipeline.profiler is not profiler):
+            current_pipeline = MessagePipeline(snapshot, process_pool, profiler)
+        return current_pipeline
+
+def on_state_change(change) -> None:
+    """Rebuild the shared pipeline when the config is updated"""
+    if change.event_type == StateEvent.CONFIG_UPDATED:
+        update_pipeline_profiler()
+        rebuild_pipeline()
+
+def get_send_thoughts(processed_request) -> bool:
+    """send_thoughts only applies when deepthink is enabled"""
+    if not processed_request.use_deepthink:
         return False
-    
-    def interrupted() -> bool:
-        return current_id != state.last_response or state.driver is None or client_disconnected()
+    return get_state_manager().get_config_value("models.deepseek.send_thoughts", True)
+
+def record_request(processed_request, formatted_message: str) -> bool:
+    """Count a completion request in the metrics, returns whether it uses network interception"""
+    global last_chat_options
+    last_chat_options = (bool(processed_request.use_deepthink), bool(processed_request.use_search))
+    intercept_network = get_state_manager().get_config_value("models.deepseek.intercept_network", False)
+    metrics.REQUESTS.inc(
+        mode="network" if intercept_network else "dom",
+        deepthink=str(processed_request.use_deepthink).lower(),
+        search=str(processed_request.use_search).lower(),
+        streaming=str(bool(processed_request.stream)).lower()
+    )
+    metrics.PROMPT_CHARS.observe(len(formatted_message))
+    return intercept_network
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Build the response cache from the config, None when it is disabled"""
+    state = get_state_manager()
+    if not state.get_config_value("cache.enabled", False):
+        return None
+
+    path = None
+    if state.get_config_value("cache.persistent", True) and state._config_manager:
+        path = state._config_manager.storage_manager.get_path("executable", os.path.join("save", "response_cache"))
+    return ResponseCache(
+        max_bytes=get_int_config("cache.max_size_mb", 32) * 1024 * 1024,
+        ttl=get_int_config("cache.ttl", 3600),
+        path=path
+    )
+
+def create_process_pool() -> Optional[PipelineProcessPool]:
+    """Start the worker processes for large conversions and prompts, None when disabled"""
+    state = get_state_manager()
+    if not state.get_config_value("offload.enabled", False):
+        return None
+
+    pool = PipelineProcessPool(
+        workers=get_int_config("offload.workers", 2),
+        html_threshold=get_int_config("offload.html_threshold", 50000),
+        prompt_threshold=get_int_config("offload.prompt_threshold", 250000)
+    )
+    try:
+        pool.start()
+    except Exception as e:
+        print(f"Error starting process pool, processing inline: {e}")
+        return None
+    return pool
+
+def update_pipeline_profiler() -> Optional[PipelineProfiler]:
+    """Create, reconfigure or drop the processor profiler to match the config"""
+    state = get_state_manager()
+    if not state.get_config_value("profiling.enabled", False):
+        state.pipeline_profiler = None
+        return None
+
+    slow_threshold = get_int_config("profiling.slow_ms", 500) / 1000
+    sample_rate = min(max(get_int_config("profiling.sample_percent", 0), 0), 100) / 100
+    profiler = state.pipeline_profiler
+    if profiler:
+        # Keep what was collected so far
+        profiler.configure(slow_threshold, sample_rate)
+    else:
+        profiler = PipelineProfiler(slow_threshold, sample_rate)
+        state.pipeline_profiler = profiler
+    return profiler
+
+def request_key(pipeline: MessagePipeline, processed_request, formatted_message: str, send_thoughts: bool, intercept_network: bool) -> str:
+    """Hash of everything that decides a reply: the prompt, the DeepSeek flags and the post-processing settings"""
+    return ResponseCache.make_key(
+        pipeline.response_settings,
+        formatted_message,
+        processed_request.prefix_content,
+        processed_request.use_deepthink,
+        processed_request.use_search,
+        send_thoughts,
+        intercept_network
+    )
+
+def response_cache_key(headers, key: str) -> Optional[str]:
+    """Cache key of a request, None when the cache is off or the client asked to bypass it"""
+    if not get_state_manager().response_cache:
+        return None
+    if headers.get(CACHE_BYPASS_HEADER, "").lower() == "bypass" or "no-cache" in headers.get("Cache-Control", "").lower():
+        metrics.CACHE_LOOKUPS.inc(result="bypass")
+        return None
+    return key
+
+def coalesce_key(key: str) -> Optional[str]:
+    """Key identical in-flight requests share, None when coalescing is off"""
+    return key if get_state_manager().get_config_value("queue.coalesce", True) else None
+
+def lead_flight(flight: Flight, text: str) -> None:
+    """Hand a finished reply to the followers and leave the flight"""
+    if text:
+        flight.publish(text)
+    flight.finish()
+    flight.unsubscribe()
+
+def report_follower(flight: Flight, current_id: int) -> None:
+    state = get_state_manager()
+    metrics.COALESCED.inc()
+    state.show_message(f"\n[color:purple]REQUEST {current_id}:")
+    state.show_message(f"[color:white]- [color:cyan]Following identical request {flight.owner_id}.")
+
+def create_follower_response(flight: Flight, current_id: int, streaming: bool, pipeline: MessagePipeline) -> Response:
+    """Answer a request from the identical generation it joined"""
+    report_follower(flight, current_id)
+
+    if streaming:
+        return Response(flight.reader(lambda chunk: create_response_streaming(chunk, pipeline)), content_type="text/event-stream")
 
-    def safe_interrupt_response() -> Response:
-        deepseek.new_chat(state.driver)
-        return create_response("", streaming, pipeline)
+    text = "".join(flight.reader())
+    if flight.error and not text:
+        return jsonify({"error": {"message": flight.error, "type": "generation_failed"}}), 503
+    return create_response_jsonify(text, pipeline)
 
+def lookup_cached_response(current_id: int, key: Optional[str]) -> Optional[CacheEntry]:
+    state = get_state_manager()
+    cache = state.response_cache
+    if not key or not cache:
+        return None
+
+    entry = cache.get(key)
+    metrics.CACHE_LOOKUPS.inc(result="hit" if entry else "miss")
+    if entry:
+        state.show_message(f"\n[color:purple]CACHED RESPONSE {current_id}:")
+        state.show_message(f"[color:white]- [color:green]Replayed {len(entry.text)} characters from the cache.")
+    return entry
+
+def store_response(key: Optional[str], chunks: List[str], timer: metrics.GenerationTimer) -> None:
+    """Cache a reply that finished cleanly"""
+    cache = get_state_manager().response_cache
+    if key and cache and chunks and not timer.failed:
+        cache.put(key, chunks)
+
+def cache_result(result: Union[str, Iterator[str]], key: Optional[str], timer: metrics.GenerationTimer) -> Union[str, Iterator[str]]:
+    """Store a reply in the cache, streamed replies once their last chunk was sent"""
+    if not key:
+        return result
+    if isinstance(result, str):
+        store_response(key, [result] if result else [], timer)
+        return result
+    return _cache_chunks(result, key, timer)
+
+def _cache_chunks(chunks: Iterator[str], key: str, timer: metrics.GenerationTimer) -> Iterator[str]:
+    collected = []
     try:
-        if not selenium.current_page(state.driver, "https://chat.deepseek.com"):
-            state.show_message("[color:white]- [color:red]You must be on the DeepSeek website.")
-            return create_response("You must be on the DeepSeek website.", streaming, pipeline)
+        for chunk in chunks:
+            collected.append(chunk)
+            yield chunk
+    finally:
+        chunks.close()
+    # Only reached when the stream ran to its end (not on a client disconnect)
+    store_response(key, collected, timer)
 
-        if selenium.current_page(state.driver, "https://chat.deepseek.com/sign_in"):
-            state.show_message("[color:white]- [color:red]You must be logged into DeepSeek.")
-            return create_response("You must be logged into DeepSeek.", streaming, pipeline)
+def create_cached_response(entry: CacheEntry, streaming: bool, pipeline: MessagePipeline) -> Response:
+    """Replay a cached reply, as SSE chunks at full speed for streaming clients"""
+    if streaming:
+        response = Response("".join(create_response_streaming(chunk, pipeline) for chunk in entry.chunks), content_type="text/event-stream")
+    else:
+        response = create_response_jsonify(entry.text, pipeline)
+    response.headers[CACHE_BYPASS_HEADER] = "hit"
+    return response
 
-        if interrupted():
-            return safe_interrupt_response()
+def report_queue_full(current_id: int, error: QueueFullError) -> None:
+    state = get_state_manager()
+    metrics.ERRORS.inc(stage="queue_full")
+    state.show_message(f"\n[color:purple]REQUEST {current_id} REJECTED:")
+    state.show_message(f"[color:white]- [color:red]Queue is full, retry after {error.retry_after}s.")
+
+def queue_position_reporter(current_id: int) -> Callable[[int, float], None]:
+    def report_position(position: int, estimated_wait: float) -> None:
+        get_state_manager().show_message(f"[color:white]- [color:yellow]Request {current_id} queued at position {position} (~{estimated_wait:.0f}s).")
+    return report_position
+
+def report_queue_timeout(current_id: int, ticket) -> None:
+    metrics.ERRORS.inc(stage="queue_timeout")
+    get_state_manager().show_message(f"[color:white]- [color:red]Request {current_id} left the queue after {ticket.wait_time:.1f}s.")
+
+def report_generation_start(current_id: int, ticket, worker: BrowserWorker, processed_request) -> None:
+    state = get_state_manager()
+    state.show_message(f"\n[color:purple]GENERATING RESPONSE {current_id}:")
+    if ticket.wait_time >= 0.5:
+        state.show_message(f"[color:white]- [color:cyan]Waited {ticket.wait_time:.1f}s in queue.")
+    if state.browser_pool.max_size > 1:
+        state.show_message(f"[color:white]- [color:cyan]Assigned to browser: {worker.name}")
+    state.show_message("[color:white]- [color:green]Character data has been received.")
+    
+    # Log prefix usage
+    if processed_request.has_prefix():
+        state.show_message(f"[color:white]- [color:cyan]Prefix detected: {len(processed_request.prefix_content)} characters")
+
+def send_prompt(
+    worker: BrowserWorker,
+    timer: metrics.GenerationTimer,
+    formatted_message: str,
+    deepthink: bool,
+    search: bool,
+    text_file: bool,
+    prefix_content: Optional[str],
+    interrupted: Callable[[], bool],
+    session: Optional[NetworkSession] = None
+) -> Optional[str]:
+    """Blocking Selenium steps before generation: check the page, configure the chat and paste the prompt
+
+    Returns an error message for the client, or None once the prompt is sent.
+    Raises GenerationInterrupted when the request is cancelled in between.
+    """
+    state = get_state_manager()
+    driver = worker.driver
+
+    if not selenium.current_page(driver, "https://chat.deepseek.com"):
+        state.show_message("[color:white]- [color:red]You must be on the DeepSeek website.")
+        timer.error("page")
+        return "You must be on the DeepSeek website."
+
+    if selenium.current_page(driver, "https://chat.deepseek.com/sign_in"):
+        state.show_message("[color:white]- [color:red]You must be logged into DeepSeek.")
+        timer.error("login")
+        return "You must be logged into DeepSeek."
+
+    if interrupted():
+        raise GenerationInterrupted()
+
+    if session:
+        deepseek.enable_network_interception(driver, session.session_id, worker.name)
+        state.show_message("[color:white]- [color:cyan]CDP network interception enabled.")
 
-        deepseek.configure_chat(state.driver, deepthink, search)
+    if use_prepared_chat(worker, deepthink, search):
+        state.show_message("[color:white]- [color:cyan]Using pre-warmed chat.")
+    else:
         state.show_message("[color:white]- [color:cyan]Chat reset and configured.")
 
-        if interrupted():
-            return safe_interrupt_response()
+    if interrupted():
+        raise GenerationInterrupted()
+
+    if not deepseek.send_chat_message(driver, formatted_message, text_file, prefix_content):
+        state.show_message("[color:white]- [color:red]Could not paste prompt.")
+        timer.error("send")
+        return "Could not paste prompt."
+
+    state.show_message("[color:white]- [color:green]Prompt pasted and sent.")
+
+    if interrupted():
+        raise GenerationInterrupted()
+    return None
+
+def use_prepared_chat(worker: BrowserWorker, deepthink: bool, search: bool) -> bool:
+    """Configure the chat for a request, reusing the chat pre-warmed after the last one when possible"""
+    driver = worker.driver
+    prepared, worker.prepared = worker.prepared, None
+
+    if prepared is None:
+        metrics.PREWARM.inc(result="miss")
+    elif not deepseek.is_chat_empty(driver):
+        metrics.PREWARM.inc(result="stale")
+    else:
+        # Only the toggles can differ from the guess, the empty chat is still fine
+        metrics.PREWARM.inc(result="hit" if prepared == (deepthink, search) else "toggled")
+        if prepared != (deepthink, search):
+            deepseek.set_chat_options(driver, deepthink, search)
+        return True
+
+    deepseek.configure_chat(driver, deepthink, search)
+    return False
+
+def release_worker(queue: RequestQueue, ticket: QueueTicket) -> None:
+    """Give a request's browser back, preparing the next chat first when pre-warming is on"""
+    worker = ticket.worker
+    if not worker or not get_state_manager().get_config_value("pool.prewarm", True):
+        queue.complete(ticket)
+        return
+    threading.Thread(target=prewarm_chat, args=(queue, ticket, worker), daemon=True).start()
+
+def prewarm_chat(queue: RequestQueue, ticket: QueueTicket, worker: BrowserWorker) -> None:
+    """Open an empty chat toggled like the last request, keeping the worker until it is ready"""
+    options = last_chat_options
+    try:
+        driver = worker.driver
+        if driver and selenium.current_page(driver, "https://chat.deepseek.com") and not selenium.current_page(driver, "https://chat.deepseek.com/sign_in"):
+            deepseek.configure_chat(driver, *options)
+            worker.prepared = options
+    except Exception as e:
+        worker.prepared = None
+        print(f"Error pre-warming chat: {e}")
+    finally:
+        queue.complete(ticket)
+
+def stop_network_capture(worker: BrowserWorker, current_id: int) -> None:
+    """Disable interception in a worker's browser and drop the request's capture session"""
+    deepseek.disable_network_interception(worker.driver, worker.name)
+    network_sessions.close(current_id)
+
+def decode_network_items(items: List[dict], decoder: DeepSeekStreamDecoder, chain: ResponseChain, timer: metrics.GenerationTimer) -> List[str]:
+    """Decode newly captured stream items into the text chunks sent to streaming clients"""
+    chunks = []
+    for item in items:
+        if item['type'] != 'data':
+            continue
+        timer.extension_chunk(item.get('timestamp'))
+        content = item['content']
+        if content:
+            for delta in decoder.feed(content):
+                chunk = chain.feed_delta(delta)
+                if chunk:
+                    timer.content(chunk)
+                    chunks.append(chunk)
+    return chunks
+
+def finish_network_stream(session: NetworkSession, decoder: DeepSeekStreamDecoder, chain: ResponseChain, timer: metrics.GenerationTimer) -> List[str]:
+    """Closing chunks of a network stream: an open thinking section, held back text and any capture error"""
+    chunks = []
+    # If thinking mode is still active at stream end, close it, then flush the post-processing stages
+    for delta in decoder.finish():
+        chunks.append(chain.feed_delta(delta))
+    chunks.append(chain.finish())
+    chunks = [chunk for chunk in chunks if chunk]
+    for chunk in chunks:
+        timer.content(chunk)
+
+    if session.error:
+        timer.error("network")
+        chunks.append(f"Error: {session.error}")
+    return chunks
+
+def network_response_text(session: NetworkSession, chain: ResponseChain, timer: metrics.GenerationTimer) -> str:
+    """Build the non-streaming reply of a finished capture session"""
+    state = get_state_manager()
+    for item in session.stream_buffer:
+        timer.extension_chunk(item.get('timestamp'))
 
-        if not deepseek.send_chat_message(state.driver, formatted_message, text_file, prefix_content):
-            state.show_message("[color:white]- [color:red]Could not paste prompt.")
-            return create_response("Could not paste prompt.", streaming, pipeline)
+    if session.error:
+        timer.error("network")
+        return f"Error: {session.error}"
 
-        state.show_message("[color:white]- [color:green]Prompt pasted and sent.")
+    # Combine all stream data
+    state.show_message(f"[color:cyan]Combining {len(session.stream_buffer)} stream items...")
+    response_text = combine_network_stream_data(session, chain)
+    timer.content(response_text)
+    state.show_message(f"[color:cyan]Final combined response length: {len(response_text)}")
+    return response_text
 
-        if interrupted():
-            return safe_interrupt_response()
+# =============================================================================================================================
+# Response Generation
+# =============================================================================================================================
+
+def deepseek_response(
+    current_id: int, 
+    worker: BrowserWorker,
+    timer: metrics.GenerationTimer,
+    formatted_message: str, 
+    streaming: bool, 
+    deepthink: bool, 
+    search: bool, 
+    text_file: bool,
+    pipeline: MessagePipeline,
+    prefix_content: str = None,
+    disconnected: Callable[[], bool] = lambda: False
+) -> Union[str, Iterator[str]]:
+    """Generate a reply by reading the DeepSeek page, returns the full text or a generator of streamed chunks"""
+    state = get_state_manager()
+    driver = worker.driver
+
+    def interrupted() -> bool:
+        return not worker.owns(current_id) or (not streaming and disconnected())
+
+    try:
+        error = send_prompt(worker, timer, formatted_message, deepthink, search, text_file, prefix_content, interrupted)
+        if error is not None:
+            return error
 
-        if not deepseek.active_generate_response(state.driver):
+        if not deepseek.active_generate_response(driver):
             state.show_message("[color:white]- [color:red]No response generated.")
-            return create_response("No response generated.", streaming, pipeline)
+            timer.error("generate")
+            return "No response generated."
 
         if interrupted():
-            return safe_interrupt_response()
+            raise GenerationInterrupted()
 
         state.show_message("[color:white]- [color:cyan]Awaiting response.")
         last_sent_position = 0
-        last_content_hash = None
-        stable_content = None
 
         if streaming:
             def streaming_response() -> Generator[str, None, None]:
-                nonlocal last_sent_position, last_content_hash, stable_content
-                hybrid_mode = False  # Flag to track when we switch to hybrid mode
+                nonlocal last_sent_position
+                # Only blocks that changed since the last read are converted again
+                converter = pipeline.create_markdown_stream()
+                chain = pipeline.create_response_chain()
+                # Follow the message through the in-page observer, polling the page only without it
+                observing = deepseek.watch_last_message(driver, pipeline)
+                message = deepseek.ObservedMessage() if observing else None
+                
+                def convert_observed(final: bool = False) -> str:
+                    # Blocks come as Markdown when the page serializes them, HTML otherwise
+                    if message.markdown:
+                        return converter.join_markdown(message.blocks, message.code_block, final)
+                    return converter.convert(message.blocks, final)
                 
                 try:
-                    while deepseek.is_response_generating(state.driver):
+                    while True:
                         if interrupted():
                             break
 
-                        current_text = deepseek.get_last_message(state.driver, pipeline)
-                        if not current_text:
-                            time.sleep(0.2)
-                            continue
-                        
-                        # Check for code blocks in raw HTML to determine if we should switch to hybrid mode
-                        if not hybrid_mode:
-                            raw_html = deepseek.get_last_message_raw_html(state.driver)
-                            if raw_html and deepseek.has_code_block_in_html(raw_html):
-                                hybrid_mode = True
-                                state.show_message("[color:white]- [color:yellow]Code block detected, switching to hybrid mode...")
-                        
-                        # Generate hash to detect content changes vs processing artifacts
-                        current_hash = deepseek._get_content_hash(current_text)
+                        if message:
+                            changes = deepseek.read_message_changes(driver)
+                            if changes is None:
+                                # The observer is gone (page reloaded), poll from here on
+                                message = None
+                                continue
+                            if not message.apply(changes):
+                                if not message.generating:
+                                    break
+                                continue
+                            current_text = convert_observed()
+                        else:
+                            if not deepseek.is_response_generating(driver):
+                                break
+                            current_text = converter.convert_html(deepseek.get_last_message_raw_html(driver))
                         
-                        # Handle content hash changes (real content updates)
-                        if current_hash != last_content_hash:
-                            last_content_hash = current_hash
-                            stable_content = current_text
-                            
-                            # Only send incremental content if NOT in hybrid mode
-                            if not hybrid_mode and len(current_text) > last_sent_position:
-                                new_content = current_text[last_sent_position:]
-                                last_sent_position = len(current_text)
-                                yield create_response_streaming(new_content, pipeline)
+                        # Unfinished code blocks stay open, so the text only grows while streaming
+                        if len(current_text) > last_sent_position:
+                            new_content = chain.feed(current_text[last_sent_position:])
+                            last_sent_position = len(current_text)
+                            if new_content:
+                                timer.content(new_content)
+                                yield new_content
                         
-                        time.sleep(0.2)
+                        if not message:
+                            time.sleep(0.2)
 
                     if interrupted():
-                        return safe_interrupt_response()
+                        timer.error("interrupted")
+                        deepseek.new_chat(driver)
+                        return
 
                     # Final processing - get the complete response
-                    final_text = deepseek.wait_for_response_completion(state.driver, pipeline)
-                    
-                    if final_text:
-                        # Send any remaining content based on position
-                        if len(final_text) > last_sent_position:
-                            final_content = final_text[last_sent_position:]
-                            if final_content:
-                                yield create_response_streaming(final_content, pipeline)
+                    if message and deepseek.settle_observed_message(driver, message):
+                        final_text = convert_observed(final=True)
+                    else:
+                        final_text = deepseek.wait_for_response_completion(driver, pipeline)
                     
-                    # Send closing symbol if needed
-                    closing = pipeline.get_closing_symbol(final_text) if final_text else ""
-                    if closing:
-                        yield create_response_streaming(closing, pipeline)
+                    # Send any remaining content based on position, then what the stages held back
+                    final_content = ""
+                    if final_text and len(final_text) > last_sent_position:
+                        final_content = chain.feed(final_text[last_sent_position:])
+                    final_content += chain.finish()
+                    if final_content:
+                        timer.content(final_content)
+                        yield final_content
                     
                     state.show_message("[color:white]- [color:green]Completed.")
                 except GeneratorExit:
-                    deepseek.new_chat(state.driver)
+                    deepseek.new_chat(driver)
                 
                 except Exception as e:
-                    deepseek.new_chat(state.driver)
+                    deepseek.new_chat(driver)
                     print(f"Streaming error: {e}")
+                    timer.error("stream")
                     state.show_message("[color:white]- [color:red]Unknown error occurred.")
-                    yield create_response_streaming("Error receiving response.", pipeline)
-            return Response(streaming_response(), content_type="text/event-stream")
+                    yield "Error receiving response."
+                finally:
+                    if observing:
+                        deepseek.unwatch_last_message(driver)
+            return streaming_response()
         else:
-            final_text = deepseek.wait_for_response_completion(state.driver, pipeline)
+            final_text = deepseek.wait_for_response_completion(driver, pipeline)
             
             if interrupted():
-                return safe_interrupt_response()
+                raise GenerationInterrupted()
             
-            response_text = final_text if final_text else "Error receiving response."
-            closing = pipeline.get_closing_symbol(final_text) if final_text else ""
-            response = response_text + closing
+            response = pipeline.create_response_chain().run(final_text) if final_text else "Error receiving response."
+            if final_text:
+                timer.content(response)
+            else:
+                timer.error("generate")
             
             state.show_message("[color:white]- [color:green]Completed.")
-            return create_response_jsonify(response, pipeline)
-    
+            return response
+
+    except GenerationInterrupted:
+        deepseek.new_chat(driver)
+        return ""
     except Exception as e:
         print(f"Error generating response: {e}")
+        timer.error("response")
         state.show_message("[color:white]- [color:red]Unknown error occurred.")
-        return create_response("Error receiving response.", streaming, pipeline)
+        return "Error receiving response."
 
 def deepseek_network_response(
     current_id: int, 
+    worker: BrowserWorker,
+    timer: metrics.GenerationTimer,
     formatted_message: str, 
     streaming: bool, 
     deepthink: bool, 
@@ -271,68 +767,24 @@ def deepseek_network_response(
     text_file: bool,
     pipeline: MessagePipeline,
     prefix_content: str = None,
-    send_thoughts: bool = True
-) -> Response:
+    send_thoughts: bool = True,
+    disconnected: Callable[[], bool] = lambda: False
+) -> Union[str, Iterator[str]]:
     """Handle DeepSeek response using network interception instead of DOM scraping"""
     state = get_state_manager()
+    driver = worker.driver
 
-    def client_disconnected() -> bool:
-        if not streaming:
-            disconnect_checker = request.environ.get('waitress.client_disconnected')
-            return disconnect_checker and disconnect_checker()
-        return False
-    
     def interrupted() -> bool:
-        return current_id != state.last_response or state.driver is None or client_disconnected()
+        return not worker.owns(current_id) or (not streaming and disconnected())
 
-    def safe_interrupt_response() -> Response:
-        deepseek.new_chat(state.driver)
-        deepseek.disable_network_interception(state.driver)
-        return create_response("", streaming, pipeline)
+    # Open a fresh capture session for this request
+    session = network_sessions.create(current_id)
 
     try:
-        if not selenium.current_page(state.driver, "https://chat.deepseek.com"):
-            state.show_message("[color:white]- [color:red]You must be on the DeepSeek website.")
-            return create_response("You must be on the DeepSeek website.", streaming, pipeline)
-
-        if selenium.current_page(state.driver, "https://chat.deepseek.com/sign_in"):
-            state.show_message("[color:white]- [color:red]You must be logged into DeepSeek.")
-            return create_response("You must be logged into DeepSeek.", streaming, pipeline)
-
-        if interrupted():
-            return safe_interrupt_response()
-
-        # Reset network data for new request
-        network_data['request_data'] = None
-        network_data['response_started'] = False
-        network_data['stream_buffer'] = []
-        network_data['events'] = []
-        network_data['completed'] = False
-        network_data['error'] = None
-        network_data['thinking_active'] = False
-        network_data['thinking_buffer'] = ""
-        network_data['thinking_started'] = False
-        
-        # Enable network interception
-        deepseek.enable_network_interception(state.driver)
-        state.show_message("[color:white]- [color:cyan]CDP network interception enabled.")
-
-        # Configure chat and send message
-        deepseek.configure_chat(state.driver, deepthink, search)
-        state.show_message("[color:white]- [color:cyan]Chat reset and configured.")
-
-        if interrupted():
-            return safe_interrupt_response()
-
-        if not deepseek.send_chat_message(state.driver, formatted_message, text_file, prefix_content):
-            state.show_message("[color:white]- [color:red]Could not paste prompt.")
-            deepseek.disable_network_interception(state.driver)
-            return create_response("Could not paste prompt.", streaming, pipeline)
-
-        state.show_message("[color:white]- [color:green]Prompt pasted and sent.")
-
-        if interrupted():
-            return safe_interrupt_response()
+        error = send_prompt(worker, timer, formatted_message, deepthink, search, text_file, prefix_content, interrupted, session)
+        if error is not None:
+            stop_network_capture(worker, current_id)
+            return error
 
         # Wait for network data to be received
         state.show_message("[color:white]- [color:cyan]Waiting for network response...")
@@ -344,407 +796,87 @@ def deepseek_network_response(
                     timeout = 30  # 30 second timeout
                     start_time = time.time()
                     
-                    while not network_data['response_started']:
+                    while not session.wait_for_start(NETWORK_WAIT_SLICE):
                         if interrupted() or time.time() - start_time > timeout:
                             break
-                        time.sleep(0.1)
                     
-                    if not network_data['response_started']:
-                        yield create_response_streaming("Error: Network response did not start", pipeline)
+                    if not session.response_started:
+                        timer.error("network_start")
+                        yield "Error: Network response did not start"
                         return
                     
-                    # Stream the data as it arrives
+                    # Stream the data as it arrives, the handlers wake us up on every chunk
+                    decoder = DeepSeekStreamDecoder()
+                    chain = pipeline.create_response_chain(network=True, send_thoughts=send_thoughts)
                     last_processed_index = 0
-                    finish_event_received = False
                     timeout_start = time.time()
                     max_total_time = 300  # 5 minutes absolute timeout
                     
-                    while not finish_event_received:
+                    while True:
                         if interrupted() or time.time() - timeout_start > max_total_time:
+                            timer.error("interrupted" if interrupted() else "timeout")
                             break
                         
-                        # Process new stream data
-                        stream_buffer = network_data['stream_buffer']
-                        current_buffer_length = len(stream_buffer)
-                        
-                        for i in range(last_processed_index, current_buffer_length):
-                            item = stream_buffer[i]
-                            if item['type'] == 'data':
-                                content = item['content']
-                                if content:
-                                    # Parse streaming data with immediate forwarding
-                                    chunks = parse_network_stream_data_for_streaming(content, send_thoughts)
-                                    for chunk in chunks:
-                                        if chunk:
-                                            yield create_response_streaming(chunk, pipeline)
+                        # Check for the end before taking the new items so none are missed
+                        stream_done = session.done
+                        new_items = session.wait_for_data(last_processed_index, NETWORK_WAIT_SLICE)
                         
-                        last_processed_index = current_buffer_length
+                        yield from decode_network_items(new_items, decoder, chain, timer)
+                        last_processed_index += len(new_items)
                         
-                        # Check for finish event
-                        events = network_data['events']
-                        for event in events:
-                            if event.get('event') == 'finish':
-                                finish_event_received = True
-                                break
-                            
-                        time.sleep(0.1)
-                    
-                    # If thinking mode is still active at stream end, close it (only if send_thoughts is enabled)
-                    if network_data['thinking_active'] and send_thoughts:
-                        yield create_response_streaming("\n</think>\n\n", pipeline)
-                    # Reset thinking state regardless of send_thoughts setting
-                    if network_data['thinking_active']:
-                        network_data['thinking_active'] = False
-                        network_data['thinking_started'] = False
-                    
-                    # Check for errors
-                    if network_data['error']:
-                        yield create_response_streaming(f"Error: {network_data['error']}", pipeline)
+                        if stream_done and not new_items:
+                            break
                     
+                    yield from finish_network_stream(session, decoder, chain, timer)
                     state.show_message("[color:white]- [color:green]Network response completed.")
                     
                 except GeneratorExit:
-                    deepseek.disable_network_interception(state.driver)
-                    deepseek.new_chat(state.driver)
+                    deepseek.disable_network_interception(driver, worker.name)
+                    deepseek.new_chat(driver)
                 except Exception as e:
-                    deepseek.disable_network_interception(state.driver)
-                    deepseek.new_chat(state.driver)
+                    deepseek.disable_network_interception(driver, worker.name)
+                    deepseek.new_chat(driver)
                     print(f"Network streaming error: {e}")
+                    timer.error("stream")
                     state.show_message("[color:white]- [color:red]Network streaming error occurred.")
-                    yield create_response_streaming("Error receiving network response.", pipeline)
+                    yield "Error receiving network response."
                 finally:
-                    deepseek.disable_network_interception(state.driver)
+                    stop_network_capture(worker, current_id)
                     
-            return Response(network_streaming_response(), content_type="text/event-stream")
+            return network_streaming_response()
         else:
             # Non-streaming mode
             timeout = 300  # 5 minutes timeout to match streaming mode
             start_time = time.time()
             
-            while not network_data['completed']:
+            while not session.wait_for_completion(NETWORK_WAIT_SLICE):
                 if interrupted() or time.time() - start_time > timeout:
+                    timer.error("interrupted" if interrupted() else "timeout")
                     break
-                time.sleep(0.1)
             
-            if network_data['error']:
-                response_text = f"Error: {network_data['error']}"
-            else:
-                # Combine all stream data
-                state.show_message(f"[color:cyan]Combining {len(network_data['stream_buffer'])} stream items...")
-                response_text = combine_network_stream_data(network_data['stream_buffer'], send_thoughts)
-                state.show_message(f"[color:cyan]Final combined response length: {len(response_text)}")
-            
-            deepseek.disable_network_interception(state.driver)
+            chain = pipeline.create_response_chain(network=True, send_thoughts=send_thoughts)
+            response_text = network_response_text(session, chain, timer)
+            stop_network_capture(worker, current_id)
             state.show_message("[color:white]- [color:green]Network response completed.")
-            return create_response_jsonify(response_text, pipeline)
+            return response_text
     
+    except GenerationInterrupted:
+        deepseek.new_chat(driver)
+        stop_network_capture(worker, current_id)
+        return ""
     except Exception as e:
         print(f"Error in network response: {e}")
+        timer.error("response")
         state.show_message("[color:white]- [color:red]Network response error occurred.")
-        deepseek.disable_network_interception(state.driver)
-        return create_response("Error receiving network response.", streaming, pipeline)
-
-def parse_network_stream_data_for_streaming(data: str, send_thoughts: bool = True) -> list:
-    """Parse network stream data for streaming mode, returning list of chunks to send immediately"""
-    try:
-        chunks = []
-        
-        # Handle different types of data
-        if data.startswith('{'):
-            # JSON data
-            import json
-            json_data = json.loads(data)
-            
-            # Handle DeepSeek specific format
-            if 'v' in json_data:
-                path = json_data.get('p')
-                content_value = json_data['v']
-                
-                # Handle thinking content start
-                if path == 'response/thinking_content':
-                    if send_thoughts:
-                        if not network_data['thinking_active']:
-                            # Starting thinking mode - send opening <think> tag
-                            chunks.append("<think>\n")
-                            network_data['thinking_active'] = True
-                            network_data['thinking_started'] = True
-                        
-                        # Send thinking content immediately
-                        if isinstance(content_value, str):
-                            chunks.append(content_value)
-                        elif isinstance(content_value, list):
-                            for item in content_value:
-                                if isinstance(item, dict) and 'v' in item:
-                                    chunks.append(str(item['v']))
-                    else:
-                        # Track thinking state but don't send content
-                        if not network_data['thinking_active']:
-                            network_data['thinking_active'] = True
-                            network_data['thinking_started'] = True
-                
-                # Handle regular content start - this ends thinking mode
-                elif path == 'response/content':
-                    # If we were in thinking mode, close it first (only if send_thoughts is enabled)
-                    if network_data['thinking_active']:
-                        if send_thoughts:
-                            chunks.append("\n</think>\n\n")
-                        # Reset thinking state
-                        network_data['thinking_active'] = False
-                        network_data['thinking_started'] = False
-                    
-                    # Send regular content immediately
-                    if isinstance(content_value, str):
-                        chunks.append(content_value)
-                    elif isinstance(content_value, list):
-                        for item in content_value:
-                            if isinstance(item, dict) and 'v' in item and item.get('p') == 'response/content':
-                                chunks.append(str(item['v']))
-                
-                # Handle continuation chunks (no path specified)
-                elif path is None:
-                    # If we're in thinking mode and send_thoughts is enabled, send thinking content
-                    if network_data['thinking_active'] and send_thoughts:
-                        if isinstance(content_value, str):
-                            chunks.append(content_value)
-                        elif isinstance(content_value, list):
-                            for item in content_value:
-                                if isinstance(item, dict) and 'v' in item:
-                                    chunks.append(str(item['v']))
-                    # Send content as regular content only if not in thinking mode
-                    elif not network_data['thinking_active']:
-                        if isinstance(content_value, str):
-                            chunks.append(content_value)
-                        elif isinstance(content_value, list):
-                            for item in content_value:
-                                if isinstance(item, dict) and 'v' in item:
-                                    chunks.append(str(item['v']))
-                    # If thinking mode is active but send_thoughts is disabled, ignore content completely
-                
-                # Handle batch operations
-                elif path == 'response' and json_data.get('o') == 'BATCH':
-                    if isinstance(content_value, list):
-                        for item in content_value:
-                            if isinstance(item, dict) and 'v' in item:
-                                item_path = item.get('p')
-                                if item_path == 'response/thinking_content':
-                                    if send_thoughts:
-                                        if not network_data['thinking_active']:
-                                            chunks.append("<think>\n")
-                                            network_data['thinking_active'] = True
-                                            network_data['thinking_started'] = True
-                                        chunks.append(str(item['v']))
-                                    else:
-                                        # Track thinking state but don't send content
-                                        if not network_data['thinking_active']:
-                                            network_data['thinking_active'] = True
-                                            network_data['thinking_started'] = True
-                                elif item_path == 'response/content':
-                                    # If we were in thinking mode, close it first (only if send_thoughts is enabled)
-                                    if network_data['thinking_active']:
-                                        if send_thoughts:
-                                            chunks.append("\n</think>\n\n")
-                                        network_data['thinking_active'] = False
-                                        network_data['thinking_started'] = False
-                                    chunks.append(str(item['v']))
-            
-            # Handle simple content updates (fallback) - only if not in thinking mode
-            elif 'v' in json_data and not network_data['thinking_active']:
-                content = json_data['v']
-                if isinstance(content, str):
-                    chunks.append(content)
-                elif isinstance(content, list):
-                    for item in content:
-                        if isinstance(item, dict) and 'v' in item:
-                            chunks.append(str(item['v']))
-            
-            # Handle complex response structure - only if not in thinking mode
-            elif 'response' in json_data and 'content' in json_data['response'] and not network_data['thinking_active']:
-                chunks.append(json_data['response']['content'])
-        else:
-            # Plain text data
-            chunks.append(data)
-        
-        return chunks
-    except Exception as e:
-        print(f"Error parsing network stream data for streaming: {e}")
-        return []
-
-def parse_network_stream_data(data: str, send_thoughts: bool = True) -> str:
-    """Parse network stream data to extract content, handling thinking content with <think> tags"""
-    try:
-        # Handle different types of data
-        if data.startswith('{'):
-            # JSON data
-            import json
-            json_data = json.loads(data)
-            
-            # Handle DeepSeek specific format
-            if 'v' in json_data:
-                path = json_data.get('p')
-                content_value = json_data['v']
-                
-                # Handle thinking content start
-                if path == 'response/thinking_content':
-                    if send_thoughts:
-                        if not network_data['thinking_active']:
-                            # Starting thinking mode
-                            network_data['thinking_active'] = True
-                            network_data['thinking_buffer'] = ""
-                            network_data['thinking_started'] = True
-                        
-                        # Accumulate thinking content
-                        if isinstance(content_value, str):
-                            network_data['thinking_buffer'] += content_value
-                        elif isinstance(content_value, list):
-                            for item in content_value:
-                                if isinstance(item, dict) and 'v' in item:
-                                    network_data['thinking_buffer'] += str(item['v'])
-                    else:
-                        # Track thinking state but don't accumulate content
-                        if not network_data['thinking_active']:
-                            network_data['thinking_active'] = True
-                            network_data['thinking_started'] = True
-                    
-                    # Return empty string while accumulating/ignoring thinking content
-                    return ""
-                
-                # Handle regular content start - this ends thinking mode
-                elif path == 'response/content':
-                    result = ""
-                    
-                    # If we were in thinking mode, wrap and flush the thinking buffer (only if send_thoughts is enabled)
-                    if network_data['thinking_active']:
-                        if send_thoughts:
-                            thinking_content = network_data['thinking_buffer'].strip()
-                            if thinking_content:
-                                result = f"<think>\n{thinking_content}\n</think>\n\n"
-                        
-                        # Reset thinking state
-                        network_data['thinking_active'] = False
-                        network_data['thinking_buffer'] = ""
-                        network_data['thinking_started'] = False
-                    
-                    # Add regular content
-                    if isinstance(content_value, str):
-                        result += content_value
-                    elif isinstance(content_value, list):
-                        for item in content_value:
-                            if isinstance(item, dict) and 'v' in item and item.get('p') == 'response/content':
-                                result += str(item['v'])
-                    
-                    return result
-                
-                # Handle continuation chunks (no path specified)
-                elif path is None:
-                    # If we're in thinking mode, accumulate this content as thinking (only if send_thoughts is enabled)
-                    if network_data['thinking_active']:
-                        if send_thoughts:
-                            if isinstance(content_value, str):
-                                network_data['thinking_buffer'] += content_value
-                            elif isinstance(content_value, list):
-                                for item in content_value:
-                                    if isinstance(item, dict) and 'v' in item:
-                                        network_data['thinking_buffer'] += str(item['v'])
-                        # Return empty while accumulating/ignoring thinking content
-                        return ""
-                    else:
-                        # Not in thinking mode, treat as regular content
-                        if isinstance(content_value, str):
-                            return content_value
-                        elif isinstance(content_value, list):
-                            result = ""
-                            for item in content_value:
-                                if isinstance(item, dict) and 'v' in item:
-                                    result += str(item['v'])
-                            return result
-                
-                # Handle batch operations
-                elif path == 'response' and json_data.get('o') == 'BATCH':
-                    if isinstance(content_value, list):
-                        result = ""
-                        thinking_content_found = False
-                        regular_content_found = False
-                        
-                        # Check for thinking content in batch
-                        for item in content_value:
-                            if isinstance(item, dict) and 'v' in item:
-                                item_path = item.get('p')
-                                if item_path == 'response/thinking_content':
-                                    thinking_content_found = True
-                                    if send_thoughts:
-                                        if not network_data['thinking_active']:
-                                            network_data['thinking_active'] = True
-                                            network_data['thinking_buffer'] = ""
-                                            network_data['thinking_started'] = True
-                                        network_data['thinking_buffer'] += str(item['v'])
-                                    else:
-                                        # Track thinking state but don't accumulate content
-                                        if not network_data['thinking_active']:
-                                            network_data['thinking_active'] = True
-                                            network_data['thinking_started'] = True
-                                elif item_path == 'response/content':
-                                    regular_content_found = True
-                                    # If we were in thinking mode, flush it first (only if send_thoughts is enabled)
-                                    if network_data['thinking_active']:
-                                        if send_thoughts:
-                                            thinking_content = network_data['thinking_buffer'].strip()
-                                            if thinking_content:
-                                                result += f"<think>\n{thinking_content}\n</think>\n\n"
-                                        
-                                        # Reset thinking state
-                                        network_data['thinking_active'] = False
-                                        network_data['thinking_buffer'] = ""
-                                        network_data['thinking_started'] = False
-                                    
-                                    result += str(item['v'])
-                        
-                        return result
-            
-            # Handle simple content updates (fallback)
-            elif 'v' in json_data:
-                content = json_data['v']
-                if isinstance(content, str):
-                    return content
-                elif isinstance(content, list):
-                    result = ""
-                    for item in content:
-                        if isinstance(item, dict) and 'v' in item:
-                            result += str(item['v'])
-                    return result
-            
-            # Handle complex response structure
-            elif 'response' in json_data and 'content' in json_data['response']:
-                return json_data['response']['content']
-            
-            return ""
-        else:
-            # Plain text data
-            return data
-    except Exception as e:
-        print(f"Error parsing network stream data: {e}")
-        return ""
+        stop_network_capture(worker, current_id)
+        return "Error receiving network response."
 
-def combine_network_stream_data(stream_buffer: list, send_thoughts: bool = True) -> str:
-    """Combine all network stream data into a single response"""
+def combine_network_stream_data(session: NetworkSession, chain: ResponseChain) -> str:
+    """Combine all network stream data of a session into a single response"""
     try:
-        result = ""
-        for item in stream_buffer:
-            if item['type'] == 'data':
-                content = parse_network_stream_data(item['content'], send_thoughts)
-                if content:
-                    result += content
-        
-        # Check if there's any remaining thinking content to flush (only if send_thoughts is enabled)
-        if send_thoughts and network_data['thinking_active'] and network_data['thinking_buffer'].strip():
-            thinking_content = network_data['thinking_buffer'].strip()
-            result += f"<think>\n{thinking_content}\n</think>\n\n"
-            
-            # Reset thinking state
-            network_data['thinking_active'] = False
-            network_data['thinking_buffer'] = ""
-            network_data['thinking_started'] = False
-        
-        return result
+        decoder = DeepSeekStreamDecoder()
+        lines = [item['content'] for item in session.stream_buffer if item['type'] == 'data']
+        return "".join(chain.feed_delta(delta) for delta in decoder.decode_all(lines)) + chain.finish()
     except Exception as e:
         print(f"Error combining network stream data: {e}")
         return "Error processing network response."
@@ -753,112 +885,94 @@ def combine_network_stream_data(stream_buffer: list, send_thoughts: bool = True)
 # Network Interception Routes
 # =============================================================================================================================
 
-@app.route("/network/request", methods=["POST"])
-def network_request():
-    """Handle network request data from extension"""
-    try:
-        data = request.get_json()
-        if data:
-            network_data['request_data'] = data
-            network_data['response_started'] = False
-            network_data['stream_buffer'] = []
-            network_data['events'] = []
-            network_data['completed'] = False
-            network_data['error'] = None
-            network_data['thinking_active'] = False
-            network_data['thinking_buffer'] = ""
-            network_data['thinking_started'] = False
-            print(f"[color:cyan]Network request intercepted: {data.get('requestId', 'unknown')}")
-        return jsonify({"status": "received"}), 200
-    except Exception as e:
-        print(f"Error handling network request: {e}")
-        return jsonify({"error": str(e)}), 500
-
-@app.route("/network/response-start", methods=["POST"])
-def network_response_start():
-    """Handle response start data from extension"""
-    try:
-        data = request.get_json()
-        if data:
-            network_data['response_started'] = True
-            print(f"[color:cyan]Network response started: {data.get('requestId', 'unknown')}")
-        return jsonify({"status": "received"}), 200
-    except Exception as e:
-        print(f"Error handling network response start: {e}")
-        return jsonify({"error": str(e)}), 500
-
-@app.route("/network/response-end", methods=["POST"])
-def network_response_end():
-    """Handle response end data from extension"""
-    try:
-        data = request.get_json()
-        if data:
-            network_data['completed'] = True
-            print(f"[color:cyan]Network response completed: {data.get('requestId', 'unknown')}")
-        return jsonify({"status": "received"}), 200
-    except Exception as e:
-        print(f"Error handling network response end: {e}")
-        return jsonify({"error": str(e)}), 500
-
-@app.route("/network/response-error", methods=["POST"])
-def network_response_error():
-    """Handle response error data from extension"""
-    try:
-        data = request.get_json()
-        if data:
-            network_data['error'] = data.get('error', 'Unknown error')
-            network_data['completed'] = True
-            print(f"[color:red]Network response error: {data.get('error', 'Unknown')}")
-        return jsonify({"status": "received"}), 200
-    except Exception as e:
-        print(f"Error handling network response error: {e}")
-        return jsonify({"error": str(e)}), 500
-
-@app.route("/network/stream-data", methods=["POST"])
-def network_stream_data():
-    """Handle streaming data from extension"""
-    try:
-        data = request.get_json()
-        if data and 'data' in data:
-            # Always append to buffer - streaming mode determined by response generator
-            network_data['stream_buffer'].append({
-                'type': 'data',
-                'content': data['data'],
-                'timestamp': data.get('timestamp', time.time() * 1000)
-            })
-        return jsonify({"status": "received"}), 200
-    except Exception as e:
-        print(f"Error handling network stream data: {e}")
-        return jsonify({"error": str(e)}), 500
+def find_network_session(data: dict) -> Optional[NetworkSession]:
+    """Find the capture session an extension message belongs to"""
+    if not data:
+        return None
+    return network_sessions.resolve(data.get('sessionId'), data.get('requestId'))
+
+# Handlers shared by the HTTP routes and the extension WebSocket channel
+
+def handle_network_request(data: dict) -> str:
+    if not data:
+        return "received"
+    session = network_sessions.bind(data.get('sessionId'), data.get('requestId'))
+    if not session:
+        print(f"[color:yellow]Ignoring network request without an active session: {data.get('requestId', 'unknown')}")
+        return "ignored"
+    session.request_data = data
+    print(f"[color:cyan]Network request intercepted: {data.get('requestId', 'unknown')}")
+    return "received"
+
+def handle_network_response_start(data: dict) -> str:
+    session = find_network_session(data)
+    if session:
+        session.start_response()
+        print(f"[color:cyan]Network response started: {data.get('requestId', 'unknown')}")
+    return "received"
+
+def handle_network_response_end(data: dict) -> str:
+    session = find_network_session(data)
+    if session:
+        session.complete()
+        print(f"[color:cyan]Network response completed: {data.get('requestId', 'unknown')}")
+    return "received"
+
+def handle_network_response_error(data: dict) -> str:
+    session = find_network_session(data)
+    if session:
+        session.complete(data.get('error', 'Unknown error'))
+        print(f"[color:red]Network response error: {data.get('error', 'Unknown')}")
+    return "received"
+
+def handle_network_stream_data(data: dict) -> str:
+    session = find_network_session(data)
+    if session and 'data' in data:
+        # Always append to buffer - streaming mode determined by response generator
+        session.add_data(data['data'], data.get('timestamp', time.time() * 1000))
+    return "received"
+
+def handle_network_stream_event(data: dict) -> str:
+    session = find_network_session(data)
+    if session and 'event' in data:
+        session.add_event(data['event'], data.get('timestamp', time.time() * 1000))
+    return "received"
+
+def handle_network_stream_batch(data: dict) -> str:
+    session = find_network_session(data)
+    if session and isinstance(data.get('items'), list):
+        session.add_batch(data['items'], data.get('requestId'))
+    return "received"
+
+def handle_network_debug_log(data: dict) -> str:
+    if data and 'message' in data:
+        state = get_state_manager()
+        state.show_message(f"[color:yellow]EXT: {data['message']}")
+    return "received"
+
+# Extension message types (the /network/<type> path) and their handlers
+NETWORK_HANDLERS = {
+    'request': handle_network_request,
+    'response-start': handle_network_response_start,
+    'response-end': handle_network_response_end,
+    'response-error': handle_network_response_error,
+    'stream-data': handle_network_stream_data,
+    'stream-event': handle_network_stream_event,
+    'stream-batch': handle_network_stream_batch,
+    'debug-log': handle_network_debug_log,
+}
 
-@app.route("/network/stream-event", methods=["POST"])
-def network_stream_event():
-    """Handle streaming events from extension"""
-    try:
-        data = request.get_json()
-        if data and 'event' in data:
-            network_data['events'].append({
-                'type': 'event',
-                'event': data['event'],
-                'timestamp': data.get('timestamp', time.time() * 1000)
-            })
-        return jsonify({"status": "received"}), 200
-    except Exception as e:
-        print(f"Error handling network stream event: {e}")
-        return jsonify({"error": str(e)}), 500
+@app.route("/network/<message_type>", methods=["POST"])
+def network_message(message_type: str):
+    """Handle interception callbacks sent by the extension over HTTP"""
+    handler = NETWORK_HANDLERS.get(message_type)
+    if not handler:
+        return jsonify({"error": f"Unknown network message: {message_type}"}), 404
 
-@app.route("/network/debug-log", methods=["POST"])
-def network_debug_log():
-    """Handle debug logs from extension"""
     try:
-        data = request.get_json()
-        if data and 'message' in data:
-            state = get_state_manager()
-            state.show_message(f"[color:yellow]EXT: {data['message']}")
-        return jsonify({"status": "received"}), 200
+        return jsonify({"status": handler(request.get_json())}), 200
     except Exception as e:
-        state = get_state_manager()
-        state.show_message(f"[color:red]Error handling debug log: {e}")
+        print(f"Error handling network {message_type}: {e}")
         return jsonify({"error": str(e)}), 500
 
 # =============================================================================================================================
@@ -867,18 +981,25 @@ def network_debug_log():
 
 def get_model_response() -> Response:
     """Get model information response"""
-    return jsonify({
+    return jsonify(model_list())
+
+def model_list() -> dict:
+    return {
         "object": "list",
         "data": [{
             "id": "intense-rp-next-1",
             "object": "model",
             "created": int(time.time() * 1000)
         }]
-    })
+    }
 
 def create_response_jsonify(text: str, pipeline: MessagePipeline) -> Response:
     """Create JSON response"""
-    return jsonify({
+    return jsonify(completion_body(text))
+
+def completion_body(text: str) -> dict:
+    """Body of a non-streaming chat completion"""
+    return {
         "id": "chatcmpl-intenserp",
         "object": "chat.completion",
         "created": int(time.time() * 1000),
@@ -888,7 +1009,7 @@ def create_response_jsonify(text: str, pipeline: MessagePipeline) -> Response:
             "message": {"role": "assistant", "content": text},
             "finish_reason": "stop"
         }]
-    })
+    }
 
 def create_response_streaming(text: str, pipeline: MessagePipeline) -> str:
     """Create streaming response chunk"""
@@ -922,6 +1043,10 @@ def run_services() -> None:
         config = state.config
         browser = state.get_config_value("browser", "Chrome")
         
+        # Open the extension WebSocket before any browser so extensions can connect right away
+        if state.get_config_value("models.deepseek.intercept_network", False) and state.get_config_value("models.deepseek.extension_websocket", True):
+            extension_channel.start_extension_channel(int(state.get_config_value("api.port", 5000)) + 1, NETWORK_HANDLERS)
+
         # Initialize webdriver with config for persistent cookies support
         state.driver = selenium.initialize_webdriver(browser, "https://chat.deepseek.com/sign_in", config)
         
@@ -929,28 +1054,29 @@ def run_services() -> None:
             threading.Thread(target=monitor_driver, args=(current_driver_id,), daemon=True).start()
 
             # Check if we're already logged in (persistent cookies might have us logged in)
-            try:
-                import time
-                time.sleep(2)  # Give page time to load
-                current_url = state.driver.get_current_url()
-                already_logged_in = not current_url.endswith("/sign_in")
-                
-                if already_logged_in:
-                    print("[color:green]Already logged in via persistent cookies!")
-                else:
-                    # Get DeepSeek config using new system for auto-login
-                    auto_login = state.get_config_value("models.deepseek.auto_login", False)
-                    if auto_login:
-                        email = state.get_config_value("models.deepseek.email", "")
-                        password = state.get_config_value("models.deepseek.password", "")
-                        if email and password:
-                            print("[color:cyan]Attempting auto-login...")
-                            deepseek.login(state.driver, email, password)
-                        else:
-                            print("[color:yellow]Auto-login enabled but email/password not configured")
-            except Exception as e:
-                print(f"[color:red]Error during login check: {e}")
-                # Continue anyway
+            login_if_needed(state.driver)
+
+            # Start the browser pool with the primary browser as its first worker
+            pool = BrowserPool(
+                launcher=lambda profile_name: launch_pooled_browser(browser, config, profile_name),
+                min_size=get_int_config("pool.min_size", 1),
+                max_size=get_int_config("pool.max_size", 1),
+                idle_timeout=get_int_config("pool.idle_timeout", 300),
+                health_check=selenium.is_browser_open,
+                closer=lambda driver: driver.quit()
+            )
+            pool.start(state.driver)
+            state.browser_pool = pool
+            state.response_cache = create_response_cache()
+            state.process_pool = create_process_pool()
+            update_pipeline_profiler()
+            state.subscribe(on_state_change)
+            rebuild_pipeline()
+            state.request_queue = RequestQueue(
+                pool,
+                max_depth=get_int_config("queue.max_depth", 16),
+                deadline=get_int_config("queue.deadline", 300)
+            )
 
             state.clear_messages()
             state.show_message("[color:red]API IS NOW ACTIVE!")
@@ -966,7 +1092,15 @@ def run_services() -> None:
                 state.show_message(f"[color:yellow]URL 2: [color:white]http://{ip}:{api_port}/")
 
             state.is_running = True
-            serve(app, host="0.0.0.0", port=api_port, channel_request_lookahead=1)
+            if state.get_config_value("api.server", "Waitress") == "Asyncio":
+                import api_asgi
+                # Selenium calls of every browser plus one DOM stream each
+                if api_asgi.run_asgi_server("0.0.0.0", int(api_port), pool.max_size * 2):
+                    return
+
+            # Every parallel stream holds a thread, keep spare ones for extension callbacks
+            threads = max(4, pool.max_size * 2 + 2)
+            serve(app, host="0.0.0.0", port=api_port, channel_request_lookahead=1, threads=threads)
         else:
             state.show_message("[color:red]Selenium failed to start.")
     except Exception as e:
@@ -974,6 +1108,46 @@ def run_services() -> None:
     finally:
         state.is_running = False
 
+def login_if_needed(driver) -> None:
+    """Auto-login to DeepSeek unless persistent cookies already did it"""
+    state = get_state_manager()
+    try:
+        time.sleep(2)  # Give page time to load
+        current_url = driver.get_current_url()
+        already_logged_in = not current_url.endswith("/sign_in")
+        
+        if already_logged_in:
+            print("[color:green]Already logged in via persistent cookies!")
+        else:
+            # Get DeepSeek config using new system for auto-login
+            auto_login = state.get_config_value("models.deepseek.auto_login", False)
+            if auto_login:
+                email = state.get_config_value("models.deepseek.email", "")
+                password = state.get_config_value("models.deepseek.password", "")
+                if email and password:
+                    print("[color:cyan]Attempting auto-login...")
+                    deepseek.login(driver, email, password)
+                else:
+                    print("[color:yellow]Auto-login enabled but email/password not configured")
+    except Exception as e:
+        print(f"[color:red]Error during login check: {e}")
+        # Continue anyway
+
+def launch_pooled_browser(browser: str, config: dict, profile_name: str):
+    """Launch an additional browser for the pool with its own profile"""
+    driver = selenium.initialize_webdriver(browser, "https://chat.deepseek.com/sign_in", config, profile_name)
+    if driver:
+        login_if_needed(driver)
+    return driver
+
+def get_int_config(key: str, default: int) -> int:
+    """Read an integer config value that may have been stored as text"""
+    state = get_state_manager()
+    try:
+        return int(state.get_config_value(key, default))
+    except (TypeError, ValueError):
+        return default
+
 def monitor_driver(driver_id: int) -> None:
     state = get_state_manager()
     print("Starting browser detection.")
@@ -982,6 +1156,8 @@ def monitor_driver(driver_id: int) -> None:
         if state.driver and not selenium.is_browser_open(state.driver):
             state.clear_messages()
             state.show_message("[color:red]Browser connection lost!")
+            if state.browser_pool:
+                state.browser_pool.discard_driver(state.driver)
             state.driver = None
             break
         time.sleep(2)
@@ -989,8 +1165,20 @@ def monitor_driver(driver_id: int) -> None:
 def close_selenium() -> None:
     state = get_state_manager()
     try:
+        extension_channel.stop_extension_channel()
+        import api_asgi
+        api_asgi.stop_asgi_server()
+        if state.request_queue:
+            state.request_queue.shutdown()
+            state.request_queue = None
+        if state.browser_pool:
+            state.browser_pool.shutdown()
+            state.browser_pool = None
+        if state.process_pool:
+            state.process_pool.shutdown()
+            state.process_pool = None
         if state.driver:
             state.driver.quit()
             state.driver = None
     except Exception:
-        pass
\ No newline at end of file
+        pass
\ No newline at end of file
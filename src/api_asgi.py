@@ -0,0 +1,601 @@
+"""
+IntenseRP Next - asyncio server mode
+
+An optional alternative to waitress built on Starlette and uvicorn. Network
+interception streams, extension callbacks and disconnect checks run as
+coroutines on one event loop, so an idle stream no longer holds a server
+thread. Blocking Selenium calls go to a dedicated executor sized to the
+browser pool; DOM streams keep polling the page there, one per browser.
+Producers publish into a request flight and every identical request reads
+it back as a coroutine.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+import api
+import utils.deepseek_driver as deepseek
+import utils.metrics as metrics
+from core import get_state_manager, BrowserWorker, NetworkSession, QueueFullError, Flight
+from pipeline.message_pipeline import MessagePipeline, ProcessingError
+from processors.stream_decoder import DeepSeekStreamDecoder
+from processors.response_stages import ResponseChain
+
+# Same limits as the waitress handlers in api.py
+NETWORK_START_TIMEOUT = 30
+NETWORK_TIMEOUT = 300
+DISCONNECT_POLL = 1.0
+
+_server = None
+_selenium_executor: Optional[ThreadPoolExecutor] = None
+# Threads blocked in RequestQueue.wait, kept apart from the default executor used for prompt building
+_queue_executor: Optional[ThreadPoolExecutor] = None
+# Keeps network stream tasks alive until they end
+_producers = set()
+
+
+def run_asgi_server(host: str, port: int, selenium_threads: int) -> bool:
+    """Serve the API with uvicorn until stopped, False if the packages are missing"""
+    global _server, _selenium_executor, _queue_executor
+    try:
+        import uvicorn
+        app = create_app()
+    except ImportError as e:
+        print(f"[color:yellow]Asyncio server not available, using waitress: {e}")
+        return False
+
+    _selenium_executor = ThreadPoolExecutor(max_workers=max(2, selenium_threads), thread_name_prefix="selenium")
+    # Every queued request and every request being handed a browser can wait at the same time
+    waiters = api.get_int_config("queue.max_depth", 16) + api.get_int_config("pool.max_size", 1)
+    _queue_executor = ThreadPoolExecutor(max_workers=max(2, waiters), thread_name_prefix="queue")
+    _server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+    print(f"[color:cyan]Serving the API with asyncio ({selenium_threads} Selenium threads)")
+    try:
+        _server.run()
+    finally:
+        _selenium_executor.shutdown(wait=False)
+        _queue_executor.shutdown(wait=False, cancel_futures=True)
+        _server = None
+    return True
+
+
+def stop_asgi_server() -> None:
+    if _server:
+        _server.should_exit = True
+
+
+def create_app():
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.routing import Route
+
+    return Starlette(
+        routes=[
+            Route("/models", models, methods=["GET"]),
+            Route("/queue", queue_status, methods=["GET"]),
+            Route("/metrics", metrics_endpoint, methods=["GET"]),
+            Route("/debug/pipeline", pipeline_debug, methods=["GET"]),
+            Route("/chat/completions", chat_completions, methods=["POST"]),
+            Route("/network/{message_type}", network_message, methods=["POST"]),
+        ],
+        middleware=[
+            # Same origins as the Flask CORS setup
+            Middleware(
+                CORSMiddleware,
+                allow_origin_regex=r"^(chrome-extension://.*|http://(127\.0\.0\.1|localhost)(:\d+)?)$",
+                allow_methods=["*"],
+                allow_headers=["*"]
+            )
+        ]
+    )
+
+
+async def run_selenium(func: Callable, *args):
+    """Run a blocking Selenium call on the dedicated executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_selenium_executor, functools.partial(func, *args))
+
+
+async def wait_for_worker(queue, ticket, disconnected: Callable[[], bool], on_position: Callable):
+    """Wait for the ticket's browser on the queue executor, which may take up to the queue deadline"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_queue_executor, queue.wait, ticket, disconnected, on_position)
+
+
+async def _read_json(request) -> Optional[dict]:
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+# =============================================================================================================================
+# Routes
+# =============================================================================================================================
+
+async def models(request):
+    from starlette.responses import JSONResponse
+    state = get_state_manager()
+
+    if not state.driver:
+        return JSONResponse({}, status_code=503)
+
+    state.show_message("\n[color:purple]API CONNECTION:")
+    state.show_message("[color:white]- [color:green]Successful connection.")
+    return JSONResponse(api.model_list())
+
+
+async def queue_status(request):
+    from starlette.responses import JSONResponse
+    state = get_state_manager()
+
+    if not state.request_queue:
+        return JSONResponse({}, status_code=503)
+    return JSONResponse(state.request_queue.get_stats())
+
+
+async def metrics_endpoint(request):
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def pipeline_debug(request):
+    from starlette.responses import JSONResponse
+    profiler = get_state_manager().pipeline_profiler
+
+    if not profiler:
+        return JSONResponse({"error": {"message": "Processor profiling is disabled in the Performance Settings.", "type": "profiling_disabled"}}, status_code=404)
+    return JSONResponse(profiler.get_stats())
+
+
+async def network_message(request):
+    """Extension callbacks are cheap and never block, so they run on the loop"""
+    from starlette.responses import JSONResponse
+    message_type = request.path_params["message_type"]
+    handler = api.NETWORK_HANDLERS.get(message_type)
+    if not handler:
+        return JSONResponse({"error": f"Unknown network message: {message_type}"}, status_code=404)
+
+    try:
+        return JSONResponse({"status": handler(await _read_json(request))})
+    except Exception as e:
+        print(f"Error handling network {message_type}: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def chat_completions(request):
+    from starlette.background import BackgroundTask
+    from starlette.responses import JSONResponse, Response, StreamingResponse
+    state = get_state_manager()
+
+    try:
+        data = await _read_json(request)
+        if not data:
+            print("Error: Empty data was received.")
+            return JSONResponse({}, status_code=503)
+
+        pipeline = api.get_pipeline()
+
+        # Formatting is pure CPU work, keep it off the event loop
+        try:
+            processed_request, formatted_message = await asyncio.to_thread(_process_request, pipeline, data)
+        except ProcessingError as e:
+            print(f"Error processing request: {e}")
+            metrics.ERRORS.inc(stage="processing")
+            return JSONResponse({}, status_code=503)
+
+        streaming = processed_request.stream
+
+        if not formatted_message:
+            print("Error: Data could not be processed.")
+            return JSONResponse({}, status_code=503)
+        queue = state.request_queue
+        if not state.driver or not queue:
+            print("Error: Selenium is not active.")
+            return JSONResponse({}, status_code=503)
+
+        current_message = state.increment_response_id()
+        intercept_network = api.record_request(processed_request, formatted_message)
+        send_thoughts = api.get_send_thoughts(processed_request)
+        key = api.request_key(pipeline, processed_request, formatted_message, send_thoughts, intercept_network)
+
+        cache_key = api.response_cache_key(request.headers, key)
+        cached = api.lookup_cached_response(current_message, cache_key)
+        if cached:
+            headers = {api.CACHE_BYPASS_HEADER: "hit"}
+            if streaming:
+                return Response("".join(api.create_response_streaming(chunk, pipeline) for chunk in cached.chunks), media_type="text/event-stream", headers=headers)
+            return JSONResponse(api.completion_body(cached.text), headers=headers)
+
+        flight, leader = api.inflight.join(api.coalesce_key(key), current_message)
+        if not leader:
+            return await follower_response(flight, current_message, streaming, pipeline)
+
+        try:
+            ticket = queue.submit(current_message)
+        except QueueFullError as e:
+            api.report_queue_full(current_message, e)
+            flight.abort(str(e))
+            return JSONResponse(
+                {"error": {"message": str(e), "type": "queue_full"}},
+                status_code=429,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
+        watcher = DisconnectWatcher(request)
+        # Followers keep the generation going when the first client leaves
+        disconnected = lambda: watcher.is_set() and flight.subscribers <= 1
+        try:
+            worker = await wait_for_worker(queue, ticket, disconnected, api.queue_position_reporter(current_message))
+            metrics.QUEUE_WAIT.observe(ticket.wait_time)
+            if not worker:
+                api.report_queue_timeout(current_message, ticket)
+                flight.abort("Timed out waiting for a browser.")
+                return JSONResponse({"error": {"message": "Timed out waiting for a browser.", "type": "queue_timeout"}}, status_code=503)
+
+            timer = metrics.GenerationTimer("network" if intercept_network else "dom")
+
+            def finish_request() -> None:
+                timer.finish()
+                api.release_worker(queue, ticket)
+
+            # Set once every reader has left, producers stop early on it
+            cancelled = threading.Event()
+            flight.on_abandon(cancelled.set)
+
+            try:
+                api.report_generation_start(current_message, ticket, worker, processed_request)
+                if intercept_network:
+                    result = await network_response(
+                        current_message, worker, timer, formatted_message, streaming,
+                        processed_request, pipeline.create_response_chain(network=True, send_thoughts=send_thoughts),
+                        disconnected, flight, cancelled, cache_key
+                    )
+                else:
+                    result = await run_selenium(
+                        api.deepseek_response,
+                        current_message,
+                        worker,
+                        timer,
+                        formatted_message,
+                        streaming,
+                        processed_request.use_deepthink,
+                        processed_request.use_search,
+                        processed_request.use_text_file,
+                        pipeline,
+                        processed_request.prefix_content,
+                        disconnected
+                    )
+                if result is not flight:
+                    result = api.cache_result(result, cache_key, timer)
+            except Exception as e:
+                timer.error("response")
+                finish_request()
+                flight.abort(str(e))
+                raise
+        finally:
+            # Streaming responses detect disconnects themselves
+            watcher.stop()
+
+        # Give the browser back once the generation has ended for every follower
+        flight.on_finish(finish_request)
+        headers = {"X-Queue-Wait": f"{ticket.wait_time:.3f}"}
+        if isinstance(result, str):
+            api.lead_flight(flight, result)
+            if streaming:
+                return Response(api.create_response_streaming(result, pipeline), media_type="text/event-stream", headers=headers)
+            return JSONResponse(api.completion_body(result), headers=headers)
+
+        if result is not flight:
+            _publish_blocking(flight, result, cancelled)
+
+        reader = FlightStream(flight, lambda chunk: api.create_response_streaming(chunk, pipeline))
+        return StreamingResponse(
+            reader.chunks(),
+            media_type="text/event-stream",
+            headers=headers,
+            # Runs even when the client left before the body started
+            background=BackgroundTask(reader.close)
+        )
+    except Exception as e:
+        print(f"Error receiving JSON from Sillytavern: {e}")
+        metrics.ERRORS.inc(stage="request")
+        return JSONResponse({}, status_code=500)
+
+
+def _process_request(pipeline: MessagePipeline, data: dict):
+    processed_request = pipeline.process_request(data)
+    return processed_request, pipeline.format_for_api(processed_request)
+
+
+async def follower_response(flight: Flight, current_id: int, streaming: bool, pipeline: MessagePipeline):
+    """Answer a request from the identical generation it joined"""
+    from starlette.background import BackgroundTask
+    from starlette.responses import JSONResponse, StreamingResponse
+    api.report_follower(flight, current_id)
+
+    if streaming:
+        reader = FlightStream(flight, lambda chunk: api.create_response_streaming(chunk, pipeline))
+        return StreamingResponse(reader.chunks(), media_type="text/event-stream", background=BackgroundTask(reader.close))
+
+    text = "".join([chunk async for chunk in FlightStream(flight).chunks()])
+    if flight.error and not text:
+        return JSONResponse({"error": {"message": flight.error, "type": "generation_failed"}}, status_code=503)
+    return JSONResponse(api.completion_body(text))
+
+# =============================================================================================================================
+# Streaming Helpers
+# =============================================================================================================================
+
+class DisconnectWatcher:
+    """Polls an ASGI request for a disconnect so blocking code can check a plain flag"""
+
+    def __init__(self, request):
+        self._event = threading.Event()
+        self._task = asyncio.create_task(self._watch(request))
+
+    async def _watch(self, request) -> None:
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL)
+        self._event.set()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def stop(self) -> None:
+        self._task.cancel()
+
+
+class FlightStream:
+    """Reads a request flight from the event loop, holding one seat on it"""
+
+    def __init__(self, flight: Flight, render: Optional[Callable[[str], str]] = None):
+        self._flight = flight
+        self._render = render
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self._closed = False
+        flight.add_listener(self._on_change)
+
+    def _on_change(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass
+
+    async def chunks(self):
+        index = 0
+        try:
+            while True:
+                self._event.clear()
+                available = self._flight.chunks[index:]
+                for chunk in available:
+                    yield self._render(chunk) if self._render else chunk
+                index += len(available)
+
+                if self._flight.done and index >= len(self._flight.chunks):
+                    break
+                if not available:
+                    await self._event.wait()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Give up the seat (idempotent); the last reader to leave stops the generation"""
+        if self._closed:
+            return
+        self._closed = True
+        self._flight.remove_listener(self._on_change)
+        self._flight.unsubscribe()
+
+
+def _publish_blocking(flight: Flight, chunks: Iterator[str], cancelled: threading.Event) -> None:
+    """Drive a blocking chunk generator (DOM mode) on the Selenium executor
+
+    The pump always runs to its end and cleans up the browser, even when
+    every client is gone; cancelled only asks it to stop early.
+    """
+    def pump() -> None:
+        try:
+            for chunk in chunks:
+                flight.publish(chunk)
+                if cancelled.is_set():
+                    break
+        finally:
+            # Closing runs the generator's own cleanup (new chat) on this thread
+            chunks.close()
+            flight.finish()
+
+    _selenium_executor.submit(pump)
+
+
+class SessionWatch:
+    """Wakes a coroutine whenever the extension adds to a network session"""
+
+    def __init__(self, session: NetworkSession):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self._session = session
+        session.add_listener(self._on_change)
+
+    def _on_change(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass
+
+    async def wait(self, predicate: Callable[[], bool], timeout: float, interrupted: Callable[[], bool]) -> bool:
+        """Wait until predicate holds, False on timeout or interruption"""
+        deadline = time.time() + timeout
+        while True:
+            self._event.clear()
+            if predicate():
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0 or interrupted():
+                return False
+            try:
+                await asyncio.wait_for(self._event.wait(), min(remaining, api.NETWORK_WAIT_SLICE))
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self) -> None:
+        self._session.remove_listener(self._on_change)
+
+# =============================================================================================================================
+# Network Interception Responses
+# =============================================================================================================================
+
+async def network_response(
+    current_id: int,
+    worker: BrowserWorker,
+    timer: metrics.GenerationTimer,
+    formatted_message: str,
+    streaming: bool,
+    processed_request,
+    chain: ResponseChain,
+    disconnected: Callable[[], bool],
+    flight: Flight,
+    cancelled: threading.Event,
+    cache_key: Optional[str] = None
+):
+    """Async counterpart of api.deepseek_network_response, returns the reply text or the flight it streams into"""
+    state = get_state_manager()
+
+    def interrupted() -> bool:
+        return not worker.owns(current_id) or (not streaming and disconnected())
+
+    session = api.network_sessions.create(current_id)
+
+    try:
+        error = await run_selenium(
+            api.send_prompt,
+            worker,
+            timer,
+            formatted_message,
+            processed_request.use_deepthink,
+            processed_request.use_search,
+            processed_request.use_text_file,
+            processed_request.prefix_content,
+            interrupted,
+            session
+        )
+        if error is not None:
+            await run_selenium(api.stop_network_capture, worker, current_id)
+            return error
+
+        state.show_message("[color:white]- [color:cyan]Waiting for network response...")
+
+        if streaming:
+            task = asyncio.create_task(
+                _network_stream(flight, cancelled, session, current_id, worker, timer, chain, cache_key)
+            )
+            _producers.add(task)
+            task.add_done_callback(_producers.discard)
+            return flight
+
+        watch = SessionWatch(session)
+        try:
+            if not await watch.wait(lambda: session.completed, NETWORK_TIMEOUT, interrupted):
+                timer.error("interrupted" if interrupted() else "timeout")
+        finally:
+            watch.close()
+
+        response_text = api.network_response_text(session, chain, timer)
+        await run_selenium(api.stop_network_capture, worker, current_id)
+        state.show_message("[color:white]- [color:green]Network response completed.")
+        return response_text
+
+    except api.GenerationInterrupted:
+        await run_selenium(_end_network_capture, worker, current_id, True)
+        return ""
+    except Exception as e:
+        print(f"Error in network response: {e}")
+        timer.error("response")
+        state.show_message("[color:white]- [color:red]Network response error occurred.")
+        await run_selenium(api.stop_network_capture, worker, current_id)
+        return "Error receiving network response."
+
+
+async def _network_stream(
+    flight: Flight,
+    cancelled: threading.Event,
+    session: NetworkSession,
+    current_id: int,
+    worker: BrowserWorker,
+    timer: metrics.GenerationTimer,
+    chain: ResponseChain,
+    cache_key: Optional[str] = None
+) -> None:
+    """Publish a network session to the flight as the extension fills it"""
+    state = get_state_manager()
+    watch = SessionWatch(session)
+    aborted = False
+    sent = []
+
+    def send(chunk: str) -> None:
+        sent.append(chunk)
+        flight.publish(chunk)
+
+    def interrupted() -> bool:
+        return not worker.owns(current_id) or cancelled.is_set()
+
+    try:
+        await watch.wait(lambda: session.response_started or session.completed, NETWORK_START_TIMEOUT, interrupted)
+        if not session.response_started:
+            timer.error("network_start")
+            flight.publish("Error: Network response did not start")
+            return
+
+        decoder = DeepSeekStreamDecoder()
+        last_processed_index = 0
+        timeout_start = time.time()
+
+        while True:
+            if interrupted() or time.time() - timeout_start > NETWORK_TIMEOUT:
+                timer.error("interrupted" if interrupted() else "timeout")
+                aborted = cancelled.is_set()
+                break
+
+            # Check for the end before taking the new items so none are missed
+            stream_done = session.done
+            new_items = session.wait_for_data(last_processed_index, 0)
+
+            for chunk in api.decode_network_items(new_items, decoder, chain, timer):
+                send(chunk)
+            last_processed_index += len(new_items)
+
+            if stream_done and not new_items:
+                break
+            if not new_items:
+                index = last_processed_index
+                await watch.wait(lambda: len(session.stream_buffer) > index or session.done, api.NETWORK_WAIT_SLICE, interrupted)
+
+        for chunk in api.finish_network_stream(session, decoder, chain, timer):
+            send(chunk)
+        api.store_response(cache_key, sent, timer)
+        state.show_message("[color:white]- [color:green]Network response completed.")
+
+    except Exception as e:
+        aborted = True
+        print(f"Network streaming error: {e}")
+        timer.error("stream")
+        state.show_message("[color:white]- [color:red]Network streaming error occurred.")
+        flight.publish("Error receiving network response.")
+    finally:
+        watch.close()
+        # Clean up the browser before handing it back to the queue
+        try:
+            await run_selenium(_end_network_capture, worker, current_id, aborted)
+        finally:
+            flight.finish()
+
+
+def _end_network_capture(worker: BrowserWorker, current_id: int, aborted: bool) -> None:
+    if aborted:
+        deepseek.new_chat(worker.driver)
+    api.stop_network_capture(worker, current_id)
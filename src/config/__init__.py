@@ -4,6 +4,7 @@ Provides modular, schema-driven configuration system
 """
 
 from .config_manager import ConfigManager, ConfigValidationError
+from .config_snapshot import ConfigSnapshot
 from .config_schema import get_config_schema, get_default_config, ConfigField, ConfigSection, ConfigFieldType
 from .config_ui_generator import ConfigUIGenerator
 from .config_validators import ConfigValidator, ConditionalValidator
@@ -11,6 +12,7 @@ from .config_validators import ConfigValidator, ConditionalValidator
 __all__ = [
     'ConfigManager',
     'ConfigValidationError',
+    'ConfigSnapshot',
     'ConfigUIGenerator',
     'ConfigValidator',
     'ConditionalValidator',
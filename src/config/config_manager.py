@@ -6,6 +6,7 @@ Handles loading, saving, validation, and access to configuration
 from typing import Dict, Any, List, Optional, Tuple
 from config.config_schema import get_config_schema, get_default_config, find_field_by_key
 from config.config_validators import ConfigValidator
+from config.config_snapshot import ConfigSnapshot
 
 
 class ConfigValidationError(Exception):
@@ -24,6 +25,8 @@ class ConfigManager:
         self._config = {}
         self._original_config = get_default_config()
         self._hidden_vars = {}  # Hidden variables stored in separate files
+        self._version = 0  # Bumped on every change, names the current snapshot
+        self._snapshot = None
         self._load_config()
         self._load_hidden_vars()
     
@@ -40,6 +43,16 @@ class ConfigManager:
             print(f"Error loading config, using defaults: {e}")
             self._config = self._original_config.copy()
     
+    def _changed(self) -> None:
+        """Mark the configuration as changed so the next snapshot is rebuilt"""
+        self._version += 1
+        self._snapshot = None
+    
+    @property
+    def version(self) -> int:
+        """Number that changes whenever the configuration does"""
+        return self._version
+    
     def _merge_with_defaults(self, saved_config: Dict[str, Any]) -> Dict[str, Any]:
         """Merge saved config with current defaults to handle new fields"""
         def merge_recursive(default: Dict, saved: Dict) -> Dict:
@@ -111,6 +124,7 @@ class ConfigManager:
         
         # Set the final value
         config_ref[keys[-1]] = value
+        self._changed()
     
     def get_section(self, section_key: str) -> Dict[str, Any]:
         """Get an entire configuration section"""
@@ -127,6 +141,14 @@ class ConfigManager:
         import copy
         return copy.deepcopy(self._config)
     
+    def snapshot(self) -> ConfigSnapshot:
+        """Read-only copy of the current configuration, rebuilt only after a change"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != self._version:
+            snapshot = ConfigSnapshot(self._config, self._hidden_vars, self._version)
+            self._snapshot = snapshot
+        return snapshot
+    
     def validate(self) -> Tuple[bool, List[str]]:
         """Validate entire configuration against schema"""
         errors = []
@@ -263,10 +285,12 @@ class ConfigManager:
     def set_hidden_var(self, key: str, value: str) -> None:
         """Set a hidden variable value"""
         self._hidden_vars[key] = value
+        self._changed()
     
     def reset_to_defaults(self) -> None:
         """Reset configuration to defaults"""
         self._config = self._original_config.copy()
+        self._changed()
     
     def export_config(self) -> Dict[str, Any]:
         """Export configuration for backup/sharing"""
@@ -289,6 +313,7 @@ class ConfigManager:
                 raise
         else:
             self._config = config_data.copy()
+        self._changed()
     
     def get_config_summary(self) -> Dict[str, Any]:
         """Get a summary of current configuration for debugging"""
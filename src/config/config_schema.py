@@ -106,6 +106,14 @@ def get_config_schema() -> List[ConfigSection]:
                     default=False,
                     help_text="Use network interception instead of DOM scraping (Chrome/Edge)"
                 ),
+                ConfigField(
+                    key="models.deepseek.extension_websocket",
+                    label="Extension WebSocket:",
+                    field_type=ConfigFieldType.SWITCH,
+                    default=True,
+                    help_text="Talk to the extension over a WebSocket on the API port + 1, falling back to HTTP",
+                    depends_on="models.deepseek.intercept_network"
+                ),
             ]
         ),
         
@@ -203,6 +211,36 @@ def get_config_schema() -> List[ConfigSection]:
                     default="{role}: {content}",
                     help_text="Template for character messages. Use {role} for 'assistant', {name} for character name, {content} for message content."
                 ),
+                ConfigField(
+                    key="formatting.html_parser",
+                    label="HTML parser:",
+                    field_type=ConfigFieldType.DROPDOWN,
+                    default="Auto",
+                    options=["Auto", "lxml", "html.parser"],
+                    help_text="Parser used to turn DeepSeek's HTML into Markdown. Auto uses html.parser. lxml is faster and gives the same output for well-formed HTML, but can differ on broken markup"
+                ),
+                ConfigField(
+                    key="formatting.browser_markdown",
+                    label="Convert in browser:",
+                    field_type=ConfigFieldType.SWITCH,
+                    default=False,
+                    help_text="Turn responses into Markdown inside the DeepSeek page instead of parsing their HTML in Python (DOM mode)"
+                ),
+                ConfigField(
+                    key="formatting.normalize_whitespace",
+                    label="Normalize whitespace:",
+                    field_type=ConfigFieldType.SWITCH,
+                    default=False,
+                    help_text="Trim responses and collapse runs of blank lines into a single blank line"
+                ),
+                ConfigField(
+                    key="formatting.replacements",
+                    label="Response Replacements:",
+                    field_type=ConfigFieldType.TEXTAREA,
+                    default="",
+                    validation="replacement_rules",
+                    help_text="One rule per line as 'pattern => replacement'. Patterns are regular expressions applied to each line of a response, the replacement may use \\1 for groups"
+                ),
             ]
         ),
         
@@ -248,6 +286,14 @@ def get_config_schema() -> List[ConfigSection]:
                     validation="port",
                     help_text="Port number for the API server (1024-65535)"
                 ),
+                ConfigField(
+                    key="api.server",
+                    label="Server mode:",
+                    field_type=ConfigFieldType.DROPDOWN,
+                    default="Waitress",
+                    options=["Waitress", "Asyncio"],
+                    help_text="Asyncio serves streams on an event loop instead of a thread each (needs uvicorn and starlette)"
+                ),
                 ConfigField(
                     key="browser",
                     label="Browser:",
@@ -295,6 +341,159 @@ def get_config_schema() -> List[ConfigSection]:
                 ),
             ]
         ),
+        
+        ConfigSection(
+            id="performance_settings",
+            title="Performance Settings",
+            fields=[
+                ConfigField(
+                    key="pool.min_size",
+                    label="Min browsers:",
+                    field_type=ConfigFieldType.TEXT,
+                    default=1,
+                    validation="pool_size",
+                    help_text="Number of browsers kept open at all times (1-8)"
+                ),
+                ConfigField(
+                    key="pool.max_size",
+                    label="Max browsers:",
+                    field_type=ConfigFieldType.TEXT,
+                    default=1,
+                    validation="pool_size",
+                    help_text="Maximum browsers used for parallel generations (1-8). Extra requests wait in the queue"
+                ),
+                ConfigField(
+                    key="pool.idle_timeout",
+                    label="Browser idle timeout:",
+                    field_type=ConfigFieldType.TEXT,
+                    default=300,
+                    validation="seconds",
+                    help_text="Seconds an extra browser may stay idle before it is closed"
+                ),
+                ConfigField(
+                    key="pool.prewarm",
+                    label="Pre-warm next chat:",
+                    field_type=ConfigFieldType.SWITCH,
+                    default=True,
+                    help_text="Open a fresh chat with the last request's DeepThink/Search toggles as soon as a response ends, so the next prompt is pasted right away"
+                ),
+                ConfigField(
+                    key="queue.max_depth",
+                    label="Queue size:",
+                    field_type=ConfigFieldType.TEXT,
+                    default=16,
+                    validation="queue_depth",
+                    help_text="Requests allowed to wait for a browser (1-100). Further requests get HTTP 429"
+                ),
+                ConfigField(
+                    key="queue.deadline",
+                    label="Queue timeout:",
+                    field_type=ConfigFieldType.TEXT,
+                    default=300,
+                    validation="seconds",
+                    help_text="Seconds a request may wait in the queue before it is dropped"
+                ),
+                ConfigField(
+                    key="queue.coalesce",
+                    label="Merge identical requests:",
+                    field_type=ConfigFieldType.SWITCH,
+                    default=True,
+                    help_text="Identical prompts sent while one is still generating share that generation instead of using another browser"
+                ),
+                ConfigField(
+                    key="cache.enabled",
+                    label="Response cache:",
+                    field_type=ConfigFieldType.SWITCH,
+                    default=False,
+                    help_text="Answer byte-identical prompts from a cache instead of generating again. Send 'X-IntenseRP-Cache: bypass' to skip it"
+                ),
+                ConfigField(
+                    key="cache.ttl",
+                    label="Cache lifetime:",
+                    field_type=ConfigFieldType.TEXT,
+                    default=3600,
+                    validation="seconds",
+                    help_text="Seconds a cached response stays valid",
+                    depends_on="cache.enabled"
+                ),
+                ConfigField(
+                    key="cache.max_size_mb",
+                    label="Cache size (MB):",
+                    field_type=ConfigFieldType.TEXT,
+                    default=32,
+                    validation="cache_size",
+                    help_text="Memory budget for cached responses (1-1024 MB), least recently used ones are dropped first",
+                    depends_on="cache.enabled"
+                ),
+                ConfigField(
+                    key="cache.persistent",
+                    label="Keep cache on disk:",
+                    field_type=ConfigFieldType.SWITCH,
+                    default=True,
+                    help_text="Store cached responses in the save folder so they survive restarts",
+                    depends_on="cache.enabled"
+                ),
+                ConfigField(
+                    key="offload.enabled",
+                    label="Process pool:",
+                    field_type=ConfigFieldType.SWITCH,
+                    default=False,
+                    help_text="Convert large responses and build large prompts in separate processes so they do not stall other requests"
+                ),
+                ConfigField(
+                    key="offload.workers",
+                    label="Worker processes:",
+                    field_type=ConfigFieldType.TEXT,
+                    default=2,
+                    validation="process_count",
+                    help_text="Processes kept ready for large conversions and prompts (1-8)",
+                    depends_on="offload.enabled"
+                ),
+                ConfigField(
+                    key="offload.html_threshold",
+                    label="Offload responses from:",
+                    field_type=ConfigFieldType.TEXT,
+                    default=50000,
+                    validation="char_threshold",
+                    help_text="Response HTML size in characters from which it is converted in a worker process",
+                    depends_on="offload.enabled"
+                ),
+                ConfigField(
+                    key="offload.prompt_threshold",
+                    label="Offload prompts from:",
+                    field_type=ConfigFieldType.TEXT,
+                    default=250000,
+                    validation="char_threshold",
+                    help_text="Chat history size in characters from which the prompt is built in a worker process",
+                    depends_on="offload.enabled"
+                ),
+                ConfigField(
+                    key="profiling.enabled",
+                    label="Profile processors:",
+                    field_type=ConfigFieldType.SWITCH,
+                    default=False,
+                    help_text="Time every request processor and show the results at /debug/pipeline and /metrics"
+                ),
+                ConfigField(
+                    key="profiling.slow_ms",
+                    label="Slow request after (ms):",
+                    field_type=ConfigFieldType.TEXT,
+                    default=500,
+                    validation="milliseconds",
+                    help_text="Processing time from which a request counts as slow and its profile is kept",
+                    depends_on="profiling.enabled"
+                ),
+                ConfigField(
+                    key="profiling.sample_percent",
+                    label="Profile requests (%):",
+                    field_type=ConfigFieldType.TEXT,
+                    default=0,
+                    validation="percent",
+                    help_text="Share of requests processed under cProfile (0-100). Profiles of the slow ones are kept for /debug/pipeline",
+                    depends_on="profiling.enabled"
+                ),
+            ]
+        ),
     ]
 
 
@@ -0,0 +1,69 @@
+"""
+Immutable configuration snapshots for IntenseRP API
+Request handling reads these instead of deep-copying the live configuration
+"""
+
+from typing import Any, Dict, Optional
+
+
+class FrozenDict(dict):
+    """A dict that refuses changes, so a snapshot can be shared between threads"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Configuration snapshots are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __copy__(self) -> "FrozenDict":
+        return self
+
+    def __deepcopy__(self, memo) -> "FrozenDict":
+        return self
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+def freeze(value: Any) -> Any:
+    """Read-only copy of a config value (dicts become FrozenDicts, lists tuples)"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class ConfigSnapshot(FrozenDict):
+    """The configuration (and hidden variables) as they were at one version
+
+    Reads take no locks and never copy. get() accepts dotted keys like
+    ConfigManager.get, so a snapshot can stand in for the manager where
+    values are only read.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, hidden_vars: Optional[Dict[str, str]] = None, version: int = 0):
+        super().__init__((key, freeze(value)) for key, value in (config or {}).items())
+        self.version = version
+        self._hidden_vars = FrozenDict(hidden_vars or {})
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get configuration value using dot notation (e.g., 'models.deepseek.email')"""
+        if '.' not in key:
+            return dict.get(self, key, default)
+
+        value = self
+        for k in key.split('.'):
+            if isinstance(value, dict) and k in value:
+                value = value[k]
+            else:
+                return default
+        return value
+
+    def get_hidden_var(self, key: str, default: str = "") -> str:
+        """Get a hidden variable value"""
+        return self._hidden_vars.get(key, default)
+
+    def __reduce__(self):
+        return (ConfigSnapshot, (dict(self), dict(self._hidden_vars), self.version))
@@ -395,6 +395,9 @@ class ConfigUIGenerator:
                 # Apply console settings immediately after saving
                 self._apply_console_settings_after_save()
                 
+                # Let the API pick up the new configuration
+                self._notify_config_updated()
+                
                 # Clear reference to this UI generator
                 self._clear_ui_generator_reference()
                 
@@ -420,6 +423,15 @@ class ConfigUIGenerator:
         except Exception as e:
             print(f"Error applying console settings after save: {e}")
     
+    def _notify_config_updated(self) -> None:
+        """Announce the saved configuration to state observers"""
+        try:
+            from core import get_state_manager
+            
+            get_state_manager().notify_config_updated()
+        except Exception as e:
+            print(f"Error announcing configuration update: {e}")
+    
     def _clear_ui_generator_reference(self) -> None:
         """Clear reference to this UI generator from state manager"""
         try:
@@ -489,7 +501,7 @@ class ConfigUIGenerator:
             # Parse the human-readable format to bytes for storage (original behavior)
             from config.config_validators import ConfigValidator
             return ConfigValidator._parse_file_size(ui_value.strip())
-        elif field.validation == "max_files":
+        elif field.validation in ("max_files", "pool_size", "queue_depth", "seconds", "cache_size", "process_count", "char_threshold", "milliseconds", "percent"):
             # Convert to integer for storage (original behavior)
             return int(ui_value.strip())
         elif field.field_type == ConfigFieldType.DROPDOWN and field.key == "console.font_size":
@@ -20,6 +20,15 @@ class ConfigValidator:
             'max_files': self._validate_max_files,
             'dump_directory': self._validate_dump_directory,
             'port': self._validate_port,
+            'pool_size': self._validate_pool_size,
+            'queue_depth': self._validate_queue_depth,
+            'seconds': self._validate_seconds,
+            'cache_size': self._validate_cache_size,
+            'process_count': self._validate_process_count,
+            'char_threshold': self._validate_char_threshold,
+            'replacement_rules': self._validate_replacement_rules,
+            'milliseconds': self._validate_milliseconds,
+            'percent': self._validate_percent,
         }
     
     def validate_field(self, field: ConfigField, value: Any, config_data: dict = None) -> List[str]:
@@ -180,6 +189,119 @@ class ConfigValidator:
         except ValueError:
             return [f"{field.label} Port must be a valid number"]
     
+    def _validate_pool_size(self, field: ConfigField, value) -> List[str]:
+        """Validate browser pool size"""
+        if value is None or not str(value).strip():
+            return [f"{field.label} Browser count is required"]
+        
+        try:
+            size = int(str(value).strip())
+            if size < 1 or size > 8:
+                return [f"{field.label} Browser count must be between 1 and 8"]
+            return []
+        except ValueError:
+            return [f"{field.label} Browser count must be a valid number"]
+    
+    def _validate_queue_depth(self, field: ConfigField, value) -> List[str]:
+        """Validate request queue size"""
+        if value is None or not str(value).strip():
+            return [f"{field.label} Queue size is required"]
+        
+        try:
+            depth = int(str(value).strip())
+            if depth < 1 or depth > 100:
+                return [f"{field.label} Queue size must be between 1 and 100"]
+            return []
+        except ValueError:
+            return [f"{field.label} Queue size must be a valid number"]
+    
+    def _validate_seconds(self, field: ConfigField, value) -> List[str]:
+        """Validate a duration in whole seconds"""
+        if value is None or not str(value).strip():
+            return [f"{field.label} Duration is required"]
+        
+        try:
+            seconds = int(str(value).strip())
+            if seconds < 1:
+                return [f"{field.label} Duration must be at least 1 second"]
+            return []
+        except ValueError:
+            return [f"{field.label} Duration must be a valid number of seconds"]
+    
+    def _validate_cache_size(self, field: ConfigField, value) -> List[str]:
+        """Validate the response cache budget in MB"""
+        if value is None or not str(value).strip():
+            return [f"{field.label} Cache size is required"]
+        
+        try:
+            size = int(str(value).strip())
+            if size < 1 or size > 1024:
+                return [f"{field.label} Cache size must be between 1 and 1024 MB"]
+            return []
+        except ValueError:
+            return [f"{field.label} Cache size must be a valid number"]
+    
+    def _validate_process_count(self, field: ConfigField, value) -> List[str]:
+        """Validate the number of worker processes"""
+        if value is None or not str(value).strip():
+            return [f"{field.label} Process count is required"]
+        
+        try:
+            count = int(str(value).strip())
+            if count < 1 or count > 8:
+                return [f"{field.label} Process count must be between 1 and 8"]
+            return []
+        except ValueError:
+            return [f"{field.label} Process count must be a valid number"]
+    
+    def _validate_char_threshold(self, field: ConfigField, value) -> List[str]:
+        """Validate a size threshold in characters"""
+        if value is None or not str(value).strip():
+            return [f"{field.label} Size is required"]
+        
+        try:
+            size = int(str(value).strip())
+            if size < 1000:
+                return [f"{field.label} Size must be at least 1000 characters"]
+            return []
+        except ValueError:
+            return [f"{field.label} Size must be a valid number of characters"]
+    
+    def _validate_milliseconds(self, field: ConfigField, value) -> List[str]:
+        """Validate a duration in milliseconds"""
+        if value is None or not str(value).strip():
+            return [f"{field.label} Duration is required"]
+        
+        try:
+            milliseconds = int(str(value).strip())
+            if milliseconds < 1 or milliseconds > 600000:
+                return [f"{field.label} Duration must be between 1 and 600000 ms"]
+            return []
+        except ValueError:
+            return [f"{field.label} Duration must be a valid number of milliseconds"]
+    
+    def _validate_percent(self, field: ConfigField, value) -> List[str]:
+        """Validate a percentage"""
+        if value is None or not str(value).strip():
+            return [f"{field.label} Percentage is required"]
+        
+        try:
+            percent = int(str(value).strip())
+            if percent < 0 or percent > 100:
+                return [f"{field.label} Percentage must be between 0 and 100"]
+            return []
+        except ValueError:
+            return [f"{field.label} Percentage must be a valid number"]
+    
+    def _validate_replacement_rules(self, field: ConfigField, value: str) -> List[str]:
+        """Validate 'pattern => replacement' lines"""
+        if not value or not value.strip():
+            return []
+        
+        from processors.response_stages import parse_replacement_rules
+        _, errors = parse_replacement_rules(value)
+        return [f"{field.label} Invalid rule on {error}" for error in errors]
+    
     @staticmethod
     def _parse_file_size(size_str: str) -> int:
         """Convert human readable size to bytes (same logic as original)"""
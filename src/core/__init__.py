@@ -6,6 +6,11 @@ configuration, and core business logic.
 """
 
 from .state_manager import StateManager, get_state_manager, reset_state_manager, StateEvent, StateChange
+from .browser_pool import BrowserPool, BrowserWorker
+from .request_queue import RequestQueue, QueueTicket, QueueFullError
+from .network_sessions import NetworkSession, NetworkSessionRegistry
+from .response_cache import ResponseCache, CacheEntry
+from .singleflight import SingleFlight, Flight, FlightReader
 
 
 __all__ = [
@@ -13,5 +18,17 @@ __all__ = [
     'get_state_manager', 
     'reset_state_manager',
     'StateEvent',
-    'StateChange'
+    'StateChange',
+    'BrowserPool',
+    'BrowserWorker',
+    'RequestQueue',
+    'QueueTicket',
+    'QueueFullError',
+    'NetworkSession',
+    'NetworkSessionRegistry',
+    'ResponseCache',
+    'CacheEntry',
+    'SingleFlight',
+    'Flight',
+    'FlightReader'
 ]
\ No newline at end of file
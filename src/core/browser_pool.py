@@ -0,0 +1,274 @@
+"""
+Browser worker pool for the IntenseRP API
+
+Keeps several independently launched browser drivers and hands every incoming
+completion to an idle one, so multiple clients can generate in parallel.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class BrowserWorker:
+    """A single browser driver managed by the pool"""
+
+    def __init__(self, worker_id: int, driver: Any, profile_name: Optional[str] = None, primary: bool = False):
+        self.worker_id = worker_id
+        self.driver = driver
+        self.profile_name = profile_name
+        self.primary = primary
+        self.job_id: Optional[int] = None
+        self.last_used = time.time()
+        # (deepthink, search) of an empty chat opened ahead of the next job
+        self.prepared: Optional[Tuple[bool, bool]] = None
+        # Set while maintenance checks the browser, the worker is not handed out meanwhile
+        self.checking = False
+
+    @property
+    def name(self) -> str:
+        """Display name used in console messages"""
+        return self.profile_name or "primary"
+
+    @property
+    def is_busy(self) -> bool:
+        return self.job_id is not None
+
+    def owns(self, job_id: int) -> bool:
+        """Check if the given job still owns this worker and its browser is alive"""
+        return self.job_id == job_id and self.driver is not None
+
+
+class BrowserPool:
+    """Dispatches completions to a pool of browser workers"""
+
+    MAINTENANCE_INTERVAL = 5.0
+    LAUNCH_RETRY_DELAY = 30.0
+
+    def __init__(
+        self,
+        launcher: Callable[[str], Any],
+        min_size: int = 1,
+        max_size: int = 1,
+        idle_timeout: float = 300.0,
+        health_check: Optional[Callable[[Any], bool]] = None,
+        closer: Optional[Callable[[Any], None]] = None
+    ):
+        self._launcher = launcher
+        self._health_check = health_check
+        self._closer = closer
+        self._cond = threading.Condition()
+        self._workers: List[BrowserWorker] = []
+        self._launching = 0
+        self._launching_names = set()
+        self._demand = 0
+        self.on_available: Optional[Callable[[], None]] = None
+        self._last_launch_failure = 0.0
+        self._next_id = 0
+        self._running = False
+
+        self.min_size = max(1, int(min_size))
+        self.max_size = max(self.min_size, int(max_size))
+        self.idle_timeout = float(idle_timeout)
+
+    # Lifecycle
+    def start(self, primary_driver: Any) -> None:
+        """Register the primary browser and launch extra workers up to the minimum size"""
+        with self._cond:
+            self._running = True
+            self._add_worker(primary_driver, None, primary=True)
+            for _ in range(self.min_size - 1):
+                self._spawn_worker()
+
+        threading.Thread(target=self._maintain, daemon=True).start()
+
+    def shutdown(self) -> None:
+        """Stop the pool and close every browser except the primary one"""
+        with self._cond:
+            self._running = False
+            workers = [w for w in self._workers if not w.primary]
+            self._workers = [w for w in self._workers if w.primary]
+            self._cond.notify_all()
+
+        for worker in workers:
+            self._close_worker(worker)
+
+    # Dispatching
+    def try_acquire(self, job_id: int) -> Optional[BrowserWorker]:
+        """Assign an idle worker to the job without waiting"""
+        with self._cond:
+            if not self._running:
+                return None
+            worker = self._find_idle()
+            return self._assign(worker, job_id) if worker else None
+
+    def ensure_capacity(self, demand: int) -> None:
+        """Launch extra browsers so that queued requests can be served"""
+        with self._cond:
+            self._demand = demand
+            while self._running and self._can_scale_up():
+                self._spawn_worker()
+
+    def release(self, worker: BrowserWorker, job_id: int) -> None:
+        """Return the worker to the pool if the job still owns it"""
+        with self._cond:
+            if worker.job_id != job_id:
+                return
+            worker.job_id = None
+            worker.last_used = time.time()
+            self._cond.notify_all()
+        self._notify_available()
+
+    def discard_driver(self, driver: Any) -> None:
+        """Forget a worker whose browser was closed externally"""
+        with self._cond:
+            for worker in self._workers:
+                if worker.driver is driver:
+                    worker.driver = None
+            self._workers = [w for w in self._workers if w.driver is not None]
+            self._cond.notify_all()
+        self._notify_available()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get a summary of the pool for debugging"""
+        with self._cond:
+            return {
+                'size': len(self._workers),
+                'busy': sum(1 for w in self._workers if w.is_busy),
+                'launching': self._launching,
+                'min_size': self.min_size,
+                'max_size': self.max_size
+            }
+
+    # Internal helpers (called with the condition held unless noted)
+    def _find_idle(self) -> Optional[BrowserWorker]:
+        for worker in self._workers:
+            if not worker.is_busy and not worker.checking and worker.driver is not None:
+                return worker
+        return None
+
+    def _assign(self, worker: BrowserWorker, job_id: int) -> BrowserWorker:
+        worker.job_id = job_id
+        worker.last_used = time.time()
+        return worker
+
+    def _add_worker(self, driver: Any, profile_name: Optional[str], primary: bool = False) -> BrowserWorker:
+        worker = BrowserWorker(self._next_id, driver, profile_name, primary)
+        self._next_id += 1
+        self._workers.append(worker)
+        self._cond.notify_all()
+        return worker
+
+    def _can_scale_up(self) -> bool:
+        if len(self._workers) + self._launching >= self.max_size:
+            return False
+        if time.time() - self._last_launch_failure < self.LAUNCH_RETRY_DELAY:
+            return False
+        idle = sum(1 for w in self._workers if not w.is_busy and w.driver is not None)
+        return idle + self._launching < self._demand
+
+    def _spawn_worker(self) -> None:
+        # Reuse the lowest free profile name so persistent profiles survive restarts
+        used = {w.profile_name for w in self._workers} | self._launching_names
+        index = 1
+        while f"worker{index}" in used:
+            index += 1
+        profile_name = f"worker{index}"
+
+        self._launching += 1
+        self._launching_names.add(profile_name)
+        threading.Thread(target=self._launch_worker, args=(profile_name,), daemon=True).start()
+
+    def _launch_worker(self, profile_name: str) -> None:
+        """Launch a browser outside the lock and add it to the pool"""
+        driver = None
+        try:
+            print(f"[color:cyan]Launching pooled browser: {profile_name}")
+            driver = self._launcher(profile_name)
+        except Exception as e:
+            print(f"[color:red]Error launching pooled browser: {e}")
+
+        with self._cond:
+            self._launching -= 1
+            self._launching_names.discard(profile_name)
+            added = bool(driver and self._running)
+            if added:
+                self._add_worker(driver, profile_name)
+            elif not driver:
+                self._last_launch_failure = time.time()
+            self._cond.notify_all()
+
+        if added:
+            print(f"[color:green]Pooled browser ready: {profile_name}")
+            self._notify_available()
+        elif driver:
+            self._close_driver(driver)
+
+    def _maintain(self) -> None:
+        """Drop dead browsers and retire workers idle for longer than the timeout"""
+        while True:
+            time.sleep(self.MAINTENANCE_INTERVAL)
+
+            with self._cond:
+                if not self._running:
+                    return
+                candidates = [w for w in self._workers if not w.primary and not w.is_busy]
+                # Keep the candidates from being acquired while their browsers are checked
+                for worker in candidates:
+                    worker.checking = True
+
+            dead = []
+            try:
+                if self._health_check:
+                    dead = [w for w in candidates if not self._health_check(w.driver)]
+            except Exception as e:
+                print(f"Error checking pooled browsers: {e}")
+
+            lost = []
+            retired = []
+            with self._cond:
+                # Dead browsers are removed before anyone can acquire them again
+                for worker in candidates:
+                    worker.checking = False
+                now = time.time()
+                for worker in dead:
+                    if worker in self._workers and not worker.is_busy:
+                        self._workers.remove(worker)
+                        lost.append(worker)
+
+                for worker in candidates:
+                    if worker not in self._workers or worker.is_busy:
+                        continue
+                    if len(self._workers) <= self.min_size:
+                        break
+                    if now - worker.last_used > self.idle_timeout:
+                        self._workers.remove(worker)
+                        retired.append(worker)
+
+                self._cond.notify_all()
+
+            if candidates:
+                self._notify_available()
+            for worker in lost:
+                print(f"[color:yellow]Pooled browser lost: {worker.name}")
+                self._close_worker(worker)
+            for worker in retired:
+                print(f"[color:cyan]Retiring idle pooled browser: {worker.name}")
+                self._close_worker(worker)
+
+    def _notify_available(self) -> None:
+        """Tell the request queue a worker may be free (called without the lock)"""
+        if self.on_available:
+            self.on_available()
+
+    def _close_worker(self, worker: BrowserWorker) -> None:
+        driver, worker.driver = worker.driver, None
+        if driver:
+            self._close_driver(driver)
+
+    def _close_driver(self, driver: Any) -> None:
+        try:
+            if self._closer:
+                self._closer(driver)
+        except Exception as e:
+            print(f"Error closing pooled browser: {e}")
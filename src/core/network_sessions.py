@@ -0,0 +1,232 @@
+"""
+Network capture sessions for the IntenseRP API
+
+Every completion that runs in network interception mode gets its own session
+holding the captured stream and completion flags. Sessions are keyed by our
+completion id and aliased by the extension's CDP requestId, so data from
+several browsers (or a late chunk from a finished stream) never mixes with
+another generation. Handlers signal the session's condition so waiting
+generators wake up as soon as a chunk arrives; listeners give the same
+wake-up to code that cannot block a thread (the asyncio server).
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class NetworkSession:
+    """Captured network data for a single completion"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.request_id: Optional[str] = None
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+
+        self.request_data: Optional[Dict[str, Any]] = None
+        self.response_started = False
+        self.stream_buffer: List[Dict[str, Any]] = []
+        self.events: List[Dict[str, Any]] = []
+        self.completed = False
+        self.finished = False  # DeepSeek sent its 'finish' SSE event
+        self.error: Optional[str] = None
+
+        self._cond = threading.Condition()
+        # Batch sequence numbers restart with every extension request, so each requestId counts on its own
+        self._next_seq: Dict[Optional[str], int] = {}
+        self._pending: Dict[Optional[str], Dict[int, Dict[str, Any]]] = {}  # Out-of-order batch items by sequence number
+        self._listeners: List[Callable[[], None]] = []
+
+    def touch(self) -> None:
+        self.last_activity = time.time()
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Call back (from the producer thread) whenever the session changes"""
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]) -> None:
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self) -> None:
+        self._cond.notify_all()
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error notifying network session listener: {e}")
+
+    # Producers (extension handlers)
+    def start_response(self) -> None:
+        with self._cond:
+            self.response_started = True
+            self._notify()
+
+    def add_data(self, content: str, timestamp: float) -> None:
+        with self._cond:
+            self.stream_buffer.append({'type': 'data', 'content': content, 'timestamp': timestamp})
+            self._notify()
+
+    def add_event(self, event: str, timestamp: float) -> None:
+        with self._cond:
+            self.events.append({'type': 'event', 'event': event, 'timestamp': timestamp})
+            if event == 'finish':
+                self.finished = True
+            self._notify()
+
+    def add_batch(self, items: List[Dict[str, Any]], request_id: Optional[str] = None) -> None:
+        """Add an ordered batch of data lines and events, reordering by sequence number
+
+        Batches may arrive before the request that starts their sequence has
+        been bound, so the sequence is looked up by the batch's own requestId.
+        """
+        with self._cond:
+            next_seq = self._next_seq.get(request_id, 0)
+            pending = self._pending.setdefault(request_id, {})
+            for item in items:
+                seq = item.get('seq')
+                if seq is None:
+                    self._apply_item(item)
+                elif seq >= next_seq:
+                    pending[seq] = item
+
+            while next_seq in pending:
+                self._apply_item(pending.pop(next_seq))
+                next_seq += 1
+            self._next_seq[request_id] = next_seq
+            self._notify()
+
+    def complete(self, error: Optional[str] = None) -> None:
+        with self._cond:
+            # Anything still held back belongs before the end, even with gaps
+            for pending in self._pending.values():
+                for seq in sorted(pending):
+                    self._apply_item(pending[seq])
+            self._pending.clear()
+            if error is not None:
+                self.error = error
+            self.completed = True
+            self._notify()
+
+    def _apply_item(self, item: Dict[str, Any]) -> None:
+        timestamp = item.get('timestamp', time.time() * 1000)
+        if item.get('type') == 'event':
+            self.events.append({'type': 'event', 'event': item.get('event'), 'timestamp': timestamp})
+            if item.get('event') == 'finish':
+                self.finished = True
+        elif 'data' in item:
+            self.stream_buffer.append({'type': 'data', 'content': item['data'], 'timestamp': timestamp})
+
+    # Consumers (response generators)
+    @property
+    def done(self) -> bool:
+        """The stream has ended, either by a finish event or the response end"""
+        return self.finished or self.completed
+
+    def wait_for_start(self, timeout: float) -> bool:
+        """Block until the response starts, it ends, or the timeout passes"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.response_started or self.completed, timeout)
+
+    def wait_for_data(self, start: int, timeout: float) -> List[Dict[str, Any]]:
+        """Block until items past start arrive or the stream ends, then return them"""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.stream_buffer) > start or self.done, timeout)
+            return self.stream_buffer[start:]
+
+    def wait_for_completion(self, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self.completed, timeout)
+
+
+class NetworkSessionRegistry:
+    """Thread-safe registry of active network capture sessions"""
+
+    SESSION_TTL = 600.0
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._sessions: Dict[str, NetworkSession] = {}
+        self._aliases: Dict[str, str] = {}
+
+    def create(self, session_id: Any) -> NetworkSession:
+        """Open a fresh session, replacing any previous one with the same id"""
+        session_id = str(session_id)
+        with self._lock:
+            self._expire()
+            self.close(session_id)
+            session = NetworkSession(session_id)
+            self._sessions[session_id] = session
+            return session
+
+    def close(self, session_id: Any) -> None:
+        """Forget a session and its requestId alias"""
+        with self._lock:
+            session = self._sessions.pop(str(session_id), None)
+            if session and session.request_id:
+                self._aliases.pop(session.request_id, None)
+
+    def get(self, session_id: Any) -> Optional[NetworkSession]:
+        with self._lock:
+            return self._sessions.get(str(session_id))
+
+    def bind(self, session_id: Any, request_id: Optional[str]) -> Optional[NetworkSession]:
+        """Attach a new extension requestId to a session
+
+        Extensions that do not send a sessionId are matched to the newest
+        session that has not been bound yet.
+        """
+        with self._lock:
+            self._expire()
+            if session_id is not None:
+                session = self._sessions.get(str(session_id))
+            else:
+                unbound = [s for s in self._sessions.values() if s.request_id is None]
+                session = max(unbound, key=lambda s: s.created_at) if unbound else None
+
+            if session and request_id and request_id != session.request_id:
+                if session.request_id:
+                    self._aliases.pop(session.request_id, None)
+                session.request_id = request_id
+                self._aliases[request_id] = session.session_id
+            return session
+
+    def resolve(self, session_id: Any = None, request_id: Optional[str] = None) -> Optional[NetworkSession]:
+        """Find the session an extension message belongs to
+
+        Returns None for messages of unknown or already closed sessions so
+        that late chunks are dropped instead of leaking into another stream.
+        """
+        with self._lock:
+            if session_id is not None:
+                session = self._sessions.get(str(session_id))
+            elif request_id is not None:
+                session = self._sessions.get(self._aliases.get(request_id, ""))
+            elif len(self._sessions) == 1:
+                # Legacy extension without any ids, only safe with a single session
+                session = next(iter(self._sessions.values()))
+            else:
+                session = None
+
+            if session:
+                session.touch()
+            return session
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get a summary of the registry for debugging"""
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'bound': len(self._aliases)
+            }
+
+    def _expire(self) -> None:
+        """Drop orphaned sessions that have been idle longer than the TTL"""
+        cutoff = time.time() - self.ttl
+        for session_id in [k for k, s in self._sessions.items() if s.last_activity < cutoff]:
+            print(f"[color:yellow]Expiring orphaned network session: {session_id}")
+            self.close(session_id)
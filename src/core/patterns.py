@@ -0,0 +1,50 @@
+"""
+Precompiled patterns shared by the message processors
+
+Every request runs the same handful of expressions over each message, so
+they are compiled once here. DeepSeek directives ({{r1}}, [r1], (r1),
+{{search}}, [search]) are matched by a single alternation: one sweep of a
+message both detects which settings it asks for and removes them.
+"""
+
+import re
+from typing import Tuple
+
+# Character and user names SillyTavern passes in the prompt
+DATA1 = re.compile(r'DATA1:\s*"([^"]*)"')
+DATA2 = re.compile(r'DATA2:\s*"([^"]*)"')
+
+# Directives, with the whitespace after them (group 1 is set for the deepthink ones)
+DIRECTIVE = re.compile(r'(?:(\{\{r1\}\}|\[r1\]|\(r1\))|\{\{search\}\}|\[search\])\s*', re.IGNORECASE)
+# Directives alone, as removed from the combined prompt
+DIRECTIVE_MARKER = re.compile(r'\{\{r1\}\}|\[r1\]|\(r1\)|\{\{search\}\}|\[search\]', re.IGNORECASE)
+
+# Role prefixes at the start of the prompt or of a message in it
+SYSTEM_PREFIX = re.compile(r'(^|\n\n)system:\s*')
+ASSISTANT_PREFIX = re.compile(r'(^|\n\n)assistant:\s*')
+USER_PREFIX = re.compile(r'(^|\n\n)user:\s*')
+
+# Whitespace cleanup
+BLANK_LINES = re.compile(r'\n\s*\n')
+EXTRA_NEWLINES = re.compile(r'\n{3,}')
+
+
+def scan_directives(content: str) -> Tuple[str, bool, bool]:
+    """Remove every directive in one pass: (content without them, deepthink, search)"""
+    deepthink = search = False
+    pieces = []
+    last = 0
+
+    for match in DIRECTIVE.finditer(content):
+        if match.group(1):
+            deepthink = True
+        else:
+            search = True
+        pieces.append(content[last:match.start()])
+        last = match.end()
+
+    if not pieces:
+        return content, False, False
+
+    pieces.append(content[last:])
+    return "".join(pieces), deepthink, search
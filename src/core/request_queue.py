@@ -0,0 +1,170 @@
+"""
+Request queue for the IntenseRP API
+
+Admits completions in arrival order in front of the browser pool, bounds how
+many may wait at once and gives every waiting request a deadline, so bursts
+are served predictably instead of aborting each other.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Any, Optional
+
+from .browser_pool import BrowserPool, BrowserWorker
+
+
+class QueueFullError(Exception):
+    """Raised when the queue cannot admit another request"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Request queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class QueueTicket:
+    """A single request waiting for (or holding) a browser worker"""
+
+    def __init__(self, job_id: int, deadline: float):
+        self.job_id = job_id
+        self.enqueued_at = time.time()
+        self.deadline = self.enqueued_at + deadline
+        self.started_at: Optional[float] = None
+        self.worker: Optional[BrowserWorker] = None
+
+    @property
+    def wait_time(self) -> float:
+        """Seconds spent in the queue (so far, if still waiting)"""
+        return (self.started_at or time.time()) - self.enqueued_at
+
+
+class RequestQueue:
+    """FIFO admission queue that hands browser workers to requests in order"""
+
+    POLL_INTERVAL = 1.0
+    DEFAULT_SERVICE_TIME = 30.0
+
+    def __init__(self, pool: BrowserPool, max_depth: int = 16, deadline: float = 300.0):
+        self._pool = pool
+        self._cond = threading.Condition()
+        self._waiting: Deque[QueueTicket] = deque()
+        self._avg_service_time = self.DEFAULT_SERVICE_TIME
+        self._served = 0
+        self._rejected = 0
+        self._expired = 0
+
+        self.max_depth = max(1, int(max_depth))
+        self.deadline = float(deadline)
+        pool.on_available = self._wake
+
+    # Admission
+    def submit(self, job_id: int) -> QueueTicket:
+        """Admit a request to the back of the queue or raise QueueFullError"""
+        with self._cond:
+            if len(self._waiting) >= self.max_depth:
+                self._rejected += 1
+                raise QueueFullError(self._retry_after(len(self._waiting) + 1))
+
+            ticket = QueueTicket(job_id, self.deadline)
+            self._waiting.append(ticket)
+            self._pool.ensure_capacity(len(self._waiting))
+            self._cond.notify_all()
+            return ticket
+
+    def wait(
+        self,
+        ticket: QueueTicket,
+        cancelled: Optional[Callable[[], bool]] = None,
+        on_position: Optional[Callable[[int, float], None]] = None
+    ) -> Optional[BrowserWorker]:
+        """Block until the ticket reaches the front and gets a worker
+
+        Returns None when the deadline passes or the request is cancelled.
+        on_position is called with (position, estimated wait) whenever the
+        ticket moves forward.
+        """
+        last_position = None
+
+        with self._cond:
+            while True:
+                if ticket not in self._waiting:
+                    return None
+
+                position = self._waiting.index(ticket) + 1
+                if position == 1:
+                    worker = self._pool.try_acquire(ticket.job_id)
+                    if worker:
+                        self._waiting.popleft()
+                        ticket.worker = worker
+                        ticket.started_at = time.time()
+                        self._cond.notify_all()
+                        return worker
+
+                if time.time() >= ticket.deadline or (cancelled and cancelled()):
+                    self._waiting.remove(ticket)
+                    self._expired += 1
+                    self._pool.ensure_capacity(len(self._waiting))
+                    self._cond.notify_all()
+                    return None
+
+                if position != last_position:
+                    last_position = position
+                    if on_position:
+                        on_position(position, self._estimate_wait(position))
+
+                self._pool.ensure_capacity(len(self._waiting))
+                self._cond.wait(min(self.POLL_INTERVAL, max(0.0, ticket.deadline - time.time())))
+
+    def complete(self, ticket: QueueTicket) -> None:
+        """Return the ticket's worker to the pool and record how long it was used"""
+        if not ticket.worker:
+            return
+
+        worker, ticket.worker = ticket.worker, None
+        elapsed = time.time() - (ticket.started_at or time.time())
+        with self._cond:
+            self._served += 1
+            # Exponential moving average keeps the estimate responsive
+            self._avg_service_time = self._avg_service_time * 0.8 + elapsed * 0.2
+
+        self._pool.release(worker, ticket.job_id)
+
+    def shutdown(self) -> None:
+        """Drop every waiting request"""
+        with self._cond:
+            self._waiting.clear()
+            self._cond.notify_all()
+
+    # Reporting
+    def position(self, ticket: QueueTicket) -> int:
+        """1-based position of the ticket, 0 once it has left the queue"""
+        with self._cond:
+            return self._waiting.index(ticket) + 1 if ticket in self._waiting else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get a summary of the queue for debugging"""
+        with self._cond:
+            depth = len(self._waiting)
+            return {
+                'depth': depth,
+                'max_depth': self.max_depth,
+                'deadline': self.deadline,
+                'oldest_wait': round(self._waiting[0].wait_time, 2) if depth else 0.0,
+                'avg_service_time': round(self._avg_service_time, 2),
+                'estimated_wait': round(self._estimate_wait(depth + 1), 2),
+                'served': self._served,
+                'rejected': self._rejected,
+                'expired': self._expired
+            }
+
+    # Internal helpers (called with the condition held unless noted)
+    def _wake(self) -> None:
+        """Called by the pool (without its lock) when a worker may be free"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def _estimate_wait(self, position: int) -> float:
+        return position * self._avg_service_time / self._pool.max_size
+
+    def _retry_after(self, position: int) -> int:
+        return max(1, int(self._estimate_wait(position) + 0.5))
@@ -0,0 +1,180 @@
+"""
+Response cache for the IntenseRP API
+
+SillyTavern often resends byte-identical prompts (reconnects, client
+retries). Finished replies are kept here, keyed by a hash of the formatted
+prompt and the DeepSeek flags, so a repeat is answered without a browser.
+Entries are evicted least-recently-used once the byte budget is exceeded or
+when their TTL passes, and can be mirrored to one JSON file per entry so the
+cache survives restarts.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class CacheEntry:
+    """A cached reply, kept as the chunks it was originally streamed in"""
+
+    __slots__ = ('chunks', 'created_at', 'size')
+
+    def __init__(self, chunks: List[str], created_at: float):
+        self.chunks = chunks
+        self.created_at = created_at
+        self.size = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+
+class ResponseCache:
+    """Thread-safe LRU + TTL cache of replies with a byte budget"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 3600.0, path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+        if self.path:
+            self._load()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hash the parts that decide a reply (prompt and flags)"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(repr(part).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry.created_at > self.ttl:
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: str, chunks: List[str]) -> None:
+        entry = CacheEntry(list(chunks), time.time())
+        if not entry.chunks or entry.size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+            stored = key in self._entries
+
+        if stored and self.path:
+            self._write(key, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get a summary of the cache for debugging"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'persistent': bool(self.path)
+            }
+
+    # Internal helpers (called with the lock held unless noted)
+    def _evict(self) -> None:
+        cutoff = time.time() - self.ttl
+        for key in [k for k, e in self._entries.items() if e.created_at < cutoff]:
+            self._remove(key)
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        if self.path:
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def _write(self, key: str, entry: CacheEntry) -> None:
+        """Store an entry on disk (lock not held), replacing the file atomically
+
+        The file is serialized outside the lock but only moved into place under
+        it, and only while the entry is still cached, so an eviction or clear()
+        that ran meanwhile cannot leave an orphan file behind.
+        """
+        temp_path = None
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=self.path)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'created_at': entry.created_at, 'chunks': entry.chunks}, f)
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    os.replace(temp_path, self._file(key))
+                    temp_path = None
+        except OSError as e:
+            print(f"[color:yellow]Could not write response cache entry: {e}")
+        finally:
+            if temp_path:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def _load(self) -> None:
+        """Restore entries from disk, oldest first so the LRU order survives"""
+        if not os.path.isdir(self.path):
+            return
+
+        loaded = []
+        for name in os.listdir(self.path):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.path, name), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                loaded.append((name[:-5], CacheEntry(data['chunks'], float(data['created_at']))))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"[color:yellow]Skipping broken response cache entry {name}: {e}")
+
+        with self._lock:
+            for key, entry in sorted(loaded, key=lambda item: item[1].created_at):
+                self._entries[key] = entry
+                self._bytes += entry.size
+            self._evict()
+        if self._entries:
+            print(f"[color:cyan]Loaded {len(self._entries)} cached responses")
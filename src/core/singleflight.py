@@ -0,0 +1,233 @@
+"""
+In-flight request coalescing for the IntenseRP API
+
+When identical completions arrive while one is still generating (two
+clients, a double-clicked "generate"), the later ones follow the first
+generation instead of driving another browser. A Flight buffers the chunks
+of one generation for every request that follows it. Readers either pull
+the generation themselves, taking turns so a follower keeps it going when
+the first client leaves (waitress), or are woken by listeners while a
+producer publishes (asyncio). The generation is stopped once every reader
+has gone.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class Flight:
+    """The chunks of one generation, shared by every identical request"""
+
+    def __init__(self, key: Optional[str], owner_id: Any):
+        self.key = key
+        self.owner_id = owner_id
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[str] = None
+
+        self._cond = threading.Condition()
+        self._subscribers = 0
+        self._source: Optional[Iterator[str]] = None
+        self._driving = False
+        self._abandoned = False
+        self._listeners: List[Callable[[], None]] = []
+        self._finish_callbacks: List[Callable[[], None]] = []
+        self._abandon_callbacks: List[Callable[[], None]] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    @property
+    def subscribers(self) -> int:
+        with self._cond:
+            return self._subscribers
+
+    # Subscriptions
+    def subscribe(self) -> bool:
+        """Take a seat, False once the flight has ended or every reader left"""
+        with self._cond:
+            if self.done or self._abandoned:
+                return False
+            self._subscribers += 1
+            return True
+
+    def unsubscribe(self) -> None:
+        """Leave the flight; the last reader to leave stops an unfinished generation"""
+        with self._cond:
+            self._subscribers -= 1
+            abandoned = self._subscribers <= 0 and not self.done
+            self._abandoned = self._abandoned or abandoned
+            source = self._source if abandoned else None
+            callbacks = list(self._abandon_callbacks) if abandoned else []
+
+        if not abandoned:
+            return
+        for callback in callbacks:
+            self._call(callback)
+        if source is not None:
+            # Nobody pulls a source any more, so close it and end the flight here
+            close = getattr(source, 'close', None)
+            if close:
+                self._call(close)
+            self.finish()
+
+    def abort(self, error: str) -> None:
+        """End the flight early (the leader failed before generating) and leave it"""
+        self.finish(error)
+        self.unsubscribe()
+
+    def on_finish(self, callback: Callable[[], None]) -> None:
+        """Run callback once the generation has ended (immediately if it already has)"""
+        with self._cond:
+            if not self.done:
+                self._finish_callbacks.append(callback)
+                return
+        self._call(callback)
+
+    def on_abandon(self, callback: Callable[[], None]) -> None:
+        """Run callback when every reader left before the generation ended"""
+        with self._cond:
+            self._abandon_callbacks.append(callback)
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Call back (from the producer thread) on every new chunk and at the end"""
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]) -> None:
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    # Producers
+    def set_source(self, source: Iterator[str]) -> None:
+        """Let readers pull the generation from a blocking chunk iterator"""
+        with self._cond:
+            self._source = source
+            self._cond.notify_all()
+
+    def publish(self, chunk: str) -> None:
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            self._call(listener)
+
+    def finish(self, error: Optional[str] = None) -> None:
+        with self._cond:
+            if self.done:
+                return
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+            callbacks, self._finish_callbacks = self._finish_callbacks, []
+        for callback in listeners + callbacks:
+            self._call(callback)
+
+    # Readers
+    def reader(self, render: Optional[Callable[[str], str]] = None) -> "FlightReader":
+        """Iterate the flight with a seat taken by join() or subscribe()"""
+        return FlightReader(self, render)
+
+    def next_chunk(self, index: int) -> Optional[str]:
+        """Block until chunk index exists, pulling the source when no other reader is; None at the end"""
+        while True:
+            with self._cond:
+                while index >= len(self.chunks) and not self.done and (self._driving or self._source is None):
+                    self._cond.wait()
+                if index < len(self.chunks):
+                    return self.chunks[index]
+                if self.done:
+                    return None
+                self._driving = True
+                source = self._source
+
+            try:
+                chunk = next(source)
+            except StopIteration:
+                self.finish()
+            except Exception as e:
+                self.finish(str(e))
+                raise
+            else:
+                self.publish(chunk)
+            finally:
+                with self._cond:
+                    self._driving = False
+                    self._cond.notify_all()
+
+    @staticmethod
+    def _call(callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except Exception as e:
+            print(f"Error in request flight callback: {e}")
+
+
+class FlightReader:
+    """Iterator over a flight's chunks that gives up its seat when closed"""
+
+    def __init__(self, flight: Flight, render: Optional[Callable[[str], str]] = None):
+        self._flight = flight
+        self._render = render
+        self._index = 0
+        self._closed = False
+
+    def __iter__(self) -> "FlightReader":
+        return self
+
+    def __next__(self) -> str:
+        if self._closed:
+            raise StopIteration
+        chunk = self._flight.next_chunk(self._index)
+        if chunk is None:
+            self.close()
+            raise StopIteration
+        self._index += 1
+        return self._render(chunk) if self._render else chunk
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._flight.unsubscribe()
+
+
+class SingleFlight:
+    """Registry of generations that identical requests can join"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Flight] = {}
+
+    def join(self, key: Optional[str], owner_id: Any) -> Tuple[Flight, bool]:
+        """Take a seat on the running flight for key, or start one; True when this request leads
+
+        Requests without a key always get a private flight.
+        """
+        with self._lock:
+            flight = self._flights.get(key) if key else None
+            if flight and flight.subscribe():
+                return flight, False
+
+            flight = Flight(key, owner_id)
+            flight.subscribe()
+            if key:
+                self._flights[key] = flight
+                flight.on_finish(lambda: self._remove(flight))
+            return flight, True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get a summary of the registry for debugging"""
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'followers': sum(max(0, f.subscribers - 1) for f in self._flights.values())
+            }
+
+    def _remove(self, flight: Flight) -> None:
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
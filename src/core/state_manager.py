@@ -25,6 +25,11 @@ class StateManager:
         
         # Browser state
         self._driver = None
+        self._browser_pool = None
+        self._request_queue = None
+        self._response_cache = None
+        self._process_pool = None
+        self._pipeline_profiler = None
         self._last_driver = 0
         self._last_response = 0
         
@@ -86,6 +91,56 @@ class StateManager:
             elif old_value is not None and value is None:
                 self._notify_observers(StateEvent.BROWSER_STOPPED, old_value)
     
+    @property
+    def browser_pool(self):
+        with self._lock:
+            return self._browser_pool
+    
+    @browser_pool.setter
+    def browser_pool(self, value):
+        with self._lock:
+            self._browser_pool = value
+    
+    @property
+    def request_queue(self):
+        with self._lock:
+            return self._request_queue
+    
+    @request_queue.setter
+    def request_queue(self, value):
+        with self._lock:
+            self._request_queue = value
+    
+    @property
+    def response_cache(self):
+        with self._lock:
+            return self._response_cache
+    
+    @response_cache.setter
+    def response_cache(self, value):
+        with self._lock:
+            self._response_cache = value
+    
+    @property
+    def process_pool(self):
+        with self._lock:
+            return self._process_pool
+    
+    @process_pool.setter
+    def process_pool(self, value):
+        with self._lock:
+            self._process_pool = value
+    
+    @property
+    def pipeline_profiler(self):
+        with self._lock:
+            return self._pipeline_profiler
+    
+    @pipeline_profiler.setter
+    def pipeline_profiler(self, value):
+        with self._lock:
+            self._pipeline_profiler = value
+    
     @property
     def last_driver(self) -> int:
         with self._lock:
@@ -164,12 +219,24 @@ class StateManager:
             return self._config_manager.get_all()
         return {}
     
+    @property
+    def config_snapshot(self) -> Dict[str, Any]:
+        """Read-only configuration snapshot (no copy, no lock; carries a version)"""
+        if self._config_manager:
+            return self._config_manager.snapshot()
+        return {}
+    
+    def notify_config_updated(self) -> None:
+        """Tell observers the configuration changed, passing them the new snapshot"""
+        if self._config_manager:
+            self._notify_observers(StateEvent.CONFIG_UPDATED, self._config_manager.snapshot())
+    
     def update_config(self, new_config: Dict[str, Any]) -> None:
         """Update configuration and notify observers (backward compatibility)"""
         if self._config_manager:
             for key, value in new_config.items():
                 self._config_manager.set(key, value)
-            self._notify_observers(StateEvent.CONFIG_UPDATED, self._config_manager.get_all())
+            self.notify_config_updated()
     
     def set_config(self, config: Dict[str, Any]) -> None:
         """Replace entire configuration (backward compatibility)"""
@@ -177,7 +244,7 @@ class StateManager:
             # Clear and rebuild config
             for key, value in config.items():
                 self._config_manager.set(key, value)
-            self._notify_observers(StateEvent.CONFIG_UPDATED, self._config_manager.get_all())
+            self.notify_config_updated()
     
     def get_config_value(self, key: str, default: Any = None) -> Any:
         """Get a specific config value with dotted notation (e.g., 'models.deepseek.email')"""
@@ -189,7 +256,7 @@ class StateManager:
         """Set a specific config value with dotted notation"""
         if self._config_manager:
             self._config_manager.set(key, value)
-            self._notify_observers(StateEvent.CONFIG_UPDATED, self._config_manager.get_all())
+            self.notify_config_updated()
     
     # Logging manager
     @property
@@ -285,6 +352,11 @@ class StateManager:
             
             return {
                 'has_driver': self._driver is not None,
+                'browser_pool': self._browser_pool.get_stats() if self._browser_pool else None,
+                'request_queue': self._request_queue.get_stats() if self._request_queue else None,
+                'response_cache': self._response_cache.get_stats() if self._response_cache else None,
+                'process_pool': self._process_pool.get_stats() if self._process_pool else None,
+                'pipeline_profiler': self._pipeline_profiler.get_stats(details=False) if self._pipeline_profiler else None,
                 'driver_id': self._last_driver,
                 'response_id': self._last_response,
                 'has_textbox': self._textbox is not None,
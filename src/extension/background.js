@@ -4,19 +4,88 @@
 let isIntercepting = false;
 let activeTabId = null;
 let targetRequestId = null;
+const WS_PORT = 0; // Rewritten by IntenseRP when the WebSocket channel is enabled (0 = HTTP only)
+const CLIENT_ID = 'primary'; // Rewritten by IntenseRP with the name of the browser worker
+const CHANNEL_TOKEN = ''; // Rewritten by IntenseRP with a token that changes on every launch
+let channel = null;
+let activeSessionId = null; // Completion id sent by IntenseRP when interception starts
+let targetSessionId = null; // Session the current target request belongs to
 let streamBuffer = [];
 let completionTriggered = false;
 const DEFAULT_PORT = 5000;
 const localApiUrl = `http://127.0.0.1:${DEFAULT_PORT}`;
 
+// Send an interception callback to the local API, over the WebSocket when it is open
+function postToApi(type, payload) {
+  if (channel && channel.readyState === WebSocket.OPEN) {
+    try {
+      channel.send(JSON.stringify({ type: type, payload: payload }));
+      return Promise.resolve();
+    } catch (error) {
+      // Fall through to HTTP
+    }
+  }
+  return fetch(`${localApiUrl}/network/${type}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(payload)
+  });
+}
+
+// Keep a persistent channel to the local API, reconnecting while it is down
+function connectChannel() {
+  if (!WS_PORT) return;
+
+  try {
+    channel = new WebSocket(`ws://127.0.0.1:${WS_PORT}`);
+  } catch (error) {
+    channel = null;
+    setTimeout(connectChannel, 2000);
+    return;
+  }
+
+  channel.onopen = () => {
+    channel.send(JSON.stringify({ type: 'hello', clientId: CLIENT_ID, token: CHANNEL_TOKEN }));
+  };
+  channel.onmessage = (event) => {
+    let message;
+    try {
+      message = JSON.parse(event.data);
+    } catch (error) {
+      return;
+    }
+    handleControlMessage(message);
+  };
+  channel.onclose = () => {
+    channel = null;
+    setTimeout(connectChannel, 2000);
+  };
+  channel.onerror = () => {
+    // onclose follows and schedules the reconnect
+  };
+}
+
+// Control messages pushed by IntenseRP over the channel
+function handleControlMessage(message) {
+  if (message.action === 'startInterception') {
+    activeSessionId = message.sessionId ?? null;
+    if (isIntercepting) return;
+    chrome.tabs.query({ url: 'https://chat.deepseek.com/*' }, (tabs) => {
+      if (tabs && tabs.length > 0) {
+        startCDPInterception(tabs[0].id);
+      }
+    });
+  } else if (message.action === 'stopInterception') {
+    stopCDPInterception();
+  }
+}
+
 // Debug helper to send logs to IntenseRP console
 function debugLog(message) {
   // console.log(message); // Keep browser console too
-  fetch(`${localApiUrl}/network/debug-log`, {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ message: message })
-  }).catch(() => {}); // Silent fail if API not available
+  postToApi('debug-log', { message: message }).catch(() => {}); // Silent fail if API not available
 }
 
 // Proper UTF-8 decoding for base64 data containing multi-byte characters
@@ -44,8 +113,16 @@ function decodeBase64UTF8(base64Data) {
 chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
   if (message.action === 'startInterception') {
     debugLog('🔵 Starting CDP network interception...');
+    activeSessionId = message.sessionId ?? null;
     startCDPInterception(sender.tab.id);
     sendResponse({ status: 'started' });
+  } else if (message.action === 'setSession') {
+    activeSessionId = message.sessionId ?? null;
+    // Interception may have been stopped over the WebSocket without the content script knowing
+    if (!isIntercepting) {
+      startCDPInterception(sender.tab.id);
+    }
+    sendResponse({ status: 'session' });
   } else if (message.action === 'stopInterception') {
     debugLog('🔴 Stopping CDP network interception...');
     stopCDPInterception();
@@ -110,6 +187,8 @@ async function stopCDPInterception() {
     isIntercepting = false;
     activeTabId = null;
     targetRequestId = null;
+    activeSessionId = null;
+    targetSessionId = null;
     streamBuffer = [];
     lastProcessedData = '';
     chunkQueue = [];
@@ -176,20 +255,16 @@ function handleRequestWillBeSent(params) {
   if (url.includes('/api/v0/chat/completion')) {
     debugLog(`🟡 REAL DeepSeek STREAMING request detected - SETTING TARGET: ${params.requestId}`);
     targetRequestId = params.requestId;
+    targetSessionId = activeSessionId;
     completionTriggered = false; // Reset completion flag for new request
     
     // Notify local API about request
-    fetch(`${localApiUrl}/network/request`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        requestId: params.requestId,
-        url: url,
-        method: params.request.method,
-        timestamp: Date.now()
-      })
+    postToApi('request', {
+      sessionId: targetSessionId,
+      requestId: params.requestId,
+      url: url,
+      method: params.request.method,
+      timestamp: Date.now()
     }).catch(err => {
       debugLog(`❌ Failed to send request notification: ${err}`);
     });
@@ -230,16 +305,11 @@ async function handleResponseReceived(params) {
     }
     
     // Notify local API about response start
-    fetch(`${localApiUrl}/network/response-start`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        requestId: params.requestId,
-        responseHeaders: response.headers,
-        timestamp: Date.now()
-      })
+    postToApi('response-start', {
+      sessionId: targetSessionId,
+      requestId: params.requestId,
+      responseHeaders: response.headers,
+      timestamp: Date.now()
     }).catch(err => {
       // console.error('Failed to send response start notification:', err);
     });
@@ -249,6 +319,60 @@ async function handleResponseReceived(params) {
 let lastProcessedData = '';
 let chunkQueue = [];
 let isProcessingChunks = false;
+let pendingCompletion = null; // Set by the SSE finish event, sent once the chunk queue drains
+
+// Stream items are sent to the local API in batches instead of one POST per line
+const BATCH_INTERVAL_MS = 25;
+const BATCH_MAX_ITEMS = 64;
+let batchItems = [];
+let batchSessionId = null;
+let batchRequestId = null;
+let batchSeq = 0;
+let batchTimer = null;
+let batchChain = Promise.resolve(); // Keeps batch POSTs in order
+
+// Add a data line or event to the current batch, flushing on size or after a short delay
+function queueStreamItem(item, sessionId, requestId) {
+  if (batchItems.length > 0 && (sessionId !== batchSessionId || requestId !== batchRequestId)) {
+    flushStreamBatch();
+  }
+  if (requestId !== batchRequestId) {
+    batchSeq = 0; // Sequence numbers are per request
+  }
+  batchSessionId = sessionId;
+  batchRequestId = requestId;
+
+  item.seq = batchSeq++;
+  item.timestamp = Date.now();
+  batchItems.push(item);
+
+  if (batchItems.length >= BATCH_MAX_ITEMS) {
+    flushStreamBatch();
+  } else if (!batchTimer) {
+    batchTimer = setTimeout(flushStreamBatch, BATCH_INTERVAL_MS);
+  }
+}
+
+// Send the current batch, resolves once every batch queued so far was delivered
+function flushStreamBatch() {
+  if (batchTimer) {
+    clearTimeout(batchTimer);
+    batchTimer = null;
+  }
+  if (batchItems.length === 0) return batchChain;
+
+  const payload = {
+    sessionId: batchSessionId,
+    requestId: batchRequestId,
+    items: batchItems
+  };
+  batchItems = [];
+
+  batchChain = batchChain.then(() => postToApi('stream-batch', payload)).catch(err => {
+    debugLog(`❌ Failed to forward stream batch: ${err}`);
+  });
+  return batchChain;
+}
 
 // Handle data received - now captures actual streaming chunks
 async function handleDataReceived(params) {
@@ -264,7 +388,7 @@ async function handleDataReceived(params) {
     // debugLog(`🟢 Real-time chunk data (${data.length} chars): ${data.substring(0, 50)}...`);
     
     // Add to queue for sequential processing
-    chunkQueue.push(data);
+    chunkQueue.push({ data: data, sessionId: targetSessionId, requestId: params.requestId });
     processChunkQueue();
     
   } else if (params.encodedDataLength || params.dataLength) {
@@ -285,7 +409,7 @@ async function handleDataReceived(params) {
             // debugLog(`🟢 Fallback streaming data (${newData.length} chars): ${newData.substring(0, 50)}...`);
             
             // Add to queue for sequential processing
-            chunkQueue.push(newData);
+            chunkQueue.push({ data: newData, sessionId: targetSessionId, requestId: params.requestId });
             processChunkQueue();
           }
           lastProcessedData = data;
@@ -309,19 +433,25 @@ async function processChunkQueue() {
     
     try {
       // Process chunk sequentially
-      await processSSEDataSlowly(chunk);
+      processSSEData(chunk.data, chunk.sessionId, chunk.requestId);
     } catch (error) {
       debugLog(`❌ Error processing chunk: ${error.message}`);
     }
   }
   
   isProcessingChunks = false;
+
+  if (pendingCompletion) {
+    const { sessionId, requestId } = pendingCompletion;
+    pendingCompletion = null;
+    await waitForQueueAndTriggerCompletion(sessionId, requestId);
+  }
 }
 
 // Note: Polling functions removed - now using direct streaming data capture
 
-// Process SSE data slowly and carefully
-async function processSSEDataSlowly(data) {
+// Split SSE data into lines and queue them for batched delivery
+function processSSEData(data, sessionId, requestId) {
   const lines = data.split('\n');
   
   for (const line of lines) {
@@ -329,40 +459,12 @@ async function processSSEDataSlowly(data) {
       if (line.startsWith('data: ')) {
         const eventData = line.substring(6);
         // debugLog(`📝 Processing SSE Data: ${eventData.substring(0, 50)}...`);
-        
-        // Send each data item individually with delay
-        await fetch(`${localApiUrl}/network/stream-data`, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({
-            data: eventData,
-            timestamp: Date.now()
-          })
-        }).catch(err => {
-          debugLog(`❌ Failed to forward stream data: ${err}`);
-        });
-        
-        // Small delay between data items
-        await new Promise(resolve => setTimeout(resolve, 20));
+        queueStreamItem({ type: 'data', data: eventData }, sessionId, requestId);
         
       } else if (line.startsWith('event: ')) {
         const eventType = line.substring(7);
         // debugLog(`🎯 Processing SSE Event: ${eventType}`);
-        
-        await fetch(`${localApiUrl}/network/stream-event`, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({
-            event: eventType,
-            timestamp: Date.now()
-          })
-        }).catch(err => {
-          debugLog(`❌ Failed to forward stream event: ${err}`);
-        });
+        queueStreamItem({ type: 'event', event: eventType }, sessionId, requestId);
         
         // Detect completion based on actual SSE events from DeepSeek
         if (eventType === 'finish') {
@@ -370,7 +472,7 @@ async function processSSEDataSlowly(data) {
           if (!completionTriggered) {
             completionTriggered = true;
             debugLog('🟢 SSE completion handler winning - triggering completion after queue empties');
-            await waitForQueueAndTriggerCompletion();
+            pendingCompletion = { sessionId: sessionId, requestId: requestId };
           } else {
             debugLog('🟡 SSE completion handler - completion already triggered by network event, skipping');
           }
@@ -398,6 +500,7 @@ async function handleLoadingFinished(params) {
   }
   
   completionTriggered = true;
+  const sessionId = targetSessionId;
   debugLog('🟢 Network completion handler winning - WAITING FOR QUEUE TO EMPTY');
   
   // Wait for all chunks to be processed before marking complete
@@ -416,31 +519,31 @@ async function handleLoadingFinished(params) {
     debugLog('✅ All chunks processed - MARKING COMPLETE');
   }
   
+  // Deliver the last batch before the completion signal
+  await flushStreamBatch();
+  
   // Notify local API about response end
-  fetch(`${localApiUrl}/network/response-end`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-    },
-    body: JSON.stringify({
-      requestId: params.requestId,
-      timestamp: Date.now()
-    })
+  postToApi('response-end', {
+    sessionId: sessionId,
+    requestId: params.requestId,
+    timestamp: Date.now()
   }).catch(err => {
     debugLog(`❌ Failed to send response end notification: ${err}`);
   });
   
   // Reset for next request
   targetRequestId = null;
+  targetSessionId = null;
   streamBuffer = [];
   lastProcessedData = '';
   chunkQueue = [];
   isProcessingChunks = false;
+  pendingCompletion = null;
   completionTriggered = false;
 }
 
 // Wait for queue to empty and trigger completion (based on SSE events)
-async function waitForQueueAndTriggerCompletion() {
+async function waitForQueueAndTriggerCompletion(sessionId, requestId) {
   debugLog('🟢 Waiting for chunk queue to empty before triggering completion...');
   
   const maxWaitTime = 10000; // 10 second maximum wait
@@ -457,16 +560,14 @@ async function waitForQueueAndTriggerCompletion() {
     debugLog('✅ All chunks processed before completion - MARKING COMPLETE');
   }
   
+  // Deliver the last batch before the completion signal
+  await flushStreamBatch();
+  
   // Notify local API about response end
-  fetch(`${localApiUrl}/network/response-end`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-    },
-    body: JSON.stringify({
-      requestId: targetRequestId,
-      timestamp: Date.now()
-    })
+  postToApi('response-end', {
+    sessionId: sessionId,
+    requestId: requestId,
+    timestamp: Date.now()
   }).catch(err => {
     debugLog(`❌ Failed to send completion notification: ${err}`);
   });
@@ -478,27 +579,25 @@ function handleLoadingFailed(params) {
   
   console.log('🔴 Loading failed for DeepSeek API request:', params.errorText);
   
-  // Notify local API about error
-  fetch(`${localApiUrl}/network/response-error`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-    },
-    body: JSON.stringify({
-      requestId: params.requestId,
-      error: params.errorText,
-      timestamp: Date.now()
-    })
-  }).catch(err => {
+  // Notify local API about error once the data captured so far was delivered
+  const errorPayload = {
+    sessionId: targetSessionId,
+    requestId: params.requestId,
+    error: params.errorText,
+    timestamp: Date.now()
+  };
+  flushStreamBatch().then(() => postToApi('response-error', errorPayload)).catch(err => {
     // console.error('Failed to send error notification:', err);
   });
   
   // Reset for next request
   targetRequestId = null;
+  targetSessionId = null;
   streamBuffer = [];
   lastProcessedData = '';
   chunkQueue = [];
   isProcessingChunks = false;
+  pendingCompletion = null;
   completionTriggered = false;
 }
 
@@ -506,21 +605,13 @@ function handleLoadingFailed(params) {
 function handleEventSourceMessage(params) {
   // console.log('🟢 EventSource message received:', params);
   
-  // Forward the SSE data directly to local API
-  fetch(`${localApiUrl}/network/stream-data`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-    },
-    body: JSON.stringify({
-      data: params.data,
-      eventName: params.eventName || 'message',
-      eventId: params.eventId,
-      timestamp: params.timestamp
-    })
-  }).catch(err => {
-    // console.error('Failed to forward EventSource data:', err);
-  });
+  // Forward the SSE data to local API with the next batch
+  queueStreamItem({
+    type: 'data',
+    data: params.data,
+    eventName: params.eventName || 'message',
+    eventId: params.eventId
+  }, targetSessionId, params.requestId);
 }
 
 // Parse and forward streaming data
@@ -537,15 +628,11 @@ function parseAndForwardStreamData(data) {
         // debugLog(`📝 SSE Data: ${eventData.substring(0, 100)}...`);
         
         // Forward to local API
-        fetch(`${localApiUrl}/network/stream-data`, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({
-            data: eventData,
-            timestamp: Date.now()
-          })
+        postToApi('stream-data', {
+          sessionId: targetSessionId,
+          requestId: targetRequestId,
+          data: eventData,
+          timestamp: Date.now()
         }).catch(err => {
           debugLog(`❌ Failed to forward stream data: ${err}`);
         });
@@ -555,15 +642,11 @@ function parseAndForwardStreamData(data) {
         // debugLog(`🎯 SSE Event: ${eventType}`);
         
         // Forward to local API
-        fetch(`${localApiUrl}/network/stream-event`, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({
-            event: eventType,
-            timestamp: Date.now()
-          })
+        postToApi('stream-event', {
+          sessionId: targetSessionId,
+          requestId: targetRequestId,
+          event: eventType,
+          timestamp: Date.now()
         }).catch(err => {
           debugLog(`❌ Failed to forward stream event: ${err}`);
         });
@@ -579,6 +662,8 @@ chrome.debugger.onDetach.addListener((source, reason) => {
     isIntercepting = false;
     activeTabId = null;
     targetRequestId = null;
+    activeSessionId = null;
+    targetSessionId = null;
     streamBuffer = [];
     lastProcessedData = '';
     chunkQueue = [];
@@ -587,4 +672,6 @@ chrome.debugger.onDetach.addListener((source, reason) => {
   }
 });
 
+connectChannel();
+
 console.log('CDP Network Interceptor background script initialized');
\ No newline at end of file
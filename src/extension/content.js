@@ -4,14 +4,18 @@
 let isIntercepting = false;
 
 // Functions to control interception
-function startInterception() {
-  if (isIntercepting) return;
+function startInterception(sessionId) {
+  if (isIntercepting) {
+    // Already attached, just move captures over to the new session
+    chrome.runtime.sendMessage({ action: 'setSession', sessionId: sessionId });
+    return;
+  }
   
   // console.log('🔵 Starting CDP network interception...');
   isIntercepting = true;
   
   // Send message to background script to start CDP interception
-  chrome.runtime.sendMessage({ action: 'startInterception' }, (response) => {
+  chrome.runtime.sendMessage({ action: 'startInterception', sessionId: sessionId }, (response) => {
     if (chrome.runtime.lastError) {
       console.error('❌ Error starting CDP interception:', chrome.runtime.lastError);
       isIntercepting = false;
@@ -43,7 +47,7 @@ window.addEventListener('message', (event) => {
   if (event.origin !== 'https://chat.deepseek.com') return;
   
   if (event.data.action === 'startNetworkInterception') {
-    startInterception();
+    startInterception(event.data.sessionId);
   } else if (event.data.action === 'stopNetworkInterception') {
     stopInterception();
   }
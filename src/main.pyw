@@ -1,4 +1,7 @@
+import multiprocessing
 import gui
 
 if __name__ == "__main__":
+    # Process pool workers of a frozen build start through this entry point
+    multiprocessing.freeze_support()
     gui.create_gui()
\ No newline at end of file
@@ -9,7 +9,8 @@ from .message_models import (
     CharacterInfo,
     ProcessedMessage,
     ChatResponse,
-    DeepSeekSettings
+    DeepSeekSettings,
+    DirectiveScan
 )
 
 __all__ = [
@@ -19,5 +20,6 @@ __all__ = [
     'CharacterInfo',
     'ProcessedMessage',
     'ChatResponse',
-    'DeepSeekSettings'
+    'DeepSeekSettings',
+    'DirectiveScan'
 ]
\ No newline at end of file
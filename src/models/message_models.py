@@ -1,7 +1,7 @@
-from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
 from enum import Enum
-import re
+from core import patterns
 
 
 class MessageRole(Enum):
@@ -10,6 +10,10 @@ class MessageRole(Enum):
     ASSISTANT = "assistant"
 
 
+# Role strings SillyTavern sends -> MessageRole, anything else is treated as a user message
+_ROLES = {role.value: role for role in MessageRole}
+
+
 @dataclass
 class Message:
     role: MessageRole
@@ -21,7 +25,7 @@ class Message:
     def from_dict(cls, data: Dict[str, Any]) -> 'Message':
         role_str = data.get('role', 'user').lower()
         original_role = data.get('role', 'user')  # Store original case-preserved role
-        role = MessageRole(role_str) if role_str in [r.value for r in MessageRole] else MessageRole.USER
+        role = _ROLES.get(role_str, MessageRole.USER)
         name = data.get('name')  # Extract optional name field
         return cls(role=role, content=data.get('content', ''), original_role=original_role, name=name)
     
@@ -67,6 +71,11 @@ class ChatRequest:
     # Prefix support for assistant prefill
     prefix_content: Optional[str] = None  # Assistant message content to prefill
     
+    # Directives in the user messages, scanned once per request
+    _directives: Optional['DirectiveScan'] = field(default=None, init=False, repr=False, compare=False)
+    # Names of the user messages, in order of appearance, collected once per request
+    _user_names: Optional[List[str]] = field(default=None, init=False, repr=False, compare=False)
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ChatRequest':
         messages = [Message.from_dict(msg) for msg in data.get('messages', [])]
@@ -94,6 +103,22 @@ class ChatRequest:
             prefix_content=prefix_content
         )
     
+    def scan_directives(self) -> 'DirectiveScan':
+        """Scan the user messages for DeepSeek directives; later calls reuse the result"""
+        if self._directives is None:
+            self._directives = DirectiveScan.from_messages(self.messages)
+        return self._directives
+    
+    def scan_user_names(self) -> List[str]:
+        """Names of the user messages in order of first appearance; later calls reuse the result"""
+        if self._user_names is None:
+            names = {}
+            for msg in self.messages:
+                if msg.role == MessageRole.USER and msg.has_user_name():
+                    names[msg.get_user_name()] = None
+            self._user_names = list(names)
+        return self._user_names
+    
     def get_user_messages(self) -> List[Message]:
         return [msg for msg in self.messages if msg.role == MessageRole.USER]
     
@@ -110,11 +135,7 @@ class ChatRequest:
     
     def get_unique_user_names(self) -> List[str]:
         """Get all unique user names from messages (STMP-style multiple users)"""
-        names = set()
-        for msg in self.messages:
-            if msg.role == MessageRole.USER and msg.has_user_name():
-                names.add(msg.get_user_name())
-        return sorted(list(names))
+        return sorted(self.scan_user_names())
     
     def get_messages_by_user(self, user_name: str) -> List[Message]:
         """Get all messages from a specific user"""
@@ -139,8 +160,8 @@ class CharacterInfo:
     
     def extract_names_from_content(self, content: str) -> None:
         """Extract character and user names from content"""
-        character_match = re.search(r'DATA1:\s*"([^"]*)"', content)
-        user_match = re.search(r'DATA2:\s*"([^"]*)"', content)
+        character_match = patterns.DATA1.search(content)
+        user_match = patterns.DATA2.search(content)
         
         if character_match:
             self.character_name = character_match.group(1)
@@ -218,37 +239,45 @@ class DeepSeekSettings:
     @classmethod
     def detect_from_messages(cls, messages: List[Message]) -> 'DeepSeekSettings':
         """Auto-detect settings from message content"""
-        settings = cls()
-        
-        # Check all user messages for directives
-        for message in messages:
-            if message.role == MessageRole.USER:
-                content = message.content
-                
-                # Check for deepthink markers
-                if re.search(r'({{r1}}|\[r1\]|\(r1\))', content, re.IGNORECASE):
-                    settings.deepthink = True
-                
-                # Check for search markers
-                if re.search(r'({{search}}|\[search\])', content, re.IGNORECASE):
-                    settings.search = True
-        
-        return settings
+        return DirectiveScan.from_messages(messages).settings
     
     @staticmethod
     def clean_directives_from_content(content: str) -> str:
         """Remove DeepSeek directives from message content"""
-        # Remove deepthink markers
-        content = re.sub(r'{{r1}}\s*', '', content, flags=re.IGNORECASE)
-        content = re.sub(r'\[r1\]\s*', '', content, flags=re.IGNORECASE)
-        content = re.sub(r'\(r1\)\s*', '', content, flags=re.IGNORECASE)
-        
-        # Remove search markers
-        content = re.sub(r'{{search}}\s*', '', content, flags=re.IGNORECASE)
-        content = re.sub(r'\[search\]\s*', '', content, flags=re.IGNORECASE)
+        content, _, _ = patterns.scan_directives(content)
+        return DeepSeekSettings.tidy_cleaned_content(content)
+    
+    @staticmethod
+    def tidy_cleaned_content(content: str) -> str:
+        """Whitespace cleanup after the directives were removed"""
+        content = patterns.BLANK_LINES.sub('\n\n', content)  # Remove empty lines with only whitespace
+        return content.strip()
+
+
+@dataclass
+class DirectiveScan:
+    """Directives found in the user messages of a request, and each message without them"""
+    settings: DeepSeekSettings
+    stripped: Dict[int, Tuple[str, str]]  # id(message) -> (content scanned, content without directives)
+    
+    @classmethod
+    def from_messages(cls, messages: List[Message]) -> 'DirectiveScan':
+        """Detect and strip the directives of every user message in one sweep each"""
+        settings = DeepSeekSettings()
+        stripped = {}
         
-        # Clean up extra whitespace
-        content = re.sub(r'\n\s*\n', '\n\n', content)  # Remove empty lines with only whitespace
-        content = content.strip()
+        for message in messages:
+            if message.role == MessageRole.USER:
+                content, deepthink, search = patterns.scan_directives(message.content)
+                settings.deepthink = settings.deepthink or deepthink
+                settings.search = settings.search or search
+                stripped[id(message)] = (message.content, content)
         
-        return content
\ No newline at end of file
+        return cls(settings=settings, stripped=stripped)
+    
+    def clean_content(self, message: Message) -> str:
+        """The message's content without directives, as clean_directives_from_content returns it"""
+        scanned = self.stripped.get(id(message))
+        if scanned and scanned[0] is message.content:
+            return DeepSeekSettings.tidy_cleaned_content(scanned[1])
+        return DeepSeekSettings.clean_directives_from_content(message.content)
\ No newline at end of file
@@ -9,11 +9,16 @@ from .message_pipeline import (
     get_streaming_setting,
     get_deepseek_settings
 )
+from .process_pool import PipelineProcessPool, ProcessPoolUnavailable
+from .profiling import PipelineProfiler
 
 __all__ = [
     'MessagePipeline',
     'PipelineFactory',
     'process_character_data',
     'get_streaming_setting', 
-    'get_deepseek_settings'
+    'get_deepseek_settings',
+    'PipelineProcessPool',
+    'ProcessPoolUnavailable',
+    'PipelineProfiler'
 ]
\ No newline at end of file
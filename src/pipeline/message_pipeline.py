@@ -2,19 +2,67 @@ from typing import Dict, Any, Optional
 from processors.base_processor import ProcessorPipeline, ProcessingError
 from processors.character_processor import CharacterProcessor, MessageFormatter
 from processors.deepseek_processor import DeepSeekProcessor
-from processors.content_processor import ContentProcessor
-from models.message_models import ChatRequest, ChatResponse, DeepSeekSettings
+from processors.content_processor import ContentProcessor, IncrementalMarkdownConverter
+from processors.response_stages import (
+    ResponseChain, ThinkTagStage, RegexReplaceStage, WhitespaceStage, ClosingSymbolStage, parse_replacement_rules
+)
+from models.message_models import ChatRequest, ChatResponse
+from pipeline import process_pool as pool_tasks
+from pipeline.process_pool import PipelineProcessPool, ProcessPoolUnavailable
+from pipeline.profiling import PipelineProfiler
 
 
 class MessagePipeline:
     """Main pipeline for processing chat messages"""
     
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
+    # Formatting settings applied to the reply text rather than the prompt
+    RESPONSE_SETTINGS = ("html_parser", "browser_markdown", "normalize_whitespace", "replacements")
+    
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        process_pool: Optional[PipelineProcessPool] = None,
+        profiler: Optional[PipelineProfiler] = None
+    ):
         self.config = config or {}
-        self.pipeline = ProcessorPipeline()
-        self.content_processor = ContentProcessor()
+        self.process_pool = process_pool
+        # Times the processors of requests built here (not the ones sent to the process pool)
+        self.profiler = profiler
+        # Large conversions and prompts go to worker processes, which need a picklable config snapshot
+        self._offload = process_pool if self.config_version is not None else None
+        self.pipeline = ProcessorPipeline(profiler=profiler)
+        self.content_processor = ContentProcessor(self._html_parser())
+        self.replacement_rules = self._replacement_rules()
         self._setup_pipeline()
     
+    def _html_parser(self) -> Optional[str]:
+        """Parser chosen in the config, None to use the default one"""
+        parser = self.config.get("formatting", {}).get("html_parser", "Auto")
+        return None if parser == "Auto" else parser
+    
+    def _replacement_rules(self) -> list:
+        """Compile the user's replacement rules once, skipping the invalid ones"""
+        rules, errors = parse_replacement_rules(self.config.get("formatting", {}).get("replacements", ""))
+        for error in errors:
+            print(f"[color:yellow]Skipping replacement rule, {error}")
+        return rules
+    
+    @property
+    def config_version(self) -> Optional[int]:
+        """Version of the config snapshot the pipeline was built from, None for a plain dict"""
+        return getattr(self.config, "version", None)
+    
+    @property
+    def response_settings(self) -> tuple:
+        """Settings that change a reply after DeepSeek has sent it, cached replies depend on them"""
+        formatting = self.config.get("formatting", {})
+        return tuple(formatting.get(key) for key in self.RESPONSE_SETTINGS)
+    
+    @property
+    def browser_markdown(self) -> bool:
+        """Whether responses are serialized to Markdown inside the DeepSeek page"""
+        return bool(self.config.get("formatting", {}).get("browser_markdown", False))
+    
     def _setup_pipeline(self):
         """Setup the processing pipeline with default processors"""
         # Add processors in order
@@ -23,6 +71,12 @@ class MessagePipeline:
     
     def process_request(self, request_data: Dict[str, Any]) -> ChatRequest:
         """Process incoming request data into a ChatRequest"""
+        if self._offload and self._offload.accepts_request(request_data):
+            try:
+                return self._offload.run(pool_tasks.process_request, self.config, request_data)
+            except ProcessPoolUnavailable:
+                pass
+        
         try:
             # Create ChatRequest from raw data
             request = ChatRequest.from_dict(request_data)
@@ -41,8 +95,36 @@ class MessagePipeline:
     
     def process_response_content(self, html_content: str) -> str:
         """Process HTML response content to clean markdown"""
+        if self._offload and self._offload.accepts_html(html_content):
+            try:
+                return self._offload.run(pool_tasks.convert_html, self.config, html_content)
+            except ProcessPoolUnavailable:
+                pass
         return self.content_processor.process_html_to_markdown(html_content)
     
+    def process_serialized_markdown(self, text: str) -> str:
+        """Finish Markdown that was serialized in the page"""
+        return self.content_processor.process_serialized_markdown(text)
+    
+    def create_markdown_stream(self) -> IncrementalMarkdownConverter:
+        """Create a converter for a response that is read while it grows"""
+        return IncrementalMarkdownConverter(self.content_processor)
+    
+    def create_response_chain(self, network: bool = False, send_thoughts: bool = True) -> ResponseChain:
+        """Create the post-processing chain for one response
+        
+        Network responses start from decoder deltas and get their thinking
+        wrapped in <think> tags, page responses get a closing quote or asterisk.
+        """
+        stages = []
+        if self.replacement_rules:
+            stages.append(RegexReplaceStage(self.replacement_rules))
+        if self.config.get("formatting", {}).get("normalize_whitespace", False):
+            stages.append(WhitespaceStage())
+        if not network:
+            stages.append(ClosingSymbolStage())
+        return ResponseChain(stages, ThinkTagStage(send_thoughts) if network else None)
+    
     def get_closing_symbol(self, text: str) -> str:
         """Get closing symbol for text if needed"""
         return self.content_processor.get_closing_symbol(text)
@@ -53,10 +135,13 @@ class MessagePipeline:
     
     def update_config(self, new_config: Dict[str, Any]):
         """Update pipeline configuration"""
-        self.config.update(new_config)
+        # Merge into a new dict, the current config may be a read-only snapshot
+        self.config = {**self.config, **new_config}
+        
+        self.replacement_rules = self._replacement_rules()
         
         # Recreate pipeline with new config
-        self.pipeline = ProcessorPipeline()
+        self.pipeline = ProcessorPipeline(profiler=self.profiler)
         self._setup_pipeline()
     
     def get_pipeline_info(self) -> Dict[str, Any]:
@@ -118,7 +203,7 @@ def get_deepseek_settings(data: Dict[str, Any]) -> Dict[str, bool]:
     """Get DeepSeek settings from request data"""
     try:
         request = ChatRequest.from_dict(data)
-        settings = DeepSeekSettings.detect_from_messages(request.messages)
+        settings = request.scan_directives().settings
         
         return {
             'deepthink': settings.deepthink,
@@ -0,0 +1,155 @@
+"""
+Process pool for the CPU-heavy pipeline stages
+
+HTML to Markdown conversion and prompt building are pure Python and hold
+the GIL for as long as they run, so one huge response being reconverted
+every poll stalls every other request thread. With the pool enabled, inputs
+above a size threshold are handed to worker processes that imported bs4 and
+the processors when they started. Smaller inputs stay on the calling thread,
+where a round trip to another process would cost more than the work.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+
+class ProcessPoolUnavailable(Exception):
+    """The pool is stopped or broken, the caller should do the work itself"""
+
+
+class PipelineProcessPool:
+    """Worker processes for conversions and prompts too large to run inline"""
+
+    def __init__(self, workers: int = 2, html_threshold: int = 50000, prompt_threshold: int = 250000):
+        self.workers = workers
+        self.html_threshold = html_threshold
+        self.prompt_threshold = prompt_threshold
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._offloaded = 0
+        self._failures = 0
+
+    def start(self) -> None:
+        """Start the workers and let each one import the processors before the first task"""
+        with self._lock:
+            if self._executor:
+                return
+            # Spawned, not forked: the API process runs browser and server threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker
+            )
+            for _ in range(self.workers):
+                self._executor.submit(os.getpid)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def accepts_html(self, html: str) -> bool:
+        """Whether a response is large enough to convert in a worker"""
+        return self._executor is not None and len(html) >= self.html_threshold
+
+    def accepts_request(self, request_data: Dict[str, Any]) -> bool:
+        """Whether a request's messages are large enough to process in a worker"""
+        if self._executor is None:
+            return False
+        size = 0
+        for message in request_data.get("messages") or ():
+            content = message.get("content") if isinstance(message, dict) else None
+            if isinstance(content, str):
+                size += len(content)
+        return size >= self.prompt_threshold
+
+    def run(self, func: Callable, *args) -> Any:
+        """Run func(*args) in a worker and wait for the result (errors from func are re-raised)"""
+        executor = self._executor
+        if executor is None:
+            raise ProcessPoolUnavailable("process pool is not running")
+
+        try:
+            future = executor.submit(func, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._failed(executor, e)
+            raise ProcessPoolUnavailable(str(e)) from e
+
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            self._failed(executor, e)
+            raise ProcessPoolUnavailable(str(e)) from e
+
+        with self._lock:
+            self._offloaded += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get a summary of the pool for debugging"""
+        with self._lock:
+            return {
+                'running': self._executor is not None,
+                'workers': self.workers,
+                'html_threshold': self.html_threshold,
+                'prompt_threshold': self.prompt_threshold,
+                'offloaded': self._offloaded,
+                'failures': self._failures
+            }
+
+    def _failed(self, executor: ProcessPoolExecutor, error: Exception) -> None:
+        """Stop using a pool whose workers died, everything runs inline from then on"""
+        with self._lock:
+            self._failures += 1
+            if self._executor is executor:
+                self._executor = None
+            else:
+                executor = None
+        if executor:
+            print(f"[color:red]Process pool stopped, processing inline from now on: {error}")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# =============================================================================================================================
+# Worker side (runs in the pool's processes)
+# =============================================================================================================================
+
+_worker_pipeline = None
+
+
+def _warm_worker() -> None:
+    """Import bs4 and the processors, and run one conversion, before the first real task"""
+    try:
+        from processors.content_processor import ContentProcessor
+        ContentProcessor().process_html_to_markdown("<p><strong>warm</strong></p>")
+    except Exception as e:
+        print(f"Error warming up process pool worker: {e}")
+
+
+def _pipeline_for(config):
+    """The worker's pipeline for a config snapshot, reused while the version stays the same"""
+    global _worker_pipeline
+    from pipeline.message_pipeline import MessagePipeline
+
+    version = getattr(config, "version", None)
+    if _worker_pipeline is None or version is None or _worker_pipeline.config_version != version:
+        _worker_pipeline = MessagePipeline(config)
+    return _worker_pipeline
+
+
+def convert_html(config, html_content: str) -> str:
+    """Task: HTML response to Markdown"""
+    return _pipeline_for(config).process_response_content(html_content)
+
+
+def process_request(config, request_data: Dict[str, Any]):
+    """Task: request data to a processed ChatRequest"""
+    request = _pipeline_for(config).process_request(request_data)
+    # The directive scan is keyed by object ids of this process
+    request._directives = None
+    return request
@@ -0,0 +1,144 @@
+"""
+Timings of the request processors
+
+ProcessorPipeline hands the per-processor timings of every request to the
+profiler, which keeps the latest requests and running totals for the
+/debug/pipeline endpoint and records the processor metrics. A sampled share
+of requests also runs under cProfile, and the capture is kept when the
+request turned out slower than the threshold.
+"""
+
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+import utils.metrics as metrics
+from processors.base_processor import ProcessorTiming
+
+# Functions listed in a kept cProfile capture
+CAPTURE_LINES = 25
+
+
+class PipelineProfiler:
+    """Collects how long each processor takes and what it was given"""
+
+    def __init__(self, slow_threshold: float = 0.5, sample_rate: float = 0.0, history: int = 50, max_captures: int = 10):
+        self.slow_threshold = slow_threshold
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        # cProfile can only follow one request at a time
+        self._capture_lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+        self._captures = deque(maxlen=max_captures)
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._requests = 0
+        self._slow = 0
+
+    def configure(self, slow_threshold: float, sample_rate: float) -> None:
+        """Change the settings without losing what was collected"""
+        self.slow_threshold = slow_threshold
+        self.sample_rate = sample_rate
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Start a cProfile capture if this request is sampled, None otherwise"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._capture_lock.acquire(blocking=False):
+            return None
+
+        try:
+            capture = cProfile.Profile()
+            capture.enable()
+        except Exception as e:
+            # Another profiler or a debugger already owns the interpreter hooks
+            self._capture_lock.release()
+            print(f"Error starting pipeline profile: {e}")
+            return None
+        return capture
+
+    def record(self, timings: Sequence[ProcessorTiming], seconds: float, capture: Optional[cProfile.Profile] = None) -> None:
+        """Store the timings of one request"""
+        if capture is not None:
+            capture.disable()
+            self._capture_lock.release()
+
+        for timing in timings:
+            metrics.PROCESSOR_TIME.observe(timing.seconds, processor=timing.processor)
+            metrics.PROCESSOR_RUNS.inc(processor=timing.processor, result="processed" if timing.ran else "skipped")
+
+        slow = seconds >= self.slow_threshold
+        entry = {
+            'timestamp': time.time(),
+            'seconds': seconds,
+            'slow': slow,
+            'processors': [timing._asdict() for timing in timings]
+        }
+        report = _capture_report(capture) if capture is not None and slow else None
+
+        with self._lock:
+            self._requests += 1
+            if slow:
+                self._slow += 1
+            self._recent.append(entry)
+            if report:
+                self._captures.append({'timestamp': entry['timestamp'], 'seconds': seconds, 'report': report})
+
+            for timing in timings:
+                totals = self._totals.setdefault(timing.processor, {
+                    'runs': 0, 'skipped': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'input_chars': 0, 'output_chars': 0
+                })
+                if timing.ran:
+                    totals['runs'] += 1
+                else:
+                    totals['skipped'] += 1
+                totals['seconds'] += timing.seconds
+                totals['max_seconds'] = max(totals['max_seconds'], timing.seconds)
+                totals['input_chars'] += timing.input_chars
+                totals['output_chars'] += timing.output_chars
+
+    def get_stats(self, details: bool = True) -> Dict[str, Any]:
+        """Get the totals, and with details the latest requests and the kept captures"""
+        with self._lock:
+            processors = {name: dict(totals) for name, totals in self._totals.items()}
+            recent: List[dict] = list(self._recent) if details else []
+            captures = list(self._captures) if details else []
+            requests, slow = self._requests, self._slow
+
+        total_seconds = sum(totals['seconds'] for totals in processors.values())
+        for totals in processors.values():
+            calls = totals['runs'] + totals['skipped']
+            totals['mean_seconds'] = totals['seconds'] / calls if calls else 0.0
+            totals['share'] = totals['seconds'] / total_seconds if total_seconds else 0.0
+
+        return {
+            'requests': requests,
+            'slow_requests': slow,
+            'slow_threshold_ms': round(self.slow_threshold * 1000),
+            'sample_percent': round(self.sample_rate * 100),
+            'processors': processors,
+            'recent': recent,
+            'captures': captures
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._captures.clear()
+            self._totals.clear()
+            self._requests = self._slow = 0
+
+
+def _capture_report(capture: cProfile.Profile) -> str:
+    """The functions of a capture with the most cumulative time, as pstats prints them"""
+    try:
+        stream = io.StringIO()
+        pstats.Stats(capture, stream=stream).sort_stats("cumulative").print_stats(CAPTURE_LINES)
+        return stream.getvalue()
+    except Exception as e:
+        print(f"Error reading pipeline profile: {e}")
+        return ""
@@ -2,18 +2,40 @@
 Message processors for the IntenseRP API pipeline system.
 """
 
-from .base_processor import BaseProcessor, ProcessorPipeline, ProcessingError
-from .character_processor import CharacterProcessor, MessageFormatter
-from .content_processor import ContentProcessor
+from .base_processor import BaseProcessor, ProcessorPipeline, ProcessingError, ProcessorTiming, request_chars
+from .character_processor import CharacterProcessor, MessageFormatter, SegmentCache
+from .content_processor import ContentProcessor, IncrementalMarkdownConverter, split_top_level_blocks, available_parsers, resolve_parser
 from .deepseek_processor import DeepSeekProcessor, DeepSeekConfigValidator
+from .stream_decoder import DeepSeekStreamDecoder, StreamDelta
+from .response_stages import (
+    ResponseChain, ResponseStage, ThinkTagStage, RegexReplaceStage, WhitespaceStage, ClosingSymbolStage,
+    parse_replacement_rules, assemble_response
+)
 
 __all__ = [
     'BaseProcessor',
     'ProcessorPipeline', 
     'ProcessingError',
+    'ProcessorTiming',
+    'request_chars',
     'CharacterProcessor',
     'MessageFormatter',
+    'SegmentCache',
     'ContentProcessor',
+    'IncrementalMarkdownConverter',
+    'split_top_level_blocks',
+    'available_parsers',
+    'resolve_parser',
     'DeepSeekProcessor',
-    'DeepSeekConfigValidator'
+    'DeepSeekConfigValidator',
+    'DeepSeekStreamDecoder',
+    'StreamDelta',
+    'ResponseChain',
+    'ResponseStage',
+    'ThinkTagStage',
+    'RegexReplaceStage',
+    'WhitespaceStage',
+    'ClosingSymbolStage',
+    'parse_replacement_rules',
+    'assemble_response'
 ]
\ No newline at end of file
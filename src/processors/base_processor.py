@@ -1,5 +1,6 @@
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional
 from models.message_models import ChatRequest, ProcessedMessage
 
 
@@ -8,6 +9,22 @@ class ProcessingError(Exception):
     pass
 
 
+class ProcessorTiming(NamedTuple):
+    """How one processor handled one request"""
+    processor: str
+    ran: bool  # what can_process returned
+    seconds: float  # can_process and process together
+    input_chars: int
+    output_chars: int
+
+
+def request_chars(request: ChatRequest) -> int:
+    """Characters in a request's messages and in its formatted prompt, if it has one yet"""
+    size = sum(len(message.content) for message in request.messages)
+    processed = getattr(request, '_processed_content', None)
+    return size + len(processed) if isinstance(processed, str) else size
+
+
 class BaseProcessor(ABC):
     """Abstract base class for message processors"""
     
@@ -41,8 +58,10 @@ class BaseProcessor(ABC):
 class ProcessorPipeline:
     """Manages a pipeline of processors"""
     
-    def __init__(self, processors: Optional[List[BaseProcessor]] = None):
+    def __init__(self, processors: Optional[List[BaseProcessor]] = None, profiler=None):
         self.processors = processors or []
+        # Anything with start() and record(timings, seconds, capture), see pipeline.profiling
+        self.profiler = profiler
     
     def add_processor(self, processor: BaseProcessor) -> None:
         """Add a processor to the pipeline"""
@@ -54,6 +73,9 @@ class ProcessorPipeline:
     
     def process(self, request: ChatRequest) -> ChatRequest:
         """Process request through the entire pipeline"""
+        if self.profiler is not None:
+            return self._process_profiled(request, self.profiler)
+        
         current_request = request
         
         for processor in self.processors:
@@ -65,6 +87,33 @@ class ProcessorPipeline:
         
         return current_request
     
+    def _process_profiled(self, request: ChatRequest, profiler) -> ChatRequest:
+        """process() that times every processor and hands the timings to the profiler"""
+        timings: List[ProcessorTiming] = []
+        capture = profiler.start()
+        started = time.perf_counter()
+        current_request = request
+        
+        try:
+            for processor in self.processors:
+                name = processor.__class__.__name__
+                input_chars = request_chars(current_request)
+                processor_started = time.perf_counter()
+                ran = False
+                try:
+                    ran = bool(processor.can_process(current_request))
+                    if ran:
+                        current_request = processor.process(current_request)
+                except Exception as e:
+                    raise ProcessingError(f"Error in {name}: {e}") from e
+                finally:
+                    elapsed = time.perf_counter() - processor_started
+                    timings.append(ProcessorTiming(name, ran, elapsed, input_chars, request_chars(current_request)))
+        finally:
+            profiler.record(timings, time.perf_counter() - started, capture)
+        
+        return current_request
+    
     def get_active_processors(self, request: ChatRequest) -> List[BaseProcessor]:
         """Get list of processors that can handle this request"""
         return [p for p in self.processors if p.can_process(request)]
\ No newline at end of file
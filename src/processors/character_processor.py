@@ -1,7 +1,11 @@
-import re
-from typing import Dict, Any
+import string
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, Callable, List, Optional, Pattern, Tuple
+from core import patterns
 from processors.base_processor import BaseProcessor
-from models.message_models import ChatRequest, CharacterInfo, MessageRole
+from models.message_models import ChatRequest, CharacterInfo, Message, MessageRole
 
 
 class CharacterProcessor(BaseProcessor):
@@ -10,6 +14,11 @@ class CharacterProcessor(BaseProcessor):
     def __init__(self, config=None):
         super().__init__(config)
         self.config_manager = config.get('config_manager') if config else None
+        if self.config_manager is None and hasattr(config, 'get_hidden_var'):
+            # A config snapshot answers the same reads as the manager
+            self.config_manager = config
+        # Kept for the life of the processor so its segment cache carries over between requests
+        self.formatter = MessageFormatter(self.config_manager) if self.config_manager else None
     
     def can_process(self, request: ChatRequest) -> bool:
         """Always can process character data"""
@@ -21,11 +30,8 @@ class CharacterProcessor(BaseProcessor):
         # Clean up duplicate system messages first
         self._cleanup_duplicate_system_messages(request)
         
-        # Use the original approach: combine all messages, then process the combined string
-        combined_content = self._combine_messages(request)
-        
         # Extract character info - prioritize API parameters over message content
-        character_info = self._extract_character_info_from_combined(combined_content)
+        character_info = self._extract_character_info(request)
         
         # Extract user names from individual messages (STMP-style)
         self._extract_user_names_from_messages(request, character_info)
@@ -37,19 +43,16 @@ class CharacterProcessor(BaseProcessor):
             character_info.user_name = request.api_user_name
             character_info.add_user_name(request.api_user_name)
         
-        # Process the combined content (like original logic)
-        processed_content = self._process_combined_content(combined_content, character_info, request)
-        
         # Apply new formatting system if configured
-        if self.config_manager:
-            formatter = MessageFormatter(self.config_manager)
-            formatted_content = formatter.format_messages(request, character_info)
+        if self.formatter:
+            formatted_content = self.formatter.format_messages(request, character_info)
             # Apply template replacements from original logic
             formatted_content = self._apply_template_replacements(formatted_content, request)
             request._processed_content = formatted_content
         else:
-            # Fallback to original logic
-            request._processed_content = processed_content
+            # Fallback to original logic: combine all messages, then process the combined string
+            combined_content = self._combine_messages(request)
+            request._processed_content = self._process_combined_content(combined_content, character_info, request)
         
         return request
     
@@ -64,47 +67,66 @@ class CharacterProcessor(BaseProcessor):
     
     def _combine_messages(self, request: ChatRequest) -> str:
         """Combine messages like the original code did with STMP-style"""
-        formatted_messages = []
-        for msg in request.messages:
-            # Use the actual user name if available (STMP-style)
-            if msg.role == MessageRole.USER and msg.has_user_name():
-                role_display = msg.get_user_name()
-            else:
-                role_display = msg.get_display_role()
-            formatted_messages.append(f"{role_display}: {msg.content}")
-        return "\n\n".join(formatted_messages)
+        return "\n\n".join(f"{self._role_display(msg)}: {msg.content}" for msg in request.messages)
+    
+    def _role_display(self, message: Message) -> str:
+        """Role prefix of a message in the combined content"""
+        # Use the actual user name if available (STMP-style)
+        if message.role == MessageRole.USER and message.has_user_name():
+            return message.get_user_name()
+        return message.get_display_role()
     
-    def _extract_character_info_from_combined(self, content: str) -> CharacterInfo:
-        """Extract character info from combined content (original approach)"""
+    def _extract_character_info(self, request: ChatRequest) -> CharacterInfo:
+        """Extract character info from the messages as if they were combined (original approach)"""
         character_info = CharacterInfo()
         
-        character_match = re.search(r'DATA1:\s*"([^"]*)"', content)
-        user_match = re.search(r'DATA2:\s*"([^"]*)"', content)
+        character_name = self._search_combined(request, patterns.DATA1, "DATA1")
+        user_name = self._search_combined(request, patterns.DATA2, "DATA2")
         
-        if character_match:
-            character_info.character_name = character_match.group(1)
-        if user_match:
-            character_info.user_name = user_match.group(1)
-            character_info.add_user_name(user_match.group(1))
+        if character_name is not None:
+            character_info.character_name = character_name
+        if user_name is not None:
+            character_info.user_name = user_name
+            character_info.add_user_name(user_name)
             
         return character_info
     
+    def _search_combined(self, request: ChatRequest, pattern: Pattern, marker: str) -> Optional[str]:
+        """First DATA value in the combined messages, found without combining them
+        
+        A match can only start in a message containing the marker. If that
+        message holds a complete match, it is the first one; otherwise the
+        match may run on into the next message, so the combined content is
+        searched after all.
+        """
+        for message in request.messages:
+            if marker in self._role_display(message):
+                break
+            if marker in message.content:
+                match = pattern.search(message.content)
+                if match:
+                    return match.group(1)
+                break
+        else:
+            return None
+        
+        match = pattern.search(self._combine_messages(request))
+        return match.group(1) if match else None
+    
     def _extract_user_names_from_messages(self, request: ChatRequest, character_info: CharacterInfo) -> None:
         """Extract user names from individual messages (STMP-style)"""
-        for message in request.messages:
-            if message.role == MessageRole.USER and message.has_user_name():
-                character_info.add_user_name(message.get_user_name())
+        for name in request.scan_user_names():
+            character_info.add_user_name(name)
     
     def _process_combined_content(self, content: str, character_info: CharacterInfo, request: ChatRequest) -> str:
         """Process combined content using original logic"""
         
         # Remove DATA1 and DATA2 lines
-        content = re.sub(r'DATA1:\s*"[^"]*"', "", content)
-        content = re.sub(r'DATA2:\s*"[^"]*"', "", content)
+        content = patterns.DATA1.sub("", content)
+        content = patterns.DATA2.sub("", content)
         
         # Remove other markers
-        content = re.sub(r"({{r1}}|\[r1\]|\(r1\))", "", content, flags=re.IGNORECASE)
-        content = re.sub(r"({{search}}|\[search\])", "", content, flags=re.IGNORECASE)
+        content = patterns.DIRECTIVE_MARKER.sub("", content)
         
         # Replace role names only if we have explicit character info from DATA1/DATA2
         # This prevents corrupting existing character names in user content
@@ -116,13 +138,13 @@ class CharacterProcessor(BaseProcessor):
         if has_explicit_char_info:
             # Only replace role prefixes at the start of lines or after double newlines
             # to avoid corrupting existing character names in content
-            content = re.sub(r'(^|\n\n)system:\s*', r'\1', content)
-            content = re.sub(r'(^|\n\n)assistant:\s*', fr'\1{character_info.character_name}: ', content)
-            content = re.sub(r'(^|\n\n)user:\s*', fr'\1{character_info.user_name}: ', content)
+            content = patterns.SYSTEM_PREFIX.sub(r'\1', content)
+            content = patterns.ASSISTANT_PREFIX.sub(fr'\1{character_info.character_name}: ', content)
+            content = patterns.USER_PREFIX.sub(fr'\1{character_info.user_name}: ', content)
         else:
             # If no explicit character info, preserve custom roles and just remove system role prefix
             # but preserve user/assistant content as-is to avoid corrupting character names
-            content = re.sub(r'(^|\n\n)system:\s*', r'\1', content)
+            content = patterns.SYSTEM_PREFIX.sub(r'\1', content)
             
             # For custom roles, preserve the role name as-is when no explicit character info
             # This allows custom roles like "Narrator:" to remain unchanged
@@ -138,11 +160,140 @@ class CharacterProcessor(BaseProcessor):
         content = content.replace("{{max_tokens}}", str(request.max_tokens))
         
         # Clean up extra newlines
-        content = re.sub(r"\n{3,}", "\n\n", content)
+        content = patterns.EXTRA_NEWLINES.sub("\n\n", content)
         
         return content.strip()
 
 
+class CompiledTemplate:
+    """A formatting template parsed once, filled by placing the values into its slots"""
+    
+    FIELDS = {'role': 0, 'name': 1, 'content': 2}
+    
+    __slots__ = ('template', '_pieces', '_slots')
+    
+    def __init__(self, template: str):
+        self.template = template
+        self._pieces: Optional[List[str]] = []
+        slots = []
+        
+        try:
+            for literal, field, spec, conversion in string.Formatter().parse(template):
+                if literal:
+                    self._pieces.append(literal)
+                if field is None:
+                    continue
+                if field not in self.FIELDS or spec or conversion:
+                    # Anything beyond plain {role}/{name}/{content} is left to str.format
+                    self._pieces = None
+                    break
+                slots.append((len(self._pieces), self.FIELDS[field]))
+                self._pieces.append("")
+        except ValueError:
+            self._pieces = None
+        
+        self._slots = tuple(slots)
+    
+    def render(self, role: str, name: str, content: str) -> str:
+        """Fill the template, same result as template.format(role=..., name=..., content=...)"""
+        if self._pieces is not None:
+            values = (role, name, content)
+            pieces = self._pieces.copy()
+            for slot, index in self._slots:
+                pieces[slot] = values[index]
+            try:
+                return "".join(pieces)
+            except TypeError:
+                pass  # A value that is not a string, str.format converts it
+        return self.template.format(role=role, name=name, content=content)
+
+
+@lru_cache(maxsize=64)
+def compile_template(template: str) -> CompiledTemplate:
+    """Parse a template once, presets and custom templates are reused by every request"""
+    return CompiledTemplate(template)
+
+
+class SegmentCache:
+    """Thread-safe LRU of formatted messages
+
+    SillyTavern resends the whole chat history with one new turn each time.
+    Keys carry the formatting style, the role and name fields and the message
+    text itself, so a message formatted for an earlier request is reused
+    whenever the same text comes back, and only new or edited turns are
+    formatted again. A request scans its whole history, so the cache grows to
+    hold the longest history it has seen twice over; a smaller cache would
+    evict every message of a long chat before the next resend reaches it.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._capacity = max_entries
+        self._lock = threading.Lock()
+        self._segments: "OrderedDict[tuple, str]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            segment = self._segments.get(key)
+            if segment is None:
+                self._misses += 1
+                return None
+            self._segments.move_to_end(key)
+            self._hits += 1
+            return segment
+
+    def put(self, key: tuple, segment: str) -> None:
+        with self._lock:
+            self._segments[key] = segment
+            self._segments.move_to_end(key)
+            while len(self._segments) > self._capacity:
+                self._segments.popitem(last=False)
+
+    def get_many(self, keys: List[tuple]) -> List[Optional[str]]:
+        """Look up the messages of a whole history, None for the ones not cached
+
+        Also makes room for a history this long and the one resent before it.
+        """
+        with self._lock:
+            self._capacity = max(self._capacity, 2 * len(keys))
+            found = []
+            for key in keys:
+                segment = self._segments.get(key)
+                if segment is not None:
+                    self._segments.move_to_end(key)
+                found.append(segment)
+            misses = found.count(None)
+            self._misses += misses
+            self._hits += len(found) - misses
+            return found
+
+    def put_many(self, items: List[Tuple[tuple, str]]) -> None:
+        with self._lock:
+            for key, segment in items:
+                self._segments[key] = segment
+                self._segments.move_to_end(key)
+            while len(self._segments) > self._capacity:
+                self._segments.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._segments.clear()
+            self._capacity = self.max_entries
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get a summary of the cache for debugging"""
+        with self._lock:
+            return {
+                'entries': len(self._segments),
+                'max_entries': self.max_entries,
+                'capacity': self._capacity,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
 class MessageFormatter:
     """Utility class for formatting messages"""
     
@@ -180,8 +331,9 @@ class MessageFormatter:
         }
     }
     
-    def __init__(self, config_manager=None):
+    def __init__(self, config_manager=None, cache: Optional[SegmentCache] = None):
         self.config_manager = config_manager
+        self.cache = cache or SegmentCache()
     
     @staticmethod
     def format_for_api(request: ChatRequest) -> str:
@@ -213,7 +365,7 @@ class MessageFormatter:
             return self._format_preset(request, character_info, preset)
         else:
             # Fallback to Classic
-            return self._format_preset(request, character_info, 'Classic')
+            return self._format_preset(request, character_info, 'Classic (Name)')
     
     def _get_config_value(self, key: str, default: Any) -> Any:
         """Get configuration value with fallback"""
@@ -224,30 +376,15 @@ class MessageFormatter:
     def _format_preset(self, request: ChatRequest, character_info: CharacterInfo, preset: str) -> str:
         """Format using a predefined preset"""
         preset_config = self.PRESETS[preset]
+        pattern = compile_template(preset_config['pattern'])
         
-        formatted_messages = []
-        
-        for message in request.messages:
-            if not message.content.strip():
-                continue
-                
-            # Get both role and name for template substitution
-            literal_role = self._get_literal_role(message)
-            character_name = self._get_character_name(message, character_info)
-            
-            # Apply pattern (presets use {role} for literal roles)
-            formatted_message = preset_config['pattern'].format(
-                role=literal_role,
-                name=character_name,
-                content=message.content.strip()
-            )
-            
-            formatted_messages.append(formatted_message)
+        # Presets use {role} for literal roles
+        style = (pattern.template, character_info.character_name, character_info.user_name)
+        formatted_messages = self._format_segments(request, character_info, style, lambda message: pattern)
         
         # If we have prefix content, add it as a fake assistant message
         if request.has_prefix():
             # Create a fake assistant message for the prefix
-            from models.message_models import Message, MessageRole
             fake_assistant_msg = Message(role=MessageRole.ASSISTANT, content=request.prefix_content, original_role="assistant")
             
             # Get both role and name for template substitution
@@ -255,11 +392,7 @@ class MessageFormatter:
             character_name = character_info.character_name
             
             # Apply pattern (presets use {role} for literal roles)
-            formatted_prefix = preset_config['pattern'].format(
-                role=literal_role,
-                name=character_name,
-                content=request.prefix_content.strip()
-            )
+            formatted_prefix = pattern.render(literal_role, character_name, request.prefix_content.strip())
             
             formatted_messages.append(formatted_prefix)
         
@@ -274,45 +407,32 @@ class MessageFormatter:
         # Get custom templates from hidden variables
         user_template = self.config_manager.get_hidden_var('custom_user_template', '{name}: {content}')
         char_template = self.config_manager.get_hidden_var('custom_char_template', '{name}: {content}')
+        style = ('Custom', user_template, char_template, character_info.character_name, character_info.user_name)
         
-        formatted_messages = []
+        user_template = compile_template(user_template)
+        char_template = compile_template(char_template)
+        default_template = compile_template('{name}: {content}')
         
-        for message in request.messages:
-            if not message.content.strip():
-                continue
-                
+        def template_for(message: Message) -> 'CompiledTemplate':
             # Choose template based on role
             if message.is_custom_role():
                 # Custom roles use their original name as the template
-                template = '{name}: {content}'
+                return default_template
             elif message.role == MessageRole.USER:
-                template = user_template
+                return user_template
             elif message.role == MessageRole.ASSISTANT:
-                template = char_template
+                return char_template
             elif message.role == MessageRole.SYSTEM:
                 # System messages use character template
-                template = char_template
+                return char_template
             else:
                 # Fallback
-                template = '{name}: {content}'
-            
-            # Get both role and name for template substitution
-            literal_role = self._get_literal_role(message)
-            character_name = self._get_character_name(message, character_info)
-            
-            # Apply template (supports both {role} and {name})
-            formatted_message = template.format(
-                role=literal_role,
-                name=character_name,
-                content=message.content.strip()
-            )
-            
-            formatted_messages.append(formatted_message)
+                return default_template
+        formatted_messages = self._format_segments(request, character_info, style, template_for)
         
         # If we have prefix content, add it as a fake assistant message
         if request.has_prefix():
             # Create a fake assistant message for the prefix
-            from models.message_models import Message, MessageRole
             fake_assistant_msg = Message(role=MessageRole.ASSISTANT, content=request.prefix_content, original_role="assistant")
             
             # Use assistant template for the prefix
@@ -323,16 +443,42 @@ class MessageFormatter:
             character_name = character_info.character_name
             
             # Apply template (supports both {role} and {name})
-            formatted_prefix = template.format(
-                role=literal_role,
-                name=character_name,
-                content=request.prefix_content.strip()
-            )
+            formatted_prefix = template.render(literal_role, character_name, request.prefix_content.strip())
             
             formatted_messages.append(formatted_prefix)
         
         return '\n\n'.join(formatted_messages)
     
+    def _format_segments(
+        self,
+        request: ChatRequest,
+        character_info: CharacterInfo,
+        style: tuple,
+        template_for: Callable[[Message], 'CompiledTemplate']
+    ) -> List[str]:
+        """Format every non-empty message, reusing segments cached for an earlier request"""
+        messages = [message for message in request.messages if message.content and not message.content.isspace()]
+        
+        # Everything the segment depends on: style covers the template and fallback names
+        keys = [(style, message.role, message.original_role, message.name, message.content) for message in messages]
+        segments = self.cache.get_many(keys)
+        
+        formatted = []
+        for index, segment in enumerate(segments):
+            if segment is None:
+                message = messages[index]
+                # Apply template (supports both {role} and {name})
+                segments[index] = template_for(message).render(
+                    self._get_literal_role(message),
+                    self._get_character_name(message, character_info),
+                    message.content.strip()
+                )
+                formatted.append((keys[index], segments[index]))
+        if formatted:
+            self.cache.put_many(formatted)
+        
+        return segments
+    
     def _get_literal_role(self, message) -> str:
         """Get the literal role name (supports custom roles)"""
         if message.is_custom_role():
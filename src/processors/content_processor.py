@@ -1,12 +1,74 @@
 import re
-from typing import Optional
-from bs4 import BeautifulSoup
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+from bs4.builder import builder_registry
+
+# BeautifulSoup tree builders ContentProcessor can use, the default first.
+# lxml is faster and gives the same Markdown for well-formed HTML, but it
+# repairs broken markup differently, so it is only used when asked for
+PARSERS = ("html.parser", "lxml")
+DEFAULT_PARSER = "html.parser"
+# Elements serialized without an end tag
+_VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'
+])
+_TAG_PATTERN = re.compile(r'<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)(?:"[^"]*"|\'[^\']*\'|[^\'">])*?(/?)>', re.S)
+_STRONG_EM_PATTERN = re.compile(r'</?strong>|</?em>')
+_CLASS_SELECTOR = re.compile(r'^\.([\w-]+)$')
+_ATTRIBUTE_SELECTOR = re.compile(r'^\[([\w-]+)="([^"]*)"\]$')
+# _final_cleanup: spacing and formatting, then Markdown formatting issues
+_EXTRA_NEWLINES = re.compile(r'\n{3,}')
+_EXTRA_ASTERISKS = re.compile(r'\*{3,}')
+_EXTRA_BACKTICKS = re.compile(r'`{4,}')
+_DOUBLE_BACKTICKS = re.compile(r'(?<!`)`{2}(?!`)')
+_LEADING_EMPTY_LINES = re.compile(r'^[\s]*\n')
+_TRAILING_EMPTY_LINES = re.compile(r'\n[\s]*$')
+_SPACE_BEFORE_FENCE = re.compile(r'\n\s*\n\s*```')
+_SPACE_AFTER_FENCE = re.compile(r'```\s*\n\s*\n')
+_SPACE_BEFORE_HEADER = re.compile(r'\n\s*\n\s*#')
+_SPACE_BEFORE_LIST = re.compile(r'\n\s*\n\s*-')
+# A line that already ends on a closing quote or asterisk
+_CLOSED_LINE = re.compile(r'(?:"\.?$|\*\.?$)')
+# Whitespace between two letters or digits: _final_cleanup never changes it or
+# anything around it, so the text on either side can be cleaned up separately
+_CLEANUP_SPLIT = re.compile(r'[^\W_](\s+)(?=[^\W_])')
+
+# The steps of the conversion, in the order they apply. An element converted
+# by a step reads its content as the earlier steps left it, so one walk of the
+# tree gives the same text as running every step over the whole document.
+_ENTITIES, _CODE_BLOCK, _REMOVE, _HEADER = 1, 2, 3, 4  # headers are 4-9 (h1-h6)
+_LINK, _IMAGE, _QUOTE, _RULE, _BREAK, _LIST, _LIST_ITEM, _PARAGRAPH, _CODE, _BOLD, _ITALIC, _TABLE = range(10, 22)
+_DONE = 99
+
+_TAG_STEPS = {
+    'h1': _HEADER, 'h2': _HEADER + 1, 'h3': _HEADER + 2, 'h4': _HEADER + 3, 'h5': _HEADER + 4, 'h6': _HEADER + 5,
+    'a': _LINK, 'img': _IMAGE, 'blockquote': _QUOTE, 'hr': _RULE, 'br': _BREAK,
+    'ul': _LIST, 'ol': _LIST, 'li': _LIST_ITEM, 'code': _CODE,
+    'strong': _BOLD, 'b': _BOLD, 'em': _ITALIC, 'i': _ITALIC, 'table': _TABLE
+}
+_REMOVED_TAGS = frozenset(['script', 'style', 'meta', 'link'])
+_LIST_TAGS = ('ul', 'ol')
+
+
+def available_parsers() -> List[str]:
+    """Installed tree builders, the default first (html.parser always is)"""
+    return [name for name in PARSERS if builder_registry.lookup(name)]
+
+
+def resolve_parser(name: Optional[str] = None) -> str:
+    """The requested tree builder if installed, otherwise the default one"""
+    if name in available_parsers():
+        return name
+    if name and name in PARSERS:
+        print(f"[color:yellow]HTML parser '{name}' is not installed, using {DEFAULT_PARSER}")
+    return DEFAULT_PARSER
 
 
 class ContentProcessor:
     """Handles HTML to Markdown conversion and content processing"""
     
-    def __init__(self):
+    def __init__(self, parser: Optional[str] = None):
+        self.parser = resolve_parser(parser)
         self.ui_selectors = [
             '.md-code-block-banner',
             '.code-info-button-text', 
@@ -25,322 +87,54 @@ class ContentProcessor:
             return ""
         
         try:
-            # Clean up HTML structure first
-            cleaned_html = self._remove_em_inside_strong(html_content)
-            
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(cleaned_html, 'html.parser')
-            
-            # Process in order of importance
-            self._process_html_entities(soup)
-            self._convert_code_blocks(soup)
-            self._remove_ui_elements(soup)
-            self._convert_html_to_markdown(soup)
-            
-            # Get final text and clean up
-            result = soup.get_text()
-            return self._final_cleanup(result)
-            
+            return self._final_cleanup(self._html_to_text(html_content))
         except Exception as e:
             print(f"Error processing HTML to markdown: {e}")
             return html_content
     
-    def _remove_em_inside_strong(self, html: str) -> str:
-        """Remove <em> tags inside <strong> tags"""
+    def process_serialized_markdown(self, text: str) -> str:
+        """Clean up Markdown the in-page serializer produced from the message DOM"""
+        if not text:
+            return ""
+        
         try:
-            result = []
-            inside_strong = False
-            i = 0
-            
-            while i < len(html):
-                if html[i:i+8] == "<strong>":
-                    inside_strong = True
-                    result.append("<strong>")
-                    i += 8
-                elif html[i:i+9] == "</strong>":
-                    inside_strong = False
-                    result.append("</strong>")
-                    i += 9
-                elif html[i:i+4] == "<em>" and inside_strong:
-                    i += 4  # Skip <em>
-                elif html[i:i+5] == "</em>" and inside_strong:
-                    i += 5  # Skip </em>
-                else:
-                    result.append(html[i])
-                    i += 1
-            
-            return "".join(result)
-        except Exception:
-            return html
-    
-    def _process_html_entities(self, soup: BeautifulSoup) -> None:
-        """Process HTML entities in ds-markdown-html spans"""
-        for span in soup.find_all('span', class_='ds-markdown-html'):
-            content = span.get_text()
-            # Convert HTML entities to actual characters
-            content = content.replace('&lt;', '<')
-            content = content.replace('&gt;', '>')
-            content = content.replace('&amp;', '&')
-            content = content.replace('&nbsp;', ' ')
-            content = content.replace('&quot;', '"')
-            span.replace_with(content)
+            return self._final_cleanup(text)
+        except Exception as e:
+            print(f"Error processing serialized markdown: {e}")
+            return text
     
-    def _convert_code_blocks(self, soup: BeautifulSoup) -> None:
-        """Convert DeepSeek code blocks to Markdown"""
-        code_blocks = soup.find_all('div', class_='md-code-block')
-        
-        for code_block in code_blocks:
-            try:
-                # Extract language
-                language_elem = code_block.find('span', class_='d813de27')
-                language = language_elem.get_text().strip() if language_elem else ''
-                
-                # Extract code content
-                pre_tag = code_block.find('pre')
-                if pre_tag:
-                    code_content = pre_tag.get_text().strip()
-                    
-                    # Create Markdown code block
-                    if language and language.lower() not in ['text', '']:
-                        markdown_code = f"\n```{language}\n{code_content}\n```\n"
-                    else:
-                        markdown_code = f"\n```\n{code_content}\n```\n"
-                    
-                    code_block.replace_with(markdown_code)
-                    
-            except Exception as e:
-                # Fallback: just extract pre content
-                pre_tag = code_block.find('pre')
-                if pre_tag:
-                    code_block.replace_with(f"\n```\n{pre_tag.get_text()}\n```\n")
-    
-    def _remove_ui_elements(self, soup: BeautifulSoup) -> None:
-        """Remove unwanted UI elements"""
-        # Remove unwanted tags completely
-        for tag in soup(['script', 'style', 'meta', 'link']):
-            tag.decompose()
-        
-        # Remove UI selectors
-        for selector in self.ui_selectors:
-            for element in soup.select(selector):
-                element.decompose()
-    
-    def _convert_html_to_markdown(self, soup: BeautifulSoup) -> None:
-        """Convert remaining HTML elements to Markdown"""
-        # Convert headers
-        for i in range(1, 7):
-            for header in soup.find_all(f'h{i}'):
-                header_text = header.get_text()
-                markdown_header = f"\n{'#' * i} {header_text}\n"
-                header.replace_with(markdown_header)
-        
-        # Convert links
-        for link in soup.find_all('a', href=True):
-            link_text = link.get_text()
-            link_url = link.get('href')
-            if link_text and link_url:
-                link.replace_with(f"[{link_text}]({link_url})")
-        
-        # Convert images
-        for img in soup.find_all('img', src=True):
-            alt_text = img.get('alt', '')
-            img_url = img.get('src')
-            img.replace_with(f"![{alt_text}]({img_url})")
-        
-        # Convert blockquotes
-        for quote in soup.find_all('blockquote'):
-            quote_text = quote.get_text().strip()
-            quote_lines = quote_text.split('\n')
-            markdown_quote = '\n'.join(f"> {line}" for line in quote_lines)
-            quote.replace_with(f"\n{markdown_quote}\n")
-        
-        # Convert horizontal rules
-        for hr in soup.find_all('hr'):
-            hr.replace_with("\n---\n")
-        
-        # Handle line breaks
-        for br in soup.find_all('br'):
-            br.replace_with('\n')
-        
-        # Convert lists
-        self._convert_lists(soup)
-        
-        # Handle paragraphs
-        for p in soup.find_all('p'):
-            p.insert_after('\n\n')
-        
-        # Convert formatting
-        self._convert_formatting(soup)
-        
-        # Convert tables
-        self._convert_tables(soup)
-        
-        # Clean up remaining elements
-        for span in soup.find_all('span'):
-            if 'ds-markdown-html' not in span.get('class', []):
-                span.unwrap()
-        
-        for div in soup.find_all('div'):
-            div.unwrap()
-    
-    def _convert_lists(self, soup: BeautifulSoup) -> None:
-        """Convert HTML lists to Markdown with proper nesting support"""
-        # Find all top-level lists (not nested inside other lists)
-        top_level_lists = []
-        for list_elem in soup.find_all(['ul', 'ol']):
-            # Check if this list is nested inside another list
-            is_nested = False
-            parent = list_elem.parent
-            while parent:
-                if parent.name in ['ul', 'ol']:
-                    is_nested = True
-                    break
-                parent = parent.parent
-            
-            if not is_nested:
-                top_level_lists.append(list_elem)
+    def _html_to_text(self, html_content: str) -> str:
+        """Convert HTML to Markdown text before the final cleanup"""
+        # Clean up HTML structure first
+        cleaned_html = self._remove_em_inside_strong(html_content)
         
-        # Process each top-level list recursively
-        for list_elem in top_level_lists:
-            self._convert_list_recursive(list_elem, 0)
+        # Parse with BeautifulSoup. lxml parses a whole document and would wrap
+        # bare text in <p>; the extra div keeps it a fragment and is unwrapped later
+        if self.parser == 'lxml':
+            cleaned_html = f"<div>{cleaned_html}</div>"
+        soup = BeautifulSoup(cleaned_html, self.parser)
         
-        # Clean up any remaining orphaned list items
-        for li in soup.find_all('li'):
-            li.replace_with(f"- {li.get_text().strip()}")
+        return _MarkdownWriter(soup, self.ui_selectors).write()
     
-    def _convert_list_recursive(self, list_element, indent_level):
-        """Recursively convert a list and all its nested lists"""
-        indent = "  " * indent_level  # 2 spaces per level
-        markdown_lines = []
-        
-        # Get only direct children <li> elements
-        list_items = []
-        for child in list_element.children:
-            if hasattr(child, 'name') and child.name == 'li':
-                list_items.append(child)
-        
-        for i, li in enumerate(list_items):
-            # Extract text from direct children only (no nested lists)
-            li_text = self._extract_li_text_only(li)
-            
-            # Create the list item
-            if list_element.name == 'ol':
-                marker = f"{i + 1}."
-            else:
-                marker = "-"
-            
-            if li_text:
-                markdown_lines.append(f"{indent}{marker} {li_text}")
-            
-            # Process any nested lists within this <li>
-            nested_lists = []
-            for child in li.children:
-                if hasattr(child, 'name') and child.name in ['ul', 'ol']:
-                    nested_lists.append(child)
-            
-            for nested_list in nested_lists:
-                nested_markdown = self._convert_list_recursive(nested_list, indent_level + 1)
-                if nested_markdown:
-                    # Add nested content directly to markdown_lines
-                    nested_lines = nested_markdown.split('\n')
-                    for line in nested_lines:
-                        if line.strip():
-                            markdown_lines.append(line)
-        
-        # Convert list to markdown and return the result
-        result = '\n'.join(markdown_lines)
-        
-        # Replace the original list element only if we're at the top level
-        if indent_level == 0:
-            if result:
-                list_element.replace_with('\n' + result + '\n\n')
-            else:
-                list_element.extract()
-        
-        return result
-    
-    def _extract_li_text_only(self, li_element):
-        """Extract text from li element, excluding any nested lists"""
-        text_parts = []
+    def _remove_em_inside_strong(self, html: str) -> str:
+        """Remove <em> tags inside <strong> tags"""
+        inside_strong = False
         
-        for child in li_element.children:
-            if hasattr(child, 'name'):
-                if child.name in ['ul', 'ol']:
-                    # Skip nested lists completely
-                    continue
-                elif child.name == 'p':
-                    # Get text from paragraph
-                    p_text = child.get_text().strip()
-                    if p_text:
-                        text_parts.append(p_text)
-                elif child.name in ['span', 'em', 'strong', 'b', 'i', 'code']:
-                    # Get text from inline elements
-                    inline_text = child.get_text().strip()
-                    if inline_text:
-                        text_parts.append(inline_text)
-                else:
-                    # Other elements - try to get text but exclude lists
-                    if child.name not in ['ul', 'ol']:
-                        other_text = child.get_text().strip()
-                        if other_text:
-                            text_parts.append(other_text)
-            else:
-                # Text node
-                text = str(child).strip()
-                if text:
-                    text_parts.append(text)
+        def replace(match) -> str:
+            nonlocal inside_strong
+            tag = match.group(0)
+            if tag == "<strong>":
+                inside_strong = True
+            elif tag == "</strong>":
+                inside_strong = False
+            elif inside_strong:
+                return ""  # Skip <em> and </em>
+            return tag
         
-        return ' '.join(text_parts).strip()
-    
-    def _convert_formatting(self, soup: BeautifulSoup) -> None:
-        """Convert formatting tags to Markdown"""
-        # Handle inline code first
-        for code in soup.find_all('code'):
-            parent_code_block = code.find_parent('div', class_='md-code-block')
-            if not parent_code_block:
-                text_content = code.get_text()
-                if text_content.strip():
-                    if '\n' in text_content and len(text_content.strip().split('\n')) > 1:
-                        code.replace_with(f"\n```\n{text_content.strip()}\n```\n")
-                    else:
-                        code.replace_with(f"`{text_content}`")
-        
-        # Convert bold
-        for strong in soup.find_all(['strong', 'b']):
-            text_content = strong.get_text()
-            if text_content.strip():
-                strong.replace_with(f"**{text_content}**")
-        
-        # Convert italic
-        for em in soup.find_all(['em', 'i']):
-            text_content = em.get_text()
-            if text_content.strip():
-                em.replace_with(f"*{text_content}*")
-    
-    def _convert_tables(self, soup: BeautifulSoup) -> None:
-        """Convert tables to Markdown format"""
-        for table in soup.find_all('table'):
-            try:
-                rows = table.find_all('tr')
-                if rows:
-                    markdown_table = []
-                    
-                    # Header row
-                    header_row = rows[0]
-                    headers = [th.get_text().strip() for th in header_row.find_all(['th', 'td'])]
-                    if headers:
-                        markdown_table.append('| ' + ' | '.join(headers) + ' |')
-                        markdown_table.append('| ' + ' | '.join(['---'] * len(headers)) + ' |')
-                    
-                    # Data rows
-                    for row in rows[1:]:
-                        cells = [td.get_text().strip() for td in row.find_all(['td', 'th'])]
-                        if cells:
-                            markdown_table.append('| ' + ' | '.join(cells) + ' |')
-                    
-                    table.replace_with('\n' + '\n'.join(markdown_table) + '\n')
-            except Exception:
-                table.unwrap()
+        try:
+            return _STRONG_EM_PATTERN.sub(replace, html)
+        except Exception:
+            return html
     
     def _final_cleanup(self, text: str) -> str:
         """Final cleanup of the converted text"""
@@ -352,18 +146,18 @@ class ContentProcessor:
         text = text.replace('&quot;', '"')
         
         # Clean up spacing and formatting
-        text = re.sub(r'\n{3,}', '\n\n', text)      # Limit consecutive newlines
-        text = re.sub(r'\*{3,}', '**', text)         # Fix multiple asterisks
-        text = re.sub(r'`{4,}', '```', text)         # Fix 4+ backticks to triple
-        text = re.sub(r'(?<!`)`{2}(?!`)', '`', text) # Fix double backticks to single
-        text = re.sub(r'^[\s]*\n', '', text)         # Remove leading empty lines
-        text = re.sub(r'\n[\s]*$', '', text)         # Remove trailing empty lines
+        text = _EXTRA_NEWLINES.sub('\n\n', text)       # Limit consecutive newlines
+        text = _EXTRA_ASTERISKS.sub('**', text)         # Fix multiple asterisks
+        text = _EXTRA_BACKTICKS.sub('```', text)        # Fix 4+ backticks to triple
+        text = _DOUBLE_BACKTICKS.sub('`', text)         # Fix double backticks to single
+        text = _LEADING_EMPTY_LINES.sub('', text)       # Remove leading empty lines
+        text = _TRAILING_EMPTY_LINES.sub('', text)      # Remove trailing empty lines
         
         # Clean up Markdown formatting issues
-        text = re.sub(r'\n\s*\n\s*```', '\n\n```', text)  # Fix code block spacing
-        text = re.sub(r'```\s*\n\s*\n', '```\n', text)    # Fix code block spacing
-        text = re.sub(r'\n\s*\n\s*#', '\n\n#', text)      # Fix header spacing
-        text = re.sub(r'\n\s*\n\s*-', '\n\n-', text)      # Fix list spacing
+        text = _SPACE_BEFORE_FENCE.sub('\n\n```', text)  # Fix code block spacing
+        text = _SPACE_AFTER_FENCE.sub('```\n', text)      # Fix code block spacing
+        text = _SPACE_BEFORE_HEADER.sub('\n\n#', text)   # Fix header spacing
+        text = _SPACE_BEFORE_LIST.sub('\n\n-', text)     # Fix list spacing
         
         return text.strip()
     
@@ -376,7 +170,7 @@ class ContentProcessor:
             text = text.strip()
             analysis_text = text.split("\n")[-1].strip()
             
-            if re.search(r'(?:"\.?$|\*\.?$)', analysis_text):
+            if _CLOSED_LINE.search(analysis_text):
                 return ""
             
             current_symbol = None
@@ -397,4 +191,409 @@ class ContentProcessor:
             return current_symbol if current_symbol else ""
             
         except Exception:
-            return ""
\ No newline at end of file
+            return ""
+
+
+class _MarkdownWriter:
+    """Serializes a parsed message to Markdown text in a single walk of the tree
+    
+    Text is collected into one list instead of rewriting the tree, and UI
+    elements are skipped as they are met rather than searched for first.
+    """
+    
+    def __init__(self, soup: BeautifulSoup, ui_selectors: List[str]):
+        self._soup = soup
+        self._ui_classes = set()
+        self._ui_attributes = []
+        self._ui_elements = set()
+        self._converted: Dict[Tuple[int, int], Optional[str]] = {}
+        
+        for selector in ui_selectors:
+            match = _CLASS_SELECTOR.match(selector)
+            if match:
+                self._ui_classes.add(match.group(1))
+                continue
+            match = _ATTRIBUTE_SELECTOR.match(selector)
+            if match:
+                self._ui_attributes.append(match.groups())
+                continue
+            # Anything fancier goes through soupsieve once, up front
+            self._ui_elements.update(id(element) for element in soup.select(selector))
+    
+    def write(self) -> str:
+        out: List[str] = []
+        self._children(self._soup, _DONE, out, False, False)
+        return "".join(out)
+    
+    # Walking
+    def _node(self, node, step: int, out: List[str], in_list: bool, in_code_block: bool) -> None:
+        """Append the text of node as it reads once every step before step has run"""
+        node_type = type(node)
+        if node_type is NavigableString or node_type is CData:
+            out.append(node)
+            return
+        if not isinstance(node, Tag):
+            return  # Comments, doctypes, script contents...
+        
+        for node_step in self._steps(node, in_list, in_code_block):
+            if node_step >= step:
+                break
+            converted = self._convert(node, node_step, in_list, in_code_block)
+            if converted is not None:
+                out.append(converted)
+                return
+        
+        self._children(node, step, out, in_list, in_code_block)
+        if node.name == 'p' and step > _PARAGRAPH:
+            out.append('\n\n')
+    
+    def _children(self, tag: Tag, step: int, out: List[str], in_list: bool, in_code_block: bool) -> None:
+        in_list, in_code_block = self._context(tag, in_list, in_code_block)
+        for child in tag.contents:
+            self._node(child, step, out, in_list, in_code_block)
+    
+    def _text(self, node, step: int, in_list: bool, in_code_block: bool) -> str:
+        out: List[str] = []
+        self._node(node, step, out, in_list, in_code_block)
+        return "".join(out)
+    
+    def _inner_text(self, tag: Tag, step: int, in_list: bool, in_code_block: bool) -> str:
+        out: List[str] = []
+        self._children(tag, step, out, in_list, in_code_block)
+        return "".join(out)
+    
+    @staticmethod
+    def _context(tag: Tag, in_list: bool, in_code_block: bool) -> Tuple[bool, bool]:
+        """Whether the children of tag sit inside a list / a DeepSeek code block"""
+        name = tag.name
+        if name in _LIST_TAGS:
+            return True, in_code_block
+        if name == 'div' and not in_code_block and 'md-code-block' in (tag.get('class') or ()):
+            return in_list, True
+        return in_list, in_code_block
+    
+    def _find(self, tag: Tag, step: int, in_list: bool, in_code_block: bool,
+              match: Callable[[Tag], bool]) -> Iterator[Tuple[Tag, bool, bool]]:
+        """Descendants of tag (with their context) that match and are still there at step"""
+        in_list, in_code_block = self._context(tag, in_list, in_code_block)
+        for child in tag.contents:
+            if not isinstance(child, Tag) or self._is_converted(child, step, in_list, in_code_block):
+                continue
+            if match(child):
+                yield child, in_list, in_code_block
+            yield from self._find(child, step, in_list, in_code_block, match)
+    
+    def _first(self, tag: Tag, step: int, in_list: bool, in_code_block: bool, match: Callable[[Tag], bool]):
+        return next(self._find(tag, step, in_list, in_code_block, match), None)
+    
+    # Steps
+    def _steps(self, tag: Tag, in_list: bool, in_code_block: bool) -> List[int]:
+        """The steps that may convert or remove tag, in order"""
+        name = tag.name
+        classes = tag.get('class') or ()
+        steps = []
+        if name == 'span' and 'ds-markdown-html' in classes:
+            steps.append(_ENTITIES)
+        elif name == 'div' and 'md-code-block' in classes:
+            steps.append(_CODE_BLOCK)
+        
+        if name in _REMOVED_TAGS or self._is_ui(tag, classes):
+            steps.append(_REMOVE)
+        
+        step = _TAG_STEPS.get(name)
+        if step and not (in_list and step in (_LIST, _LIST_ITEM)) and not (in_code_block and step == _CODE):
+            steps.append(step)
+        return steps
+    
+    def _is_ui(self, tag: Tag, classes) -> bool:
+        if self._ui_classes and not self._ui_classes.isdisjoint(classes):
+            return True
+        for attribute, value in self._ui_attributes:
+            actual = tag.get(attribute)
+            if isinstance(actual, list):
+                actual = ' '.join(actual)
+            if actual == value:
+                return True
+        return bool(self._ui_elements) and id(tag) in self._ui_elements
+    
+    def _is_converted(self, tag: Tag, step: int, in_list: bool, in_code_block: bool) -> bool:
+        """Whether an earlier step than step replaced or removed tag"""
+        for tag_step in self._steps(tag, in_list, in_code_block):
+            if tag_step >= step:
+                return False
+            if self._convert(tag, tag_step, in_list, in_code_block) is not None:
+                return True
+        return False
+    
+    def _convert(self, tag: Tag, step: int, in_list: bool, in_code_block: bool) -> Optional[str]:
+        """The text that replaces tag at step, or None when the step leaves it alone"""
+        key = (id(tag), step)
+        if key not in self._converted:
+            self._converted[key] = self._render(tag, step, in_list, in_code_block)
+        return self._converted[key]
+    
+    def _render(self, tag: Tag, step: int, in_list: bool, in_code_block: bool) -> Optional[str]:
+        if step == _REMOVE:
+            return ""
+        
+        if step == _ENTITIES:
+            content = self._inner_text(tag, step, in_list, in_code_block)
+            content = content.replace('&lt;', '<')
+            content = content.replace('&gt;', '>')
+            content = content.replace('&amp;', '&')
+            content = content.replace('&nbsp;', ' ')
+            content = content.replace('&quot;', '"')
+            return content
+        
+        if step == _CODE_BLOCK:
+            return self._code_block(tag, in_list, in_code_block)
+        
+        if step < _LINK:
+            level = step - _HEADER + 1
+            return f"\n{'#' * level} {self._inner_text(tag, step, in_list, in_code_block)}\n"
+        
+        if step == _LINK:
+            link_url = tag.get('href')
+            if link_url is None:
+                return None
+            link_text = self._inner_text(tag, step, in_list, in_code_block)
+            return f"[{link_text}]({link_url})" if link_text and link_url else None
+        
+        if step == _IMAGE:
+            img_url = tag.get('src')
+            return None if img_url is None else f"![{tag.get('alt', '')}]({img_url})"
+        
+        if step == _QUOTE:
+            quote_text = self._inner_text(tag, step, in_list, in_code_block).strip()
+            markdown_quote = '\n'.join(f"> {line}" for line in quote_text.split('\n'))
+            return f"\n{markdown_quote}\n"
+        
+        if step == _RULE:
+            return "\n---\n"
+        
+        if step == _BREAK:
+            return "\n"
+        
+        if step == _LIST:
+            result = self._list(tag, 0, in_code_block)
+            return '\n' + result + '\n\n' if result else ""
+        
+        if step == _LIST_ITEM:
+            return f"- {self._inner_text(tag, step, in_list, in_code_block).strip()}"
+        
+        if step == _TABLE:
+            return self._table(tag, in_list, in_code_block)
+        
+        text_content = self._inner_text(tag, step, in_list, in_code_block)
+        if not text_content.strip():
+            return None
+        
+        if step == _CODE:
+            if '\n' in text_content and len(text_content.strip().split('\n')) > 1:
+                return f"\n```\n{text_content.strip()}\n```\n"
+            return f"`{text_content}`"
+        
+        if step == _BOLD:
+            return f"**{text_content}**"
+        
+        return f"*{text_content}*"
+    
+    def _code_block(self, code_block: Tag, in_list: bool, in_code_block: bool) -> Optional[str]:
+        """Convert a DeepSeek code block (one with a <pre>) to a fenced block"""
+        pre_tag = self._first(code_block, _CODE_BLOCK, in_list, in_code_block, lambda t: t.name == 'pre')
+        if pre_tag is None:
+            return None
+        
+        language_elem = self._first(
+            code_block, _CODE_BLOCK, in_list, in_code_block,
+            lambda t: t.name == 'span' and 'd813de27' in (t.get('class') or ())
+        )
+        language = self._inner_text(language_elem[0], _CODE_BLOCK, language_elem[1], language_elem[2]).strip() if language_elem else ''
+        code_content = self._inner_text(pre_tag[0], _CODE_BLOCK, pre_tag[1], pre_tag[2]).strip()
+        
+        if language and language.lower() not in ['text', '']:
+            return f"\n```{language}\n{code_content}\n```\n"
+        return f"\n```\n{code_content}\n```\n"
+    
+    def _list(self, list_element: Tag, indent_level: int, in_code_block: bool) -> str:
+        """Convert a list and all its nested lists"""
+        indent = "  " * indent_level  # 2 spaces per level
+        markdown_lines = []
+        
+        list_items = [
+            child for child in list_element.contents
+            if isinstance(child, Tag) and child.name == 'li' and not self._is_converted(child, _LIST, True, in_code_block)
+        ]
+        
+        for i, li in enumerate(list_items):
+            # Text of the direct children, nested lists aside
+            text_parts = []
+            nested_lists = []
+            for child in li.contents:
+                if (isinstance(child, Tag) and child.name in _LIST_TAGS
+                        and not self._is_converted(child, _LIST, True, in_code_block)):
+                    nested_lists.append(child)
+                    continue
+                text = self._text(child, _LIST, True, in_code_block).strip()
+                if text:
+                    text_parts.append(text)
+            
+            li_text = ' '.join(text_parts).strip()
+            if li_text:
+                marker = f"{i + 1}." if list_element.name == 'ol' else "-"
+                markdown_lines.append(f"{indent}{marker} {li_text}")
+            
+            for nested_list in nested_lists:
+                nested_markdown = self._list(nested_list, indent_level + 1, in_code_block)
+                markdown_lines.extend(line for line in nested_markdown.split('\n') if line.strip())
+        
+        return '\n'.join(markdown_lines)
+    
+    def _table(self, table: Tag, in_list: bool, in_code_block: bool) -> Optional[str]:
+        """Convert a table to Markdown format"""
+        rows = list(self._find(table, _TABLE, in_list, in_code_block, lambda t: t.name == 'tr'))
+        if not rows:
+            return None
+        
+        def cells(row) -> List[str]:
+            found = self._find(row[0], _TABLE, row[1], row[2], lambda t: t.name in ('th', 'td'))
+            return [self._inner_text(cell, _TABLE, cell_list, cell_code).strip() for cell, cell_list, cell_code in found]
+        
+        markdown_table = []
+        headers = cells(rows[0])
+        if headers:
+            markdown_table.append('| ' + ' | '.join(headers) + ' |')
+            markdown_table.append('| ' + ' | '.join(['---'] * len(headers)) + ' |')
+        
+        for row in rows[1:]:
+            row_cells = cells(row)
+            if row_cells:
+                markdown_table.append('| ' + ' | '.join(row_cells) + ' |')
+        
+        return '\n' + '\n'.join(markdown_table) + '\n'
+
+
+def split_top_level_blocks(html: str) -> List[str]:
+    """Split serialized HTML (such as innerHTML) into its top-level nodes without parsing it"""
+    blocks = []
+    depth = 0
+    start = 0
+    
+    for match in _TAG_PATTERN.finditer(html):
+        if match.group(0).startswith('<!--'):
+            continue
+        
+        closing, name, self_closing = match.groups()
+        if depth == 0 and match.start() > start:
+            # Text between top-level elements
+            blocks.append(html[start:match.start()])
+            start = match.start()
+        
+        if closing:
+            depth = max(0, depth - 1)
+        elif name.lower() not in _VOID_TAGS and not self_closing:
+            depth += 1
+            continue
+        
+        if depth == 0:
+            blocks.append(html[start:match.end()])
+            start = match.end()
+    
+    if start < len(html):
+        blocks.append(html[start:])
+    return blocks
+
+
+class IncrementalMarkdownConverter:
+    """Converts a growing message to Markdown one top-level block at a time
+    
+    The text of every block is kept between calls, so only blocks that
+    changed since the last call (normally just the trailing one) are parsed
+    again. The cleaned up text of the finished blocks is kept as well, and
+    intermediate calls only clean up what follows it. While streaming, an
+    unfinished trailing code block is left without its closing fence so the
+    converted text only ever grows.
+    """
+    
+    CLOSING_FENCE = "\n```\n"
+    
+    def __init__(self, processor: ContentProcessor):
+        self._processor = processor
+        self._blocks: List[Tuple[str, str]] = []
+        # Raw text of the finished blocks up to a split point, and the same text cleaned up
+        self._clean_raw = ""
+        self._clean_text = ""
+    
+    def convert(self, blocks: List[str], final: bool = False) -> str:
+        """Convert the message given as its top-level blocks"""
+        texts = []
+        for index, html in enumerate(blocks):
+            if index < len(self._blocks) and self._blocks[index][0] == html:
+                texts.append(self._blocks[index][1])
+                continue
+            
+            try:
+                text = self._processor._html_to_text(html)
+            except Exception as e:
+                print(f"Error processing HTML to markdown: {e}")
+                text = html
+            
+            if index < len(self._blocks):
+                self._blocks[index] = (html, text)
+            else:
+                self._blocks.append((html, text))
+            texts.append(text)
+        del self._blocks[len(blocks):]
+        
+        return self._join(texts, bool(blocks) and 'md-code-block' in blocks[-1], final)
+    
+    def join_markdown(self, texts: List[str], code_block: bool = False, final: bool = False) -> str:
+        """Join blocks the browser already serialized; code_block when the last one holds a code block"""
+        return self._join(list(texts), code_block, final)
+    
+    def _join(self, texts: List[str], code_block: bool, final: bool) -> str:
+        if texts and not final and code_block and texts[-1].endswith(self.CLOSING_FENCE):
+            texts[-1] = texts[-1][:-len(self.CLOSING_FENCE)]
+        
+        text = "".join(texts)
+        if final or not texts:
+            return self._processor._final_cleanup(text)
+        return self._cleanup_tail(text, len(text) - len(texts[-1]))
+    
+    def _cleanup_tail(self, text: str, frozen_end: int) -> str:
+        """_final_cleanup(text), cleaning up only what follows the kept prefix"""
+        cleanup = self._processor._final_cleanup
+        start, cleaned, split = 0, "", None
+        
+        raw = self._clean_raw
+        if raw and text.startswith(raw):
+            if not text[len(raw):].strip():
+                # Trailing whitespace is dropped by the cleanup
+                return self._clean_text
+            split = _CLEANUP_SPLIT.match(text, len(raw) - 1)
+            if split and "\n\n\n" not in split.group(1):
+                start, cleaned = len(raw), self._clean_text
+            else:
+                split = None
+        
+        # Move the prefix up to the last split point inside the finished blocks
+        last = None
+        for match in _CLEANUP_SPLIT.finditer(text, start, frozen_end):
+            if "\n\n\n" not in match.group(1):
+                last = match
+        if last:
+            end = last.start() + 1
+            if split:
+                cleaned += split.group(1) + cleanup(text[split.end():end])
+            else:
+                cleaned = cleanup(text[:end])
+            start, split = end, last
+            self._clean_raw, self._clean_text = text[:end], cleaned
+        
+        if not split:
+            return cleanup(text)
+        return cleaned + split.group(1) + cleanup(text[split.end():])
+    
+    def convert_html(self, html: str, final: bool = False) -> str:
+        """Convert the message given as serialized HTML"""
+        return self.convert(split_top_level_blocks(html), final) if html else ""
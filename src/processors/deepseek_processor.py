@@ -1,6 +1,6 @@
 from typing import Dict, Any
 from processors.base_processor import BaseProcessor
-from models.message_models import ChatRequest, DeepSeekSettings
+from models.message_models import ChatRequest, DeepSeekSettings, DirectiveScan
 
 
 class DeepSeekProcessor(BaseProcessor):
@@ -15,16 +15,15 @@ class DeepSeekProcessor(BaseProcessor):
         
         # Priority: API parameters > message content detection > config settings
         
+        # Directives are detected (and stripped) once per request
+        directives = request.scan_directives()
+        detected_settings = directives.settings
+        
         # Check for API parameters first (highest priority)
         if request.api_use_r1 is not None:
             request.use_deepthink = request.api_use_r1
-        elif request.api_use_search is not None:
-            # If no r1 parameter but search is provided, use detected settings for deepthink
-            detected_settings = DeepSeekSettings.detect_from_messages(request.messages)
-            request.use_deepthink = detected_settings.deepthink
         else:
             # Auto-detect settings from messages
-            detected_settings = DeepSeekSettings.detect_from_messages(request.messages)
             request.use_deepthink = detected_settings.deepthink
         
         # Handle search parameter
@@ -32,7 +31,6 @@ class DeepSeekProcessor(BaseProcessor):
             request.use_search = request.api_use_search
         else:
             # Auto-detect from messages or use config
-            detected_settings = DeepSeekSettings.detect_from_messages(request.messages)
             request.use_search = detected_settings.search
         
         # Override with config settings if no API parameters or detection
@@ -48,7 +46,7 @@ class DeepSeekProcessor(BaseProcessor):
         request.use_text_file = config_settings.text_file
         
         # Clean directives from message content
-        self._clean_directives_from_messages(request.messages)
+        self._clean_directives_from_messages(request.messages, directives)
         
         return request
     
@@ -62,11 +60,11 @@ class DeepSeekProcessor(BaseProcessor):
             text_file=deepseek_config.get("text_file", False)
         )
     
-    def _clean_directives_from_messages(self, messages) -> None:
+    def _clean_directives_from_messages(self, messages, directives: DirectiveScan) -> None:
         """Remove DeepSeek directives from all user messages"""
         for message in messages:
             if message.role.value == "user":
-                message.content = DeepSeekSettings.clean_directives_from_content(message.content)
+                message.content = directives.clean_content(message)
 
 
 class DeepSeekConfigValidator:
@@ -0,0 +1,254 @@
+"""
+Streaming post-processing for response text
+
+A response goes through a chain of stages that each take text in pieces and
+give text back in pieces, keeping only a small amount of state between calls
+(an open <think> block, an unfinished line, a run of whitespace). Every stage
+produces the same output however the text is split up, so a streamed response
+and the same response returned in one piece always end up identical.
+"""
+
+import re
+from typing import Iterable, List, Optional, Pattern, Sequence, Tuple
+
+from .stream_decoder import DeepSeekStreamDecoder, StreamDelta
+
+
+ReplacementRule = Tuple[Pattern, str]
+
+_RULE_LINE = re.compile(r'(.*?)\s*=>\s?(.*)$')
+_BLANK_LINES = re.compile(r'\s*\n\s*')
+_SYMBOLS = re.compile(r'[^"*]')
+
+
+def parse_replacement_rules(text: str) -> Tuple[List[ReplacementRule], List[str]]:
+    """Parse 'pattern => replacement' lines into compiled rules and a list of errors"""
+    rules: List[ReplacementRule] = []
+    errors: List[str] = []
+    for number, line in enumerate((text or "").splitlines(), 1):
+        if not line.strip():
+            continue
+        match = _RULE_LINE.match(line)
+        if not match or not match.group(1):
+            errors.append(f"line {number}: expected 'pattern => replacement'")
+            continue
+        try:
+            pattern = re.compile(match.group(1))
+            # Bad group references in the replacement only show up when it is used
+            pattern.sub(match.group(2), "")
+        except re.error as e:
+            errors.append(f"line {number}: {e}")
+            continue
+        rules.append((pattern, match.group(2)))
+    return rules, errors
+
+
+class ResponseStage:
+    """A step of the chain: takes text in pieces and returns the text it is ready to emit"""
+
+    def feed(self, text: str) -> str:
+        return text
+
+    def finish(self) -> str:
+        """Return whatever is still held back at the end of the response"""
+        return ""
+
+
+class ThinkTagStage:
+    """Turns decoder deltas into text, wrapping thinking in <think> tags
+
+    Thinking is trimmed, and a block that turns out empty is left out
+    entirely, so the tags are only opened at the first visible character.
+    """
+
+    def __init__(self, send_thoughts: bool = True):
+        self.send_thoughts = send_thoughts
+        self._opened = False
+        self._pending = ""
+
+    def feed_delta(self, delta: StreamDelta) -> str:
+        kind, text = delta
+        if kind == DeepSeekStreamDecoder.CONTENT:
+            return text
+        if not self.send_thoughts:
+            return ""
+        if kind == DeepSeekStreamDecoder.THINKING:
+            return self._thinking(text)
+        if kind == DeepSeekStreamDecoder.THINKING_START:
+            self._reset()
+            return ""
+        return self.finish()
+
+    def finish(self) -> str:
+        """Close the thinking block if one is open"""
+        closing = "\n</think>\n\n" if self._opened else ""
+        self._reset()
+        return closing
+
+    def _thinking(self, text: str) -> str:
+        if not self._opened:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._opened = True
+            prefix = "<think>\n"
+        else:
+            prefix = self._pending
+
+        body = text.rstrip()
+        if not body:
+            self._pending = prefix + text
+            return ""
+        self._pending = text[len(body):]
+        return prefix + body
+
+    def _reset(self) -> None:
+        self._opened = False
+        self._pending = ""
+
+
+class RegexReplaceStage(ResponseStage):
+    """Applies user-defined replacements to each complete line"""
+
+    def __init__(self, rules: Sequence[ReplacementRule]):
+        self.rules = list(rules)
+        self._line = ""
+
+    def feed(self, text: str) -> str:
+        end = text.rfind("\n")
+        if end < 0:
+            self._line += text
+            return ""
+        lines = (self._line + text[:end]).split("\n")
+        self._line = text[end + 1:]
+        return "\n".join(self._replace(line) for line in lines) + "\n"
+
+    def finish(self) -> str:
+        line, self._line = self._line, ""
+        return self._replace(line) if line else ""
+
+    def _replace(self, line: str) -> str:
+        for pattern, replacement in self.rules:
+            line = pattern.sub(replacement, line)
+        return line
+
+
+class WhitespaceStage(ResponseStage):
+    """Trims the response and collapses runs of blank lines into one
+
+    Trailing whitespace is held back until more text follows it, so each
+    run of whitespace is always normalized as a whole.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+
+        body = text.rstrip()
+        if not body:
+            self._pending += text
+            return ""
+        text, self._pending = self._pending + body, text[len(body):]
+        return _BLANK_LINES.sub(_collapse_blank_lines, text)
+
+    def finish(self) -> str:
+        self._started = False
+        self._pending = ""
+        return ""
+
+
+def _collapse_blank_lines(match) -> str:
+    """At most one blank line, without trailing spaces, keeping the next line's indentation"""
+    run = match.group()
+    return "\n" * min(run.count("\n"), 2) + run[run.rfind("\n") + 1:]
+
+
+class ClosingSymbolStage(ResponseStage):
+    """Passes text through and appends a closing quote or asterisk at the end if one is open
+
+    Only the last line that has text in it matters (see
+    ContentProcessor.get_closing_symbol), so the stage keeps the state of the
+    current line and of the last finished line that was not blank.
+    """
+
+    def __init__(self):
+        self._line = self._empty_line()
+        self._last = self._empty_line()
+
+    def feed(self, text: str) -> str:
+        segments = text.split("\n")
+        self._scan(segments[0])
+        for segment in segments[1:]:
+            if self._line[1]:
+                self._last = self._line
+            self._line = self._empty_line()
+            self._scan(segment)
+        return text
+
+    def finish(self) -> str:
+        symbol, has_text, _, text_tail = self._line if self._line[1] else self._last
+        self._line = self._last = self._empty_line()
+        if not has_text or text_tail[-1:] in ('"', '*') or (text_tail[-1:] == '.' and text_tail[:1] in ('"', '*')):
+            return ""
+        return symbol or ""
+
+    @staticmethod
+    def _empty_line() -> Tuple[Optional[str], bool, str, str]:
+        # (open symbol, has text, last two characters, last two characters up to the last visible one)
+        return (None, False, "", "")
+
+    def _scan(self, segment: str) -> None:
+        if not segment:
+            return
+        symbol, has_text, tail, text_tail = self._line
+        for char in _SYMBOLS.sub("", segment):
+            symbol = None if char == symbol else char
+        visible = segment.rstrip()
+        if visible:
+            has_text = True
+            text_tail = (tail + visible)[-2:]
+        self._line = (symbol, has_text, (tail + segment)[-2:], text_tail)
+
+
+class ResponseChain:
+    """Runs response text through a list of stages, optionally starting from decoder deltas"""
+
+    def __init__(self, stages: Sequence[ResponseStage] = (), think: Optional[ThinkTagStage] = None):
+        self.stages = list(stages)
+        self.think = think
+
+    def feed(self, text: str) -> str:
+        """Feed a piece of response text and return what can be emitted now"""
+        for stage in self.stages:
+            if not text:
+                return ""
+            text = stage.feed(text)
+        return text
+
+    def feed_delta(self, delta: StreamDelta) -> str:
+        """Feed a decoded network delta"""
+        return self.feed(self.think.feed_delta(delta) if self.think else delta.text)
+
+    def finish(self) -> str:
+        """Flush every stage at the end of the response"""
+        text = self.think.finish() if self.think else ""
+        for stage in self.stages:
+            text = stage.feed(text) + stage.finish()
+        return text
+
+    def run(self, text: str) -> str:
+        """Process a complete response in one go"""
+        return self.feed(text) + self.finish()
+
+
+def assemble_response(deltas: Iterable[StreamDelta], send_thoughts: bool = True) -> str:
+    """Join deltas into the final non-streaming response text"""
+    chain = ResponseChain(think=ThinkTagStage(send_thoughts))
+    return "".join(chain.feed_delta(delta) for delta in deltas) + chain.finish()
@@ -0,0 +1,121 @@
+"""
+Decoder for the DeepSeek completion stream captured by the extension
+
+Each SSE data line is a JSON patch: "p" is the path being written
+(response/thinking_content or response/content), "v" the value to append and
+"o" the operation. Lines without "p" continue whatever section was written
+last, and an "o": "BATCH" on "response" carries several patches at once. The
+decoder turns this into typed deltas, with explicit start and end markers
+around the thinking section.
+"""
+
+import json
+from typing import Iterable, List, NamedTuple
+
+
+THINKING_PATH = 'response/thinking_content'
+CONTENT_PATH = 'response/content'
+
+
+class StreamDelta(NamedTuple):
+    """A typed piece of decoded DeepSeek output"""
+    kind: str
+    text: str = ""
+
+
+class DeepSeekStreamDecoder:
+    """Incrementally decodes the DeepSeek SSE patch protocol (p/v/o: BATCH)"""
+
+    CONTENT = 'content'
+    THINKING = 'thinking'
+    THINKING_START = 'thinking_start'
+    THINKING_END = 'thinking_end'
+
+    def __init__(self):
+        self._thinking = False
+        self._loads = json.loads
+
+    @property
+    def thinking_active(self) -> bool:
+        return self._thinking
+
+    def feed(self, data: str) -> List[StreamDelta]:
+        """Decode one SSE data line into deltas"""
+        if not data:
+            return []
+        if data[0] != '{':
+            # Plain text data is passed through as content
+            return [StreamDelta(self.CONTENT, data)]
+
+        try:
+            obj = self._loads(data)
+        except ValueError as e:
+            print(f"Error decoding network stream data: {e}")
+            return []
+
+        deltas: List[StreamDelta] = []
+        if 'v' in obj:
+            path = obj.get('p')
+            value = obj['v']
+
+            if path == THINKING_PATH:
+                self._start_thinking(deltas)
+                self._append_values(deltas, self.THINKING, value)
+            elif path == CONTENT_PATH:
+                self._end_thinking(deltas)
+                self._append_values(deltas, self.CONTENT, value, CONTENT_PATH)
+            elif path is None:
+                # Continuation chunks belong to whatever section is open
+                self._append_values(deltas, self.THINKING if self._thinking else self.CONTENT, value)
+            elif path == 'response' and obj.get('o') == 'BATCH' and isinstance(value, list):
+                for item in value:
+                    if not isinstance(item, dict) or 'v' not in item:
+                        continue
+                    item_path = item.get('p')
+                    if item_path == THINKING_PATH:
+                        self._start_thinking(deltas)
+                        deltas.append(StreamDelta(self.THINKING, str(item['v'])))
+                    elif item_path == CONTENT_PATH:
+                        self._end_thinking(deltas)
+                        deltas.append(StreamDelta(self.CONTENT, str(item['v'])))
+        elif not self._thinking:
+            # Complex response structure (full snapshot)
+            response = obj.get('response')
+            if isinstance(response, dict) and 'content' in response:
+                deltas.append(StreamDelta(self.CONTENT, response['content']))
+
+        return deltas
+
+    def finish(self) -> List[StreamDelta]:
+        """Close any section still open at the end of the stream"""
+        deltas: List[StreamDelta] = []
+        self._end_thinking(deltas)
+        return deltas
+
+    def decode_all(self, lines: Iterable[str]) -> List[StreamDelta]:
+        """Decode a complete capture in one go"""
+        deltas: List[StreamDelta] = []
+        for line in lines:
+            deltas.extend(self.feed(line))
+        deltas.extend(self.finish())
+        return deltas
+
+    def _start_thinking(self, deltas: List[StreamDelta]) -> None:
+        if not self._thinking:
+            self._thinking = True
+            deltas.append(StreamDelta(self.THINKING_START))
+
+    def _end_thinking(self, deltas: List[StreamDelta]) -> None:
+        if self._thinking:
+            self._thinking = False
+            deltas.append(StreamDelta(self.THINKING_END))
+
+    def _append_values(self, deltas: List[StreamDelta], kind: str, value, required_path: str = None) -> None:
+        if isinstance(value, str):
+            if value:
+                deltas.append(StreamDelta(kind, value))
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict) and 'v' in item and (required_path is None or item.get('p') == required_path):
+                    deltas.append(StreamDelta(kind, str(item['v'])))
+
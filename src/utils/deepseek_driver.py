@@ -3,6 +3,7 @@ from seleniumbase import Driver
 from typing import Optional
 import time
 import hashlib
+import utils.extension_channel as extension_channel
 
 manager = None
 
@@ -48,6 +49,53 @@ def login(driver: Driver, email: str, password: str) -> None:
 # Reset and configure chat
 # =============================================================================================================================
 
+# Reads everything configure_chat checks in a single round trip. The token lives on window, so
+# a reload or navigation drops it and the page model recorded for it no longer matches.
+_PAGE_STATE_SCRIPT = """
+if (!window.__intenserpPage) { window.__intenserpPage = Math.random().toString(36).slice(2); }
+const sidebar = document.querySelector('.dc04ec1d');
+const buttons = Array.from(document.querySelectorAll("div[role='button'][class*='_3172d9f']"));
+const deepthink = buttons.find(b => b.textContent.includes('R1'));
+const search = buttons.find(b => !b.textContent.includes('R1'));
+const active = b => b ? (b.getAttribute('style') || '').includes('rgba(77, 107, 254, 0.40)') : null;
+return {
+    token: window.__intenserpPage,
+    path: location.pathname,
+    sidebar_open: !!sidebar && !(sidebar.getAttribute('class') || '').includes('a02af2e6'),
+    reload_banner: !!document.querySelector('div.a4380d7b'),
+    messages: document.querySelectorAll("div[class*='ds-markdown ds-markdown--block']").length,
+    deepthink: active(deepthink),
+    search: active(search)
+};
+"""
+
+DEEPTHINK_BUTTON = "//div[@role='button' and contains(@class, '_3172d9f') and contains(., 'R1')]"
+SEARCH_BUTTON = "//div[@role='button' and contains(@class, '_3172d9f') and not(contains(., 'R1'))]"
+
+# Last verified state of the chat each driver opened and configured, keyed by id(driver)
+_page_states = {}
+
+def _read_page_state(driver: Driver) -> Optional[dict]:
+    try:
+        page = driver.execute_script(_PAGE_STATE_SCRIPT)
+        return page if isinstance(page, dict) else None
+    except Exception:
+        return None
+
+def invalidate_page_state(driver: Driver) -> None:
+    _page_states.pop(id(driver), None)
+
+def _is_prepared_chat(driver: Driver, page: dict) -> bool:
+    """Check that the page still shows the empty chat configure_chat opened last time"""
+    known = _page_states.get(id(driver))
+    return bool(
+        known
+        and known['token'] == page['token']
+        and known['path'] == page['path']
+        and not page['messages']
+        and not page['reload_banner']
+    )
+
 def _close_sidebar(driver: Driver) -> None:
     try:
         sidebar = driver.find_element("class name", "dc04ec1d")
@@ -67,13 +115,17 @@ def new_chat(driver: Driver) -> None:
     except Exception:
         pass
 
+def _reload_page(driver: Driver) -> None:
+    invalidate_page_state(driver)
+    driver.refresh()
+    time.sleep(1)
+
 def _check_and_reload_page(driver: Driver) -> None:
     try:
         element = driver.find_elements("css selector", "div.a4380d7b")
         
         if element:
-            driver.refresh()
-            time.sleep(1)
+            _reload_page(driver)
     except Exception:
         pass
 
@@ -89,16 +141,71 @@ def _set_button_state(driver: Driver, xpath: str, activate: bool) -> None:
     except Exception as e:
         print(f"Error setting button state: {e}")
 
+def _apply_chat_options(driver: Driver, page: dict, deepthink: bool, search: bool) -> None:
+    """Click only the toggles the page state shows in the wrong position (or could not find)"""
+    if page['deepthink'] != deepthink:
+        _set_button_state(driver, DEEPTHINK_BUTTON, deepthink)
+    if page['search'] != search:
+        _set_button_state(driver, SEARCH_BUTTON, search)
+
 def configure_chat(driver: Driver, deepthink: bool, search: bool) -> None:
     global manager
     if manager and manager.get_temp_files():
         manager.delete_file("temp", manager.get_last_temp_file())
     
-    _close_sidebar(driver)
-    new_chat(driver)
-    _check_and_reload_page(driver)
-    _set_button_state(driver, "//div[@role='button' and contains(@class, '_3172d9f') and contains(., 'R1')]", deepthink)
-    _set_button_state(driver, "//div[@role='button' and contains(@class, '_3172d9f') and not(contains(., 'R1'))]", search)
+    page = _read_page_state(driver)
+    if page is None:
+        # Page state unknown, check every element the slow way
+        invalidate_page_state(driver)
+        _close_sidebar(driver)
+        new_chat(driver)
+        _check_and_reload_page(driver)
+        set_chat_options(driver, deepthink, search)
+        return
+
+    if page['sidebar_open']:
+        _close_sidebar(driver)
+
+    # Already on the empty chat opened last time: nothing but the toggles can need work
+    if not _is_prepared_chat(driver, page):
+        new_chat(driver)
+        page = _read_page_state(driver) or page
+        if page['reload_banner']:
+            _reload_page(driver)
+            page = _read_page_state(driver) or page
+
+    _apply_chat_options(driver, page, deepthink, search)
+    _page_states[id(driver)] = {
+        'token': page['token'],
+        'path': page['path'],
+        'deepthink': deepthink,
+        'search': search
+    }
+
+def set_chat_options(driver: Driver, deepthink: bool, search: bool) -> None:
+    page = _read_page_state(driver)
+    if page is None:
+        _set_button_state(driver, DEEPTHINK_BUTTON, deepthink)
+        _set_button_state(driver, SEARCH_BUTTON, search)
+        return
+
+    _apply_chat_options(driver, page, deepthink, search)
+    known = _page_states.get(id(driver))
+    if known and known['token'] == page['token']:
+        known.update(deepthink=deepthink, search=search)
+
+def is_chat_empty(driver: Driver) -> bool:
+    """Check that the open chat has no messages yet, so a pre-warmed chat can still be used"""
+    page = _read_page_state(driver)
+    if page is not None:
+        return not page['messages'] and not page['reload_banner']
+
+    try:
+        if driver.find_elements("css selector", "div.a4380d7b"):
+            return False
+        return not driver.find_elements("xpath", "//div[contains(@class, 'ds-markdown ds-markdown--block')]")
+    except Exception:
+        return False
 
 # =============================================================================================================================
 # Send message or upload file to chat
@@ -195,17 +302,16 @@ def get_last_message_raw_html(driver: Driver) -> Optional[str]:
         print(f"Error when extracting raw HTML: {e}")
         return None
 
-def has_code_block_in_html(raw_html: str) -> bool:
-    """Check if raw HTML contains any code block markers"""
-    if not raw_html:
-        return False
-    return 'md-code-block' in raw_html
-
 def get_last_message(driver: Driver, pipeline=None) -> Optional[str]:
     """Get the last message from the chat, optionally using pipeline for processing with caching"""
     try:
         time.sleep(0.2)
         
+        if _browser_markdown(pipeline):
+            markdown = get_last_message_markdown(driver, pipeline)
+            if markdown is not None:
+                return pipeline.process_serialized_markdown(markdown)
+        
         messages = driver.find_elements("xpath", "//div[contains(@class, 'ds-markdown ds-markdown--block')]")
         
         if messages:
@@ -220,11 +326,7 @@ def get_last_message(driver: Driver, pipeline=None) -> Optional[str]:
                 return _content_cache[cache_key]
             
             # Process content
-            if pipeline and hasattr(pipeline, 'process_response_content'):
-                processed_content = pipeline.process_response_content(last_message_html)
-            else:
-                # Fallback to basic processing if no pipeline
-                processed_content = _basic_html_cleanup(last_message_html)
+            processed_content = render_message_html(last_message_html, pipeline)
             
             # Cache the result
             _content_cache[cache_key] = processed_content
@@ -238,6 +340,16 @@ def get_last_message(driver: Driver, pipeline=None) -> Optional[str]:
         print(f"Error when extracting the last response: {e}")
         return None
 
+def _read_last_message(driver: Driver, pipeline=None) -> Optional[str]:
+    """The last message as compared while it settles: in-page Markdown when the pipeline asks for it, otherwise its HTML"""
+    if _browser_markdown(pipeline):
+        markdown = get_last_message_markdown(driver, pipeline)
+        if markdown is not None:
+            return markdown
+    
+    messages = driver.find_elements("xpath", "//div[contains(@class, 'ds-markdown ds-markdown--block')]")
+    return messages[-1].get_attribute("innerHTML") if messages else None
+
 def _basic_html_cleanup(html: str) -> str:
     """Basic HTML cleanup for fallback scenarios"""
     try:
@@ -265,20 +377,542 @@ def _basic_html_cleanup(html: str) -> str:
         # Ultimate fallback - return as is
         return html
 
+# =============================================================================================================================
+# Markdown in the page
+# =============================================================================================================================
+
+# Serializes message nodes to Markdown in the page itself, with the same rules and output as
+# ContentProcessor, so the message arrives as text instead of HTML for Python to parse. Called with
+# the UI selectors to drop, it returns a function from a list of sibling nodes to their Markdown;
+# only the final cleanup is left to Python.
+_MARKDOWN_SERIALIZER = r"""
+function (uiSelectors) {
+    // Same steps, in the same order, as content_processor._MarkdownWriter: an element converted
+    // by a step reads its content as the earlier steps left it. _final_cleanup runs in Python.
+    const ENTITIES = 1, CODE_BLOCK = 2, REMOVE = 3, HEADER = 4;
+    const LINK = 10, IMAGE = 11, QUOTE = 12, RULE = 13, BREAK = 14, LIST = 15, LIST_ITEM = 16;
+    const PARAGRAPH = 17, CODE = 18, BOLD = 19, ITALIC = 20, TABLE = 21, DONE = 99;
+    const TAG_STEPS = new Map(Object.entries({
+        h1: HEADER, h2: HEADER + 1, h3: HEADER + 2, h4: HEADER + 3, h5: HEADER + 4, h6: HEADER + 5,
+        a: LINK, img: IMAGE, blockquote: QUOTE, hr: RULE, br: BREAK,
+        ul: LIST, ol: LIST, li: LIST_ITEM, code: CODE,
+        strong: BOLD, b: BOLD, em: ITALIC, i: ITALIC, table: TABLE
+    }));
+    const REMOVED_TAGS = new Set(['script', 'style', 'meta', 'link']);
+    // BeautifulSoup leaves the text inside these out of get_text()
+    const HIDDEN_TEXT_TAGS = new Set(['script', 'style', 'template', 'rt', 'rp']);
+    const IN_LIST = 1, IN_CODE_BLOCK = 2, HIDDEN = 4;
+    // Python's str.strip() whitespace
+    const SPACE = '[\\t-\\r\\x1c-\\x20\\x85\\xa0\\u1680\\u2000-\\u200a\\u2028\\u2029\\u202f\\u205f\\u3000]';
+    const STRIP = new RegExp('^' + SPACE + '+|' + SPACE + '+$', 'g');
+    const strip = text => text.replace(STRIP, '');
+    const uiSelector = (uiSelectors || []).join(',');
+
+    let converted = new Map();
+    let unwrapped = new Set();
+
+    // ContentProcessor drops <em> tags inside <strong> from the HTML before parsing it
+    const emInsideStrong = nodes => {
+        const found = new Set();
+        let inside = false;
+        const visit = node => {
+            if (node.nodeType !== 1) { return; }
+            const name = node.localName;
+            const bare = node.attributes.length === 0;
+            if (name === 'strong' && bare) { inside = true; }
+            if (name === 'em' && bare && inside) { found.add(node); }
+            for (const child of node.childNodes) { visit(child); }
+            if (name === 'strong') { inside = false; }
+        };
+        for (const node of nodes) { visit(node); }
+        return found;
+    };
+
+    const childContext = (node, context) => {
+        const name = node.localName;
+        if (name === 'ul' || name === 'ol') {
+            context |= IN_LIST;
+        } else if (name === 'div' && node.classList.contains('md-code-block')) {
+            context |= IN_CODE_BLOCK;
+        }
+        return HIDDEN_TEXT_TAGS.has(name) ? context | HIDDEN : context;
+    };
+
+    const steps = (node, context) => {
+        const found = [];
+        if (unwrapped.has(node)) { return found; }
+        const name = node.localName;
+        if (name === 'span' && node.classList.contains('ds-markdown-html')) {
+            found.push(ENTITIES);
+        } else if (name === 'div' && node.classList.contains('md-code-block')) {
+            found.push(CODE_BLOCK);
+        }
+        if (REMOVED_TAGS.has(name) || (uiSelector && node.matches(uiSelector))) { found.push(REMOVE); }
+        const step = TAG_STEPS.get(name);
+        if (step && !((context & IN_LIST) && (step === LIST || step === LIST_ITEM))
+                && !((context & IN_CODE_BLOCK) && step === CODE)) {
+            found.push(step);
+        }
+        return found;
+    };
+
+    // Walking
+    const writeNode = (node, step, out, context) => {
+        if (node.nodeType === 3 || node.nodeType === 4) {
+            if (!(context & HIDDEN)) { out.push(node.data); }
+            return;
+        }
+        if (node.nodeType !== 1) { return; }
+
+        for (const nodeStep of steps(node, context)) {
+            if (nodeStep >= step) { break; }
+            const text = convert(node, nodeStep, context);
+            if (text !== null) {
+                out.push(text);
+                return;
+            }
+        }
+
+        writeChildren(node, step, out, context);
+        if (node.localName === 'p' && step > PARAGRAPH) { out.push('\n\n'); }
+    };
+
+    const writeChildren = (node, step, out, context) => {
+        context = childContext(node, context);
+        for (const child of node.childNodes) { writeNode(child, step, out, context); }
+    };
+
+    const text = (node, step, context) => {
+        const out = [];
+        writeNode(node, step, out, context);
+        return out.join('');
+    };
+
+    const innerText = (node, step, context) => {
+        const out = [];
+        writeChildren(node, step, out, context);
+        return out.join('');
+    };
+
+    function* find(node, step, context, match) {
+        context = childContext(node, context);
+        for (const child of node.childNodes) {
+            if (child.nodeType !== 1 || isConverted(child, step, context)) { continue; }
+            if (match(child)) { yield [child, context]; }
+            yield* find(child, step, context, match);
+        }
+    }
+
+    const first = (node, step, context, match) => {
+        const result = find(node, step, context, match).next();
+        return result.done ? null : result.value;
+    };
+
+    // Steps
+    const isConverted = (node, step, context) => {
+        for (const nodeStep of steps(node, context)) {
+            if (nodeStep >= step) { return false; }
+            if (convert(node, nodeStep, context) !== null) { return true; }
+        }
+        return false;
+    };
+
+    const convert = (node, step, context) => {
+        let results = converted.get(node);
+        if (!results) {
+            results = {};
+            converted.set(node, results);
+        }
+        if (!(step in results)) { results[step] = render(node, step, context); }
+        return results[step];
+    };
+
+    const render = (node, step, context) => {
+        if (step === REMOVE) { return ''; }
+
+        if (step === ENTITIES) {
+            return innerText(node, step, context)
+                .split('&lt;').join('<')
+                .split('&gt;').join('>')
+                .split('&amp;').join('&')
+                .split('&nbsp;').join(' ')
+                .split('&quot;').join('"');
+        }
+
+        if (step === CODE_BLOCK) { return codeBlock(node, context); }
+
+        if (step < LINK) {
+            return '\n' + '#'.repeat(step - HEADER + 1) + ' ' + innerText(node, step, context) + '\n';
+        }
+
+        if (step === LINK) {
+            const url = node.getAttribute('href');
+            if (url === null) { return null; }
+            const linkText = innerText(node, step, context);
+            return linkText && url ? '[' + linkText + '](' + url + ')' : null;
+        }
+
+        if (step === IMAGE) {
+            const url = node.getAttribute('src');
+            return url === null ? null : '![' + (node.getAttribute('alt') || '') + '](' + url + ')';
+        }
+
+        if (step === QUOTE) {
+            const lines = strip(innerText(node, step, context)).split('\n');
+            return '\n' + lines.map(line => '> ' + line).join('\n') + '\n';
+        }
+
+        if (step === RULE) { return '\n---\n'; }
+
+        if (step === BREAK) { return '\n'; }
+
+        if (step === LIST) {
+            const result = list(node, 0, context);
+            return result ? '\n' + result + '\n\n' : '';
+        }
+
+        if (step === LIST_ITEM) { return '- ' + strip(innerText(node, step, context)); }
+
+        if (step === TABLE) { return table(node, context); }
+
+        const content = innerText(node, step, context);
+        if (!strip(content)) { return null; }
+
+        if (step === CODE) {
+            if (content.includes('\n') && strip(content).split('\n').length > 1) {
+                return '\n```\n' + strip(content) + '\n```\n';
+            }
+            return '`' + content + '`';
+        }
+
+        if (step === BOLD) { return '**' + content + '**'; }
+
+        return '*' + content + '*';
+    };
+
+    const codeBlock = (node, context) => {
+        const pre = first(node, CODE_BLOCK, context, child => child.localName === 'pre');
+        if (!pre) { return null; }
+
+        const languageElement = first(node, CODE_BLOCK, context,
+            child => child.localName === 'span' && child.classList.contains('d813de27'));
+        const language = languageElement ? strip(innerText(languageElement[0], CODE_BLOCK, languageElement[1])) : '';
+        const code = strip(innerText(pre[0], CODE_BLOCK, pre[1]));
+
+        if (language && language.toLowerCase() !== 'text') {
+            return '\n```' + language + '\n' + code + '\n```\n';
+        }
+        return '\n```\n' + code + '\n```\n';
+    };
+
+    const list = (listElement, indentLevel, context) => {
+        const indent = '  '.repeat(indentLevel);
+        const lines = [];
+        const itemContext = childContext(listElement, context);
+        const items = Array.prototype.filter.call(listElement.childNodes, child =>
+            child.nodeType === 1 && child.localName === 'li' && !isConverted(child, LIST, itemContext));
+
+        items.forEach((item, i) => {
+            // Text of the direct children, nested lists aside
+            const parts = [];
+            const nestedLists = [];
+            const context = childContext(item, itemContext);
+            for (const child of item.childNodes) {
+                if (child.nodeType === 1 && (child.localName === 'ul' || child.localName === 'ol')
+                        && !isConverted(child, LIST, context)) {
+                    nestedLists.push(child);
+                    continue;
+                }
+                const part = strip(text(child, LIST, context));
+                if (part) { parts.push(part); }
+            }
+
+            const itemText = strip(parts.join(' '));
+            if (itemText) {
+                const marker = listElement.localName === 'ol' ? (i + 1) + '.' : '-';
+                lines.push(indent + marker + ' ' + itemText);
+            }
+
+            for (const nested of nestedLists) {
+                for (const line of list(nested, indentLevel + 1, context).split('\n')) {
+                    if (strip(line)) { lines.push(line); }
+                }
+            }
+        });
+
+        return lines.join('\n');
+    };
+
+    const table = (node, context) => {
+        const rows = [...find(node, TABLE, context, child => child.localName === 'tr')];
+        if (!rows.length) { return null; }
+
+        const cells = row => [...find(row[0], TABLE, row[1], child => child.localName === 'th' || child.localName === 'td')]
+            .map(([cell, cellContext]) => strip(innerText(cell, TABLE, cellContext)));
+
+        const lines = [];
+        const headers = cells(rows[0]);
+        if (headers.length) {
+            lines.push('| ' + headers.join(' | ') + ' |');
+            lines.push('| ' + headers.map(() => '---').join(' | ') + ' |');
+        }
+        for (const row of rows.slice(1)) {
+            const rowCells = cells(row);
+            if (rowCells.length) { lines.push('| ' + rowCells.join(' | ') + ' |'); }
+        }
+        return '\n' + lines.join('\n') + '\n';
+    };
+
+    // The Markdown of a run of sibling nodes, such as the children of a message
+    return nodes => {
+        nodes = Array.prototype.slice.call(nodes);
+        converted = new Map();
+        unwrapped = emInsideStrong(nodes);
+        const out = [];
+        for (const node of nodes) { writeNode(node, DONE, out, 0); }
+        return out.join('');
+    };
+}
+"""
+
+_MESSAGE_MARKDOWN_SCRIPT = "const toMarkdown = (" + _MARKDOWN_SERIALIZER + ")(arguments[0]);" + """
+const messages = document.querySelectorAll("div[class*='ds-markdown ds-markdown--block']");
+return messages.length ? toMarkdown(messages[messages.length - 1].childNodes) : null;
+"""
+
+def _browser_markdown(pipeline) -> bool:
+    """Whether the pipeline has messages serialized to Markdown in the page"""
+    return bool(pipeline and getattr(pipeline, 'browser_markdown', False))
+
+def get_last_message_markdown(driver: Driver, pipeline) -> Optional[str]:
+    """Serialize the last message to Markdown in the page (before the final cleanup), None without one"""
+    try:
+        markdown = driver.execute_script(_MESSAGE_MARKDOWN_SCRIPT, pipeline.content_processor.ui_selectors)
+        return markdown if isinstance(markdown, str) else None
+    except Exception as e:
+        print(f"Error serializing the last message in the page: {e}")
+        return None
+
+# =============================================================================================================================
+# Observe the last message
+# =============================================================================================================================
+
+# Installs a MutationObserver that tracks the last message block. Changes are recorded as the
+# index of the first top-level child that changed, so a read returns only the blocks from there
+# on instead of the whole message. Given UI selectors (arguments[0]) the blocks are read as Markdown.
+_OBSERVER_SCRIPT = "const toMarkdown = arguments[0] ? (" + _MARKDOWN_SERIALIZER + ")(arguments[0]) : null;" + """
+const previous = window.__intenserpObserver;
+if (previous) { previous.observer.disconnect(); }
+
+const BLOCK = "div[class*='ds-markdown ds-markdown--block']";
+const BATCH_MS = 50;
+const escape = text => text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+const toHtml = node => node.nodeType === 1 ? node.outerHTML : (node.nodeType === 3 ? escape(node.textContent) : '');
+const serialize = toMarkdown ? node => toMarkdown([node]) : toHtml;
+const CODE_BLOCK = "[class*='md-code-block']";
+const lastBlock = () => { const all = document.querySelectorAll(BLOCK); return all.length ? all[all.length - 1] : null; };
+const childIndex = (block, node) => {
+    while (node && node.parentNode !== block) { node = node.parentNode; }
+    return node ? Array.prototype.indexOf.call(block.childNodes, node) : -1;
+};
+
+const state = {
+    target: lastBlock(),
+    dirtyFrom: 0,
+    reset: true,
+    pending: true,
+    waiter: null,
+    wake() {
+        this.pending = true;
+        if (this.waiter) {
+            const waiter = this.waiter;
+            this.waiter = null;
+            setTimeout(waiter, BATCH_MS);
+        }
+    },
+    drain() {
+        const button = document.querySelector("div[role='button'][class*='_7436101']");
+        const result = {
+            reset: this.reset,
+            from: 0,
+            blocks: [],
+            count: 0,
+            markdown: !!toMarkdown,
+            codeBlock: false,
+            generating: !!button && button.getAttribute('aria-disabled') === 'false'
+        };
+        if (this.target) {
+            const nodes = this.target.childNodes;
+            result.from = this.reset ? 0 : Math.min(this.dirtyFrom, nodes.length);
+            result.count = nodes.length;
+            for (let i = result.from; i < nodes.length; i++) { result.blocks.push(serialize(nodes[i])); }
+            const last = nodes[nodes.length - 1];
+            result.codeBlock = !!last && last.nodeType === 1 && (last.matches(CODE_BLOCK) || !!last.querySelector(CODE_BLOCK));
+        }
+        this.dirtyFrom = Infinity;
+        this.reset = false;
+        this.pending = false;
+        return result;
+    }
+};
+
+state.observer = new MutationObserver(mutations => {
+    const block = lastBlock();
+    if (block !== state.target) {
+        state.target = block;
+        state.dirtyFrom = 0;
+        state.reset = true;
+        state.wake();
+        return;
+    }
+
+    let changed = false;
+    for (const mutation of mutations) {
+        if (mutation.type === 'attributes') { changed = true; continue; }
+        if (!block || !block.contains(mutation.target)) { continue; }
+        let index;
+        if (mutation.target === block) {
+            index = mutation.previousSibling ? childIndex(block, mutation.previousSibling) + 1 : 0;
+        } else {
+            index = childIndex(block, mutation.target);
+        }
+        state.dirtyFrom = Math.min(state.dirtyFrom, Math.max(index, 0));
+        changed = true;
+    }
+    if (changed) { state.wake(); }
+});
+state.observer.observe(document.body, {
+    childList: true,
+    subtree: true,
+    characterData: true,
+    attributes: true,
+    attributeFilter: ['aria-disabled']
+});
+window.__intenserpObserver = state;
+return true;
+"""
+
+# Resolves with the changes as soon as there are any (batched briefly), or after arguments[0] ms
+_DRAIN_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const state = window.__intenserpObserver;
+if (!state) { done(null); return; }
+
+let timer = null;
+const finish = () => {
+    clearTimeout(timer);
+    state.waiter = null;
+    done(state.drain());
+};
+if (state.pending) { finish(); return; }
+timer = setTimeout(finish, arguments[0]);
+state.waiter = finish;
+"""
+
+_UNWATCH_SCRIPT = """
+const state = window.__intenserpObserver;
+if (state) { state.observer.disconnect(); delete window.__intenserpObserver; }
+"""
+
+class ObservedMessage:
+    """Copy of the last message kept up to date from the observer's block deltas"""
+
+    def __init__(self):
+        self.blocks = []
+        self.generating = True
+        # Blocks are Markdown from the in-page serializer instead of HTML
+        self.markdown = False
+        self.code_block = False
+
+    @property
+    def html(self) -> str:
+        return "".join(self.blocks)
+
+    def apply(self, changes: dict) -> bool:
+        """Patch in a read from the observer, True when the message changed"""
+        self.generating = bool(changes.get('generating'))
+        self.markdown = bool(changes.get('markdown'))
+        self.code_block = bool(changes.get('codeBlock'))
+        start = changes.get('from', 0)
+        blocks = changes.get('blocks') or []
+
+        if changes.get('reset'):
+            changed = self.blocks != blocks
+            self.blocks = list(blocks)
+            return changed
+
+        if self.blocks[start:] == blocks:
+            return False
+        self.blocks[start:] = blocks
+        return True
+
+def watch_last_message(driver: Driver, pipeline=None) -> bool:
+    """Start observing the last message in the page, False if the script could not be installed"""
+    ui_selectors = pipeline.content_processor.ui_selectors if _browser_markdown(pipeline) else None
+    try:
+        return bool(driver.execute_script(_OBSERVER_SCRIPT, ui_selectors))
+    except Exception as e:
+        print(f"Error installing message observer: {e}")
+        return False
+
+def read_message_changes(driver: Driver, wait: float = 0.5) -> Optional[dict]:
+    """Wait up to wait seconds for the last message to change, None when the observer is gone (page reloaded)"""
+    try:
+        changes = driver.execute_async_script(_DRAIN_SCRIPT, int(wait * 1000))
+        return changes if isinstance(changes, dict) else None
+    except Exception as e:
+        print(f"Error reading message changes: {e}")
+        return None
+
+def settle_observed_message(driver: Driver, message: ObservedMessage, max_wait_time: float = 5.0) -> bool:
+    """Drain changes after generation ends until two reads in a row change nothing"""
+    stable_count = 0
+    start_time = time.time()
+    while time.time() - start_time < max_wait_time:
+        changes = read_message_changes(driver, 0.2)
+        if changes is None:
+            return False
+        if message.apply(changes) or message.generating:
+            stable_count = 0
+        else:
+            stable_count += 1
+            if stable_count >= 2:
+                break
+    return True
+
+def unwatch_last_message(driver: Driver) -> None:
+    try:
+        driver.execute_script(_UNWATCH_SCRIPT)
+    except Exception:
+        pass
+
+def render_message_html(html: str, pipeline=None) -> str:
+    """Convert message HTML with the pipeline, or a basic cleanup without one"""
+    if pipeline and hasattr(pipeline, 'process_response_content'):
+        return pipeline.process_response_content(html)
+    return _basic_html_cleanup(html)
+
 # =============================================================================================================================
 # Network interception control
 # =============================================================================================================================
 
-def enable_network_interception(driver: Driver) -> bool:
+def enable_network_interception(driver: Driver, session_id: str = None, client_id: str = None) -> bool:
     """Enable CDP network interception by communicating with the extension"""
     try:
-        # Send message to content script to start CDP network interception
+        # Prefer the extension's WebSocket channel when it is connected
+        if client_id and extension_channel.send_control(client_id, {'action': 'startInterception', 'sessionId': session_id}):
+            print("[color:green]CDP network interception enabled (WebSocket)")
+            return True
+        
+        # Send message to content script to start CDP network interception,
+        # the extension tags everything it captures with our session id
         driver.execute_script("""
             console.log('DeepSeek driver: Enabling CDP network interception');
             window.postMessage({
-                action: 'startNetworkInterception'
+                action: 'startNetworkInterception',
+                sessionId: arguments[0]
             }, '*');
-        """)
+        """, session_id)
         
         print("[color:green]CDP network interception enabled")
         return True
@@ -287,9 +921,13 @@ def enable_network_interception(driver: Driver) -> bool:
         print(f"Error enabling CDP network interception: {e}")
         return False
 
-def disable_network_interception(driver: Driver) -> bool:
+def disable_network_interception(driver: Driver, client_id: str = None) -> bool:
     """Disable CDP network interception by communicating with the extension"""
     try:
+        if client_id and extension_channel.send_control(client_id, {'action': 'stopInterception'}):
+            print("[color:cyan]CDP network interception disabled (WebSocket)")
+            return True
+        
         # Send message to content script to stop CDP network interception
         driver.execute_script("""
             console.log('DeepSeek driver: Disabling CDP network interception');
@@ -332,11 +970,10 @@ def wait_for_response_completion(driver: Driver, pipeline=None, max_wait_time: f
         start_time = time.time()
         
         while time.time() - start_time < max_wait_time:
-            # Get raw HTML and hash it for comparison
+            # Get raw HTML (or the in-page Markdown) and hash it for comparison
             try:
-                messages = driver.find_elements("xpath", "//div[contains(@class, 'ds-markdown ds-markdown--block')]")
-                if messages:
-                    current_html = messages[-1].get_attribute("innerHTML")
+                current_html = _read_last_message(driver, pipeline)
+                if current_html is not None:
                     current_hash = _get_content_hash(current_html)
                     
                     if current_hash == last_content_hash:
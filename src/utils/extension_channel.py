@@ -0,0 +1,161 @@
+"""
+Persistent WebSocket channel between the browser extension and the API.
+
+The extension pushes its network interception callbacks as framed JSON
+messages instead of one HTTP POST each, and the API pushes control messages
+(start/stop interception) back without a driver.execute_script round trip.
+The channel is optional: without the websockets package, or while no
+extension is connected, both sides fall back to the HTTP endpoints.
+
+Only extension pages may connect, and a connection is ignored until its
+hello frame carries the token written into this launch's extension copy, so
+a web page open in the browser can neither take over a client id nor inject
+stream events.
+"""
+
+import hmac
+import json
+import re
+import secrets
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# Extension connections by client id (the browser worker name)
+_clients: Dict[str, Any] = {}
+_handlers: Dict[str, Callable[[dict], None]] = {}
+_lock = threading.Lock()
+_server = None
+# Written into the extension copies of this launch, required in every hello frame
+_token = secrets.token_urlsafe(24)
+# Origin of the unpacked extension (its id is derived from the copy's path)
+EXTENSION_ORIGIN = re.compile(r"chrome-extension://[a-p]{32}")
+
+
+def channel_token() -> str:
+    """The token extensions of this launch identify themselves with"""
+    return _token
+
+
+def start_extension_channel(port: int, handlers: Dict[str, Callable[[dict], None]]) -> bool:
+    """Serve the channel on localhost in a background thread"""
+    global _server
+    try:
+        from websockets.sync.server import serve
+    except ImportError as e:
+        print(f"[color:yellow]Extension WebSocket not available, using HTTP: {e}")
+        return False
+
+    stop_extension_channel()
+    _handlers.clear()
+    _handlers.update(handlers)
+
+    try:
+        _server = serve(_handle_connection, "127.0.0.1", port, compression=None, origins=[EXTENSION_ORIGIN])
+    except Exception as e:
+        print(f"[color:yellow]Could not start extension WebSocket on port {port}, using HTTP: {e}")
+        return False
+
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    print(f"[color:cyan]Extension WebSocket listening on port {port}")
+    return True
+
+
+def stop_extension_channel() -> None:
+    global _server
+    with _lock:
+        _clients.clear()
+    if _server:
+        try:
+            _server.shutdown()
+        except Exception as e:
+            print(f"Error stopping extension WebSocket: {e}")
+        _server = None
+
+
+def is_connected(client_id: str) -> bool:
+    with _lock:
+        return client_id in _clients
+
+
+def send_control(client_id: str, message: Dict[str, Any]) -> bool:
+    """Push a control message to an extension, False if it is not connected"""
+    with _lock:
+        connection = _clients.get(client_id)
+    if connection is None:
+        return False
+
+    try:
+        connection.send(json.dumps(message))
+        return True
+    except Exception as e:
+        print(f"[color:yellow]Extension WebSocket send failed for {client_id}: {e}")
+        _unregister(client_id, connection)
+        return False
+
+
+def _handle_connection(connection) -> None:
+    """Serve one extension: a hello frame with its client id and token, then events"""
+    client_id = None
+    try:
+        for raw in connection:
+            try:
+                frame = json.loads(raw)
+            except ValueError:
+                continue
+            if not isinstance(frame, dict):
+                continue
+
+            frame_type = frame.get('type')
+            if frame_type == 'hello':
+                if client_id:
+                    continue
+                client_id = _register(frame, connection)
+                if not client_id:
+                    connection.close(code=1008, reason="Unauthorized")
+                    return
+                print(f"[color:green]Extension connected over WebSocket: {client_id}")
+                continue
+
+            # Nothing is accepted before the hello
+            if not client_id:
+                continue
+
+            handler = _handlers.get(frame_type)
+            if handler:
+                try:
+                    handler(frame.get('payload') or {})
+                except Exception as e:
+                    print(f"Error handling extension frame {frame_type}: {e}")
+    except Exception as e:
+        print(f"[color:yellow]Extension WebSocket closed: {e}")
+    finally:
+        if client_id:
+            _unregister(client_id, connection)
+
+
+def _register(frame: dict, connection) -> Optional[str]:
+    """Register a connection from its hello frame, None if it has no valid token or the id is taken"""
+    token = frame.get('token')
+    if not isinstance(token, str) or not hmac.compare_digest(token, _token):
+        print("[color:yellow]Rejected extension WebSocket without a valid token")
+        return None
+
+    client_id = str(frame.get('clientId') or 'primary')
+    with _lock:
+        current = _clients.get(client_id)
+        if current is not None and current is not connection and _is_open(current):
+            print(f"[color:yellow]Rejected second extension WebSocket for {client_id}")
+            return None
+        _clients[client_id] = connection
+    return client_id
+
+
+def _is_open(connection) -> bool:
+    state = getattr(connection, 'state', None)
+    return getattr(state, 'name', 'OPEN') == 'OPEN'
+
+
+def _unregister(client_id: str, connection) -> None:
+    with _lock:
+        if _clients.get(client_id) is connection:
+            del _clients[client_id]
@@ -0,0 +1,256 @@
+"""
+In-process metrics with Prometheus text exposition for the /metrics endpoint.
+
+Every thread records into its own shard, so counters and histograms are
+updated without taking a lock in the streaming generators. Shards are merged
+only when the endpoint is scraped, and the shards of threads that have ended
+are folded into a base total so server threads coming and going do not pile
+them up.
+"""
+
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Bucket boundaries (seconds / characters)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+CHUNK_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (100, 500, 1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000)
+PROCESSING_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _Metric(ABC):
+    """Base for sharded metrics; values live in per-thread dicts keyed by label values"""
+
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labels: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._registry = registry
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        # Values recorded by threads that have ended
+        self._base: dict = {}
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._shards_lock:
+                self._fold_dead_shards()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_dead_shards(self) -> None:
+        """Merge the shards of finished threads into the base (called with the shards lock held)"""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                # The thread is gone, nothing writes to its shard any more
+                self._merge(self._base, shard)
+        self._shards = live
+
+    @abstractmethod
+    def _merge(self, into: dict, shard: dict) -> None:
+        """Add the values of a shard to another dict of the same shape"""
+        pass
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _snapshots(self) -> List[dict]:
+        base = {}
+        with self._shards_lock:
+            self._fold_dead_shards()
+            shards = [shard for _, shard in self._shards]
+            self._merge(base, self._base)
+        return [base] + [shard.copy() for shard in shards]
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def _merge(self, into: dict, shard: dict) -> None:
+        for key, value in list(shard.items()):
+            into[key] = into.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        for shard in self._snapshots():
+            self._merge(totals, shard)
+        return [f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in sorted(totals.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labels, buckets: Sequence[float]):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # Per-bucket counts (plus +Inf), then sum and count
+            state = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            shard[key] = state
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def _merge(self, into: dict, shard: dict) -> None:
+        for key, state in list(shard.items()):
+            merged = into.setdefault(key, [0] * len(state))
+            for index, value in enumerate(list(state)):
+                merged[index] += value
+
+    def render(self) -> List[str]:
+        totals: Dict[Tuple[str, ...], list] = {}
+        for shard in self._snapshots():
+            self._merge(totals, shard)
+
+        lines = []
+        for key, state in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(state[-2])}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text format"""
+
+    def __init__(self, prefix: str = "intenserp"):
+        self.prefix = prefix
+        self._metrics: List[_Metric] = []
+        self._gauges: List[Tuple[str, str, Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]]] = []
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(self, f"{self.prefix}_{name}", help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float], labels: Sequence[str] = ()) -> Histogram:
+        metric = Histogram(self, f"{self.prefix}_{name}", help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, collect: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]) -> None:
+        """Register a gauge read at scrape time; collect returns {((label, value), ...): number}"""
+        self._gauges.append((f"{self.prefix}_{name}", help_text, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+
+        for name, help_text, collect in self._gauges:
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"Error collecting metric {name}: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values.items():
+                label_text = ",".join(f'{label}="{_escape(str(v))}"' for label, v in labels)
+                lines.append(f"{name}{{{label_text}}} {_number(value)}" if label_text else f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# =============================================================================================================================
+# Default registry and the metrics recorded by the API
+# =============================================================================================================================
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter("requests_total", "Completion requests by mode", ("mode", "deepthink", "search", "streaming"))
+ERRORS = registry.counter("errors_total", "Errors by stage", ("stage",))
+QUEUE_WAIT = registry.histogram("queue_wait_seconds", "Time spent waiting for a browser", LATENCY_BUCKETS)
+TIME_TO_FIRST_TOKEN = registry.histogram("time_to_first_token_seconds", "Time from browser assignment to the first content", LATENCY_BUCKETS, ("mode",))
+INTER_CHUNK = registry.histogram("inter_chunk_seconds", "Gap between intercepted stream chunks (extension timestamps)", CHUNK_BUCKETS)
+GENERATION_TIME = registry.histogram("generation_seconds", "Time from browser assignment to the end of the response", LATENCY_BUCKETS, ("mode",))
+PROMPT_CHARS = registry.histogram("prompt_chars", "Characters in the formatted prompt", SIZE_BUCKETS)
+RESPONSE_CHARS = registry.histogram("response_chars", "Characters in the response", SIZE_BUCKETS, ("mode",))
+CACHE_LOOKUPS = registry.counter("cache_lookups_total", "Response cache lookups by result", ("result",))
+COALESCED = registry.counter("coalesced_requests_total", "Requests that followed an identical generation already in flight")
+PREWARM = registry.counter("prewarm_total", "Chats pre-warmed between requests, by whether the next request could use them", ("result",))
+PROCESSOR_TIME = registry.histogram("processor_seconds", "Time each request processor took (can_process and process, while profiling)", PROCESSING_BUCKETS, ("processor",))
+PROCESSOR_RUNS = registry.counter("processor_runs_total", "Requests each processor handled or skipped (while profiling)", ("processor", "result"))
+
+
+class GenerationTimer:
+    """Per-request helper that feeds the latency and size metrics"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.first_content: Optional[float] = None
+        self.response_chars = 0
+        self._last_chunk_ms: Optional[float] = None
+        self._finished = False
+        self.failed = False
+
+    def content(self, text: str) -> None:
+        """Record response text sent to the client"""
+        if not text:
+            return
+        if self.first_content is None:
+            self.first_content = time.perf_counter()
+            TIME_TO_FIRST_TOKEN.observe(self.first_content - self.started, mode=self.mode)
+        self.response_chars += len(text)
+
+    def extension_chunk(self, timestamp_ms: Optional[float]) -> None:
+        """Record the arrival of an intercepted chunk using the extension's timestamp"""
+        if timestamp_ms is None:
+            return
+        if self._last_chunk_ms is not None and timestamp_ms >= self._last_chunk_ms:
+            INTER_CHUNK.observe((timestamp_ms - self._last_chunk_ms) / 1000.0)
+        self._last_chunk_ms = timestamp_ms
+
+    def error(self, stage: str) -> None:
+        """Record an error; a failed generation is never cached"""
+        self.failed = True
+        ERRORS.inc(stage=stage)
+
+    def finish(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        GENERATION_TIME.observe(time.perf_counter() - self.started, mode=self.mode)
+        RESPONSE_CHARS.observe(self.response_chars, mode=self.mode)
@@ -5,14 +5,16 @@ import tempfile
 import shutil
 import time
 import json
+import utils.extension_channel as extension_channel
 
 # =============================================================================================================================
 # Initialize SeleniumBase and open browser
 # =============================================================================================================================
 
-def initialize_webdriver(custom_browser: str = "chrome", url: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> Optional[Driver]:
+def initialize_webdriver(custom_browser: str = "chrome", url: Optional[str] = None, config: Optional[Dict[str, Any]] = None, profile_name: Optional[str] = None) -> Optional[Driver]:
+    """Launch a browser; profile_name gives pooled browsers their own profile directory"""
     try:
-        print(f"[color:cyan]Initializing webdriver: browser={custom_browser}, url={url}")
+        print(f"[color:cyan]Initializing webdriver: browser={custom_browser}, url={url}, profile={profile_name or 'primary'}")
         if config:
             print(f"[color:cyan]Config intercept_network: {config.get('models', {}).get('deepseek', {}).get('intercept_network', False)}")
         browser = custom_browser.lower()
@@ -47,13 +49,19 @@ def initialize_webdriver(custom_browser: str = "chrome", url: Optional[str] = No
                 if config:
                     api_config = config.get("api", {})
                     api_port = api_config.get("port", 5000)
+                # The WebSocket channel listens on the next port (0 keeps the extension on HTTP)
+                ws_port = int(api_port) + 1 if deepseek_config.get("extension_websocket", True) else 0
                 # Create a fresh copy of the extension to avoid browser caching issues
-                extension_dir = _create_fresh_extension_copy(source_extension_dir, api_port)
+                extension_dir = _create_fresh_extension_copy(
+                    source_extension_dir, api_port, ws_port, profile_name or "primary", extension_channel.channel_token()
+                )
                 if extension_dir:
                     print(f"[color:cyan]Extension copied to: {extension_dir}")
-                    # Clean up old extension copies and profiles
-                    _cleanup_old_extension_copies()
-                    _cleanup_old_extension_profiles()
+                    # Clean up old extension copies and profiles (only for the primary browser,
+                    # so pooled browsers never remove copies their siblings are using)
+                    if not profile_name:
+                        _cleanup_old_extension_copies()
+                        _cleanup_old_extension_profiles()
                     # Use a clean profile for better extension management
                     clean_profile = True
                 else:
@@ -66,7 +74,7 @@ def initialize_webdriver(custom_browser: str = "chrome", url: Optional[str] = No
         # Set up data directory for Chromium browsers
         user_data_dir = None
         if persistent_cookies and browser in ("chrome", "edge"):
-            user_data_dir = _get_browser_data_dir(browser)
+            user_data_dir = _get_browser_data_dir(browser, profile_name)
             print(f"[color:cyan]Using persistent browser data directory: {user_data_dir}")
             
             # If network interception is enabled, clean any old extension installations first
@@ -75,7 +83,7 @@ def initialize_webdriver(custom_browser: str = "chrome", url: Optional[str] = No
                 
         elif clean_profile and browser in ["chrome", "edge"]:
             # Use a clean profile for extension management (when network interception enabled but persistent cookies disabled)
-            user_data_dir = _create_clean_extension_profile(browser)
+            user_data_dir = _create_clean_extension_profile(browser, profile_name)
             print(f"[color:cyan]Using clean extension profile: {user_data_dir}")
         else:
             # Default behavior - no special profile needed
@@ -191,13 +199,14 @@ def _remove_existing_extension_from_profile(user_data_dir: str) -> None:
     except Exception as e:
         print(f"[color:yellow]Error checking/removing existing extensions: {e}")
 
-def _get_browser_data_dir(browser: str) -> str:
+def _get_browser_data_dir(browser: str, profile_name: Optional[str] = None) -> str:
     """Get or create a persistent data directory for the specified browser"""
     try:
         # Create a data directory in the system temp folder
         base_temp_dir = tempfile.gettempdir()
         app_data_dir = os.path.join(base_temp_dir, "IntenseRP_Browser_Data")
-        browser_data_dir = os.path.join(app_data_dir, f"{browser}_profile")
+        profile_suffix = f"_{profile_name}" if profile_name else ""
+        browser_data_dir = os.path.join(app_data_dir, f"{browser}_profile{profile_suffix}")
         
         # Create the directory if it doesn't exist
         os.makedirs(browser_data_dir, exist_ok=True)
@@ -223,11 +232,13 @@ def _get_extension_data_dir() -> str:
         print(f"Error creating extension data directory: {e}")
         return os.path.join(tempfile.gettempdir(), "intenserp_extensions")
 
-def _create_clean_extension_profile(browser: str = "chrome") -> str:
+def _create_clean_extension_profile(browser: str = "chrome", worker_name: Optional[str] = None) -> str:
     """Create a clean Chrome/Edge profile with only our extension"""
     try:
         extension_data_dir = _get_extension_data_dir()
-        profile_name = f"intenserp_extension_{int(time.time())}"
+        # Timestamp must stay the last part of the name (used by the cleanup routine)
+        worker_part = f"{worker_name}_" if worker_name else ""
+        profile_name = f"intenserp_extension_{worker_part}{int(time.time())}"
         profile_path = os.path.join(extension_data_dir, profile_name)
         
         # Remove any existing profile
@@ -248,7 +259,7 @@ def _create_clean_extension_profile(browser: str = "chrome") -> str:
         print(f"[color:red]WARNING!! THIS COULD BE DANGEROUS AS IT MAY DELETE YOUR {browser.upper()} PROFILE DATA")
         print("[color:yellow]PROCEED AT YOUR OWN RISK, IT IS RECOMMENDED TO CLOSE THIS PROGRAM NOW")
         print("[color:red]Falling back to default browser data directory")
-        return _get_browser_data_dir(browser)  # Fallback to default browser data directory
+        return _get_browser_data_dir(browser, worker_name)  # Fallback to default browser data directory
 
 def _cleanup_old_extension_profiles() -> None:
     """Clean up old extension profiles to prevent accumulation"""
@@ -308,7 +319,7 @@ def _validate_extension_structure(extension_dir: str) -> bool:
         print(f"[color:red]Error validating extension structure: {e}")
         return False
 
-def _create_fresh_extension_copy(source_extension_dir: str, api_port: int = 5000) -> str:
+def _create_fresh_extension_copy(source_extension_dir: str, api_port: int = 5000, ws_port: int = 0, client_id: str = "primary", token: str = "") -> str:
     """Create a fresh copy of the extension to avoid Chrome caching issues"""
     try:
         # Create a unique temporary directory for this extension copy
@@ -325,24 +336,28 @@ def _create_fresh_extension_copy(source_extension_dir: str, api_port: int = 5000
         print(f"[color:cyan]Copying extension from {source_extension_dir} to {copy_path}")
         shutil.copytree(source_extension_dir, copy_path)
         
-        # Replace port in background.js if different from default
-        if api_port != 5000:
+        # Replace ports and client id in background.js if different from the defaults
+        if api_port != 5000 or ws_port or client_id != "primary":
             background_js_path = os.path.join(copy_path, "background.js")
             if os.path.exists(background_js_path):
                 try:
-                    print(f"[color:cyan]Updating extension port from 5000 to {api_port}")
+                    print(f"[color:cyan]Updating extension settings: port={api_port}, websocket={ws_port or 'off'}, client={client_id}")
                     with open(background_js_path, 'r', encoding='utf-8') as f:
                         content = f.read()
                     
-                    # Replace DEFAULT_PORT value
+                    # Replace DEFAULT_PORT, WS_PORT, CLIENT_ID and CHANNEL_TOKEN values
                     content = content.replace('const DEFAULT_PORT = 5000;', f'const DEFAULT_PORT = {api_port};')
+                    content = content.replace('const WS_PORT = 0;', f'const WS_PORT = {ws_port};')
+                    content = content.replace("const CLIENT_ID = 'primary';", f"const CLIENT_ID = '{client_id}';")
+                    if ws_port:
+                        content = content.replace("const CHANNEL_TOKEN = '';", f"const CHANNEL_TOKEN = '{token}';")
                     
                     with open(background_js_path, 'w', encoding='utf-8') as f:
                         f.write(content)
                     
-                    print(f"[color:green]Extension port updated successfully to {api_port}")
+                    print("[color:green]Extension settings updated successfully")
                 except Exception as e:
-                    print(f"[color:yellow]Warning: Could not update extension port: {e}")
+                    print(f"[color:yellow]Warning: Could not update extension settings: {e}")
         else:
             print(f"[color:cyan]Using default port {api_port}, no extension modification needed")
         
@@ -418,8 +433,13 @@ def clear_browser_data(browser: str) -> bool:
     try:
         browser_data_dir = _get_browser_data_dir(browser)
         
+        # Pooled browsers keep their own profiles next to the primary one
+        app_data_dir = os.path.dirname(browser_data_dir)
+        for item in os.listdir(app_data_dir):
+            if item.startswith(f"{browser}_profile_worker"):
+                shutil.rmtree(os.path.join(app_data_dir, item), ignore_errors=True)
+        
         if os.path.exists(browser_data_dir):
-            import shutil
             shutil.rmtree(browser_data_dir)
             print(f"[color:green]Cleared browser data for {browser.title()}")
             return True
@@ -610,4 +630,4 @@ def current_page(driver: Driver, url: str) -> bool:
     try:
         return driver.get_current_url().startswith(url)
     except Exception:
-        return False
\ No newline at end of file
+        return False
\ No newline at end of file